@@ -0,0 +1,75 @@
+import hashlib
+import time
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from .dates import local_days
+
+PREFIX = 'reports'
+
+
+def month_keys(first, last):
+    keys = []
+    year, month = first.year, first.month
+    while (year, month) <= (last.year, last.month):
+        keys.append(f'{PREFIX}:version:{year}-{month:02d}')
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return keys
+
+
+def month_versions(keys):
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            # Never restart from a low number after eviction: old entries
+            # cached under that number would become valid again
+            cache.add(key, time.time_ns(), None)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def bump_months(keys):
+    for key in keys:
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, time.time_ns(), None)
+
+
+def report_key(report, first, last, params, versions):
+    fingerprint = hashlib.sha1(repr((sorted(params.items()), versions)).encode()).hexdigest()
+    return f'{PREFIX}:{report}:{first}:{last}:{fingerprint}'
+
+
+def cached_report(report, start_date, end_date, compute, params=None):
+    """Return (data, hit) for a report over whole days start_date..end_date.
+
+    The key is the normalized (report, first day, last day, params) plus the
+    version of every month in the range, so any order write in one of those
+    months makes the cached result unreachable.
+    """
+    first, last = local_days(start_date, end_date)
+    key = report_key(report, first, last, params or {}, month_versions(month_keys(first, last)))
+    data = cache.get(key)
+    if data is not None:
+        return data, True
+    data = compute()
+    cache.set(key, data, settings.REPORT_CACHE_TIMEOUT)
+    return data, False
+
+
+def invalidate_months(keys):
+    # Bumped now, for readers in this transaction, and again after commit, so
+    # a report computed from pre-commit data cannot be cached as current
+    if keys:
+        bump_months(keys)
+        transaction.on_commit(lambda: bump_months(keys))
+
+
+def invalidate_days(*days):
+    """Drop cached reports covering any of `days`."""
+    invalidate_months(sorted({key for day in days if day for key in month_keys(day, day)}))
+
+
+def invalidate_range(first, last):
+    invalidate_months(month_keys(first, last))
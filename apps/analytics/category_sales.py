@@ -0,0 +1,130 @@
+from collections import defaultdict
+import numpy as np
+from django.db.models import ExpressionWrapper, F, FloatField
+from django.db.models.functions import Coalesce
+from apps.categories.models import Category
+from apps.orders.models import OrderItem
+from apps.products.models import Product
+from .dates import day_range
+from .engine import NO_PRODUCT, OrderFacts, money
+
+VIEWS = ('tree',)
+# Sold product ids per IN (...) list; stays under SQLite's 999 parameters
+BATCH_SIZE = 900
+# The fields of a flat report row
+FIELDS = ['category_id', 'category_name', 'total_sales', 'order_count', 'product_count', 'total_quantity']
+
+
+def sold_items(start_date, end_date):
+    """(orders, products, quantities, line totals in cents) of the items
+    ordered on the days start_date..end_date, read as plain numbers. Items
+    whose product was deleted have NO_PRODUCT."""
+    start, end = day_range(start_date, end_date)
+    rows = OrderItem.objects.filter(order__created_at__gte=start, order__created_at__lt=end).values_list(
+        'order_id', Coalesce('product_id', NO_PRODUCT), 'quantity',
+        ExpressionWrapper(F('quantity') * F('unit_price'), output_field=FloatField()),
+    )
+    items = np.array(list(rows), dtype=np.float64).reshape(-1, 4)
+    return (items[:, 0].astype(np.int64), items[:, 1].astype(np.int64), items[:, 2].astype(np.int64),
+            np.round(items[:, 3] * 100).astype(np.int64))
+
+
+def ancestors(category_id, parents):
+    """category_id and every live category above it."""
+    chain = []
+    while category_id in parents and category_id not in chain:
+        chain.append(category_id)
+        category_id = parents[category_id]
+    return chain
+
+
+def category_totals(orders, products, quantities, cents):
+    """Live categories as {id: node}, each with the sales of every item
+    whose product is attached to it or to any category below it.
+
+    A product counts once per subtree, however many of the subtree's
+    categories it is attached to: every sold product is paired once with
+    each category covering it, and the items are spread over those pairs
+    with NumPy. Every report on category sales is built from these nodes.
+    """
+    nodes, parents = {}, {}
+    rows = Category.objects.filter(is_deleted=False).values_list('id', 'parent_id', 'name', 'level')
+    for category_id, parent_id, name, level in rows:
+        nodes[category_id] = {'category_id': category_id, 'category_name': name, 'level': level,
+                              'parent_id': parent_id}
+        parents[category_id] = parent_id
+
+    # Only the links of products that sold, not the whole catalog's
+    links = Product.categories.through.objects.filter(category__is_deleted=False)
+    sold = np.unique(products[products != NO_PRODUCT]).tolist()
+    covering, deleted = defaultdict(set), set()
+    for start in range(0, len(sold), BATCH_SIZE):
+        batch = links.filter(product_id__in=sold[start:start + BATCH_SIZE]).values_list(
+            'product_id', 'category_id', 'product__is_deleted'
+        )
+        for product_id, category_id, product_deleted in batch:
+            covering[product_id].update(ancestors(category_id, parents))
+            if product_deleted:
+                deleted.add(product_id)
+
+    ids = list(nodes)
+    code = {category_id: n for n, category_id in enumerate(ids)}
+    pairs = np.array([(product_id, code[category_id]) for product_id, categories in covering.items()
+                      for category_id in categories], dtype=np.int64).reshape(-1, 2)
+    pairs = pairs[np.argsort(pairs[:, 0], kind='stable')]
+    # Every item fanned out to each category covering its product
+    left = np.searchsorted(pairs[:, 0], products, side='left')
+    counts = np.searchsorted(pairs[:, 0], products, side='right') - left
+    item = np.repeat(np.arange(len(products)), counts)
+    offset = np.arange(len(item)) - np.repeat(np.cumsum(counts) - counts, counts)
+    category = pairs[np.repeat(left, counts) + offset, 1]
+
+    size = len(ids)
+    sales = np.bincount(category, weights=cents[item], minlength=size)
+    units = np.bincount(category, weights=quantities[item], minlength=size)
+    order_counts = OrderFacts.distinct_per_group(category, orders[item], size)
+    live = ~np.isin(pairs[:, 0], list(deleted))
+    product_counts = np.bincount(pairs[live, 1], minlength=size)
+    for n, category_id in enumerate(ids):
+        nodes[category_id].update(total_sales=money(sales[n]), order_count=int(order_counts[n]),
+                                  total_quantity=int(units[n]), product_count=int(product_counts[n]))
+    return nodes
+
+
+def subtree_totals(start_date, end_date):
+    """category_totals of the items ordered on the days start_date..end_date."""
+    return category_totals(*sold_items(start_date, end_date))
+
+
+def by_sales(rows):
+    return sorted(rows, key=lambda row: (-row['total_sales'], row['category_id']))
+
+
+def category_rows(nodes):
+    """The flat report: every category with sales in its subtree."""
+    return by_sales({field: node[field] for field in FIELDS} for node in nodes.values() if node['order_count'])
+
+
+def category_report(start_date, end_date):
+    return category_rows(subtree_totals(start_date, end_date))
+
+
+def category_tree(start_date, end_date):
+    """Top-level categories with their subtree totals, each nesting its
+    `children` the same way. Subtrees without sales are left out."""
+    nodes = subtree_totals(start_date, end_date)
+    children = defaultdict(list)
+    for node in nodes.values():
+        if node['order_count']:
+            children[node['parent_id'] if node['parent_id'] in nodes else None].append(node)
+
+    def build(parent_id):
+        return [{**node, 'children': build(node['category_id'])} for node in by_sales(children[parent_id])]
+
+    return build(None)
+
+
+def category_level(start_date, end_date, level):
+    """The categories at `level`, each with its whole subtree's totals."""
+    nodes = subtree_totals(start_date, end_date)
+    return by_sales(node for node in nodes.values() if node['level'] == level and node['order_count'])
@@ -0,0 +1,103 @@
+import time
+import numpy as np
+from django.db.models import Count, Q
+from apps.orders.models import Order
+from apps.products.models import Product
+from .category_sales import category_rows, category_totals, sold_items
+from .dates import day_range
+from .engine import NO_PRODUCT, PAYMENT_STATUSES, lookup, money
+from .rollups import daily_sales_from_rollup
+
+SECTIONS = ('sales', 'products', 'payment_status', 'categories')
+
+
+class Scan:
+    """Running totals of the dashboard `sections` over one or more ranges.
+
+    Sales come from the rollup and the payment statuses from one
+    conditional aggregation over the orders. Products and categories share
+    one read of the items as plain numbers (the line total is computed in
+    the database), grouped with NumPy, so no order item is handled one by
+    one in Python. Between ranges only those arrays are kept.
+    """
+
+    def __init__(self, sections=SECTIONS):
+        self.sections = sections
+        self.days = {}
+        self.payments = dict.fromkeys(PAYMENT_STATUSES, 0)
+        self.items = []
+        self.rows = 0
+
+    def read(self, first, last):
+        """Add the orders created on the days first..last. Returns the
+        number of orders."""
+        start, end = day_range(first, last)
+        if 'sales' in self.sections:
+            self.days.update(daily_sales_from_rollup(first, last))
+        # Also the order count, so it runs for every section
+        counts = Order.objects.filter(created_at__gte=start, created_at__lt=end).aggregate(orders=Count('id'), **{
+            status: Count('id', filter=Q(payment_status=status)) for status in PAYMENT_STATUSES
+        })
+        orders = counts.pop('orders')
+        for status, count in counts.items():
+            self.payments[status] += count
+        if 'products' in self.sections or 'categories' in self.sections:
+            self.items.append(sold_items(first, last))
+        self.rows += orders
+        return orders
+
+    def columns(self):
+        """(orders, products, quantities, line totals in cents) of every item read."""
+        if not self.items:
+            return tuple(np.empty(0, dtype=np.int64) for _ in range(4))
+        return tuple(np.concatenate(column) for column in zip(*self.items))
+
+    def sales(self):
+        return [{'date': day, 'revenue': revenue, 'orders': orders}
+                for day, (revenue, orders) in sorted(self.days.items())]
+
+    def payment_status(self):
+        total = sum(self.payments.values())
+        return [{'status': status, 'order_count': count, 'percentage': round(count / total * 100, 2)}
+                for status, count in sorted(self.payments.items()) if count]
+
+    def products(self):
+        _, products, quantities, totals = self.columns()
+        sold, codes = np.unique(products, return_inverse=True)
+        units = np.bincount(codes, weights=quantities, minlength=len(sold))
+        revenue = np.bincount(codes, weights=totals, minlength=len(sold))
+        names = lookup(Product, sold, 'goods_name')
+        rows = [{
+            'product_id': product if product != NO_PRODUCT else None,
+            'product_name': names.get(product),
+            'units_sold': int(units[code]),
+            'revenue': money(revenue[code]),
+        } for code, product in enumerate(sold.tolist())]
+        return sorted(rows, key=lambda row: -row['units_sold'])
+
+    def categories(self):
+        return category_rows(category_totals(*self.columns()))
+
+    def results(self, timings):
+        """{section: rows}, adding the time spent in each to `timings`."""
+        build = {'sales': self.sales, 'products': self.products, 'payment_status': self.payment_status,
+                 'categories': self.categories}
+        data = {}
+        for name in self.sections:
+            started = time.perf_counter()
+            data[name] = build[name]()
+            timings[name] = timings.get(name, 0.0) + time.perf_counter() - started
+        return data
+
+
+def build_dashboard(start_date, end_date):
+    """All four reports from one read of the range's orders and items.
+    Returns (data, meta); meta holds the order count and the time spent
+    fetching and in each section."""
+    scan = Scan()
+    timings = dict.fromkeys(['fetch', *SECTIONS], 0.0)
+    started = time.perf_counter()
+    scan.read(start_date, end_date)
+    timings['fetch'] = time.perf_counter() - started
+    data = scan.results(timings)
+    return data, {'rows': scan.rows, 'timings_ms': {name: round(seconds * 1000, 2) for name, seconds in timings.items()}}
@@ -0,0 +1,19 @@
+from datetime import datetime, time, timedelta
+from django.utils import timezone
+
+
+def local_days(start_date, end_date):
+    """First and last calendar day (in the current time zone) of a range
+    given as dates or datetimes."""
+    return tuple(timezone.localdate(d) if isinstance(d, datetime) else d for d in (start_date, end_date))
+
+
+def day_range(start_date, end_date):
+    """Half-open [start, end) timestamps covering the whole days from
+    start_date to end_date. Filtering with created_at__gte/__lt instead of
+    created_at__date keeps the column bare, so its indexes can be used."""
+    first, last = local_days(start_date, end_date)
+    return (
+        timezone.make_aware(datetime.combine(first, time.min)),
+        timezone.make_aware(datetime.combine(last + timedelta(days=1), time.min)),
+    )
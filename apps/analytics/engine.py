@@ -0,0 +1,239 @@
+import threading
+from datetime import timedelta
+from decimal import Decimal
+import numpy as np
+from django.utils import timezone
+from apps.orders.models import Order, OrderItem
+from apps.products.models import Product
+from .dates import local_days
+from .models import DeletedOrder
+
+CHUNK_SIZE = 20000
+# Orders committed late can carry an updated_at slightly older than the last
+# refresh; re-reading this much history catches them
+REFRESH_OVERLAP = timedelta(minutes=2)
+# DeletedOrder tombstones are kept this long (pruned at most every
+# PRUNE_INTERVAL); an engine idle for longer reloads everything
+TOMBSTONE_RETENTION = timedelta(days=1)
+PRUNE_INTERVAL = timedelta(hours=1)
+PAYMENT_STATUSES = [code for code, _ in Order.PAYMENT_STATUS_CHOICES]
+# Items whose product was deleted (product_id NULL) are stored as 0
+NO_PRODUCT = 0
+
+
+def cents(value):
+    return int(value * 100)
+
+
+def money(value):
+    return Decimal(int(round(value))).scaleb(-2)
+
+
+def empty(dtype):
+    return np.empty(0, dtype=dtype)
+
+
+def lookup(model, ids, field, batch_size=900):
+    """{id: field} for an array of ids, in batches below SQLite's variable limit."""
+    ids = ids.tolist()
+    values = {}
+    for start in range(0, len(ids), batch_size):
+        values.update(model.objects.filter(pk__in=ids[start:start + batch_size]).values_list('id', field))
+    return values
+
+
+class OrderFacts:
+    """Columnar, per-process copy of the order and order-item facts the
+    reports need, answering them with vectorized group-bys.
+
+    Days are local date ordinals and money is int64 cents, so sums are exact.
+    `refresh()` re-reads only orders whose updated_at moved (with their
+    items) and drops the orders listed in DeletedOrder since the last
+    refresh. Bulk writes that skip updated_at or the delete signals
+    (QuerySet.update, bulk_update, raw SQL) need `reload()`.
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.clear()
+
+    def clear(self):
+        self.order_id = empty(np.int64)
+        self.order_day = empty(np.int32)
+        self.order_total = empty(np.int64)
+        self.order_payment = empty(np.int8)
+        self.item_order = empty(np.int64)
+        self.item_day = empty(np.int32)
+        self.item_product = empty(np.int64)
+        self.item_quantity = empty(np.int64)
+        self.item_price = empty(np.int64)
+        self.watermark = None
+        self.deleted_since = None
+        self.pruned_at = None
+
+    # Loading
+
+    def read_orders(self, queryset):
+        rows = queryset.values_list('id', 'created_at', 'total_amount', 'payment_status', 'updated_at')
+        ids, days, totals, payments, watermark = [], [], [], [], self.watermark
+        codes = {code: n for n, code in enumerate(PAYMENT_STATUSES)}
+        for order_id, created_at, total, payment, updated_at in rows.iterator(chunk_size=CHUNK_SIZE):
+            ids.append(order_id)
+            days.append(timezone.localdate(created_at).toordinal())
+            totals.append(cents(total))
+            payments.append(codes.get(payment, -1))
+            if watermark is None or updated_at > watermark:
+                watermark = updated_at
+        self.watermark = watermark
+        return (np.array(ids, dtype=np.int64), np.array(days, dtype=np.int32),
+                np.array(totals, dtype=np.int64), np.array(payments, dtype=np.int8))
+
+    def read_items(self, queryset):
+        rows = queryset.values_list('order_id', 'product_id', 'quantity', 'unit_price')
+        orders, products, quantities, prices = [], [], [], []
+        for order_id, product_id, quantity, price in rows.iterator(chunk_size=CHUNK_SIZE):
+            orders.append(order_id)
+            products.append(product_id or NO_PRODUCT)
+            quantities.append(quantity)
+            prices.append(cents(price))
+        return (np.array(orders, dtype=np.int64), np.array(products, dtype=np.int64),
+                np.array(quantities, dtype=np.int64), np.array(prices, dtype=np.int64))
+
+    def set_orders(self, ids, days, totals, payments):
+        order = np.argsort(ids, kind='stable')
+        self.order_id, self.order_day = ids[order], days[order]
+        self.order_total, self.order_payment = totals[order], payments[order]
+
+    def set_items(self, orders, products, quantities, prices):
+        # An item's day is its order's, looked up in the id-sorted order columns
+        position = np.searchsorted(self.order_id, orders)
+        known = position < len(self.order_id)
+        known[known] = self.order_id[position[known]] == orders[known]
+        self.item_order, self.item_product = orders[known], products[known]
+        self.item_quantity, self.item_price = quantities[known], prices[known]
+        self.item_day = self.order_day[position[known]]
+
+    def reload(self):
+        with self.lock:
+            started = timezone.now()
+            self.watermark = None
+            self.set_orders(*self.read_orders(Order.objects.all()))
+            self.set_items(*self.read_items(OrderItem.objects.all()))
+            self.deleted_since = started
+
+    def read_deleted(self):
+        started = timezone.now()
+        ids = DeletedOrder.objects.filter(deleted_at__gte=self.deleted_since - REFRESH_OVERLAP).values_list(
+            'order_id', flat=True
+        )
+        gone = np.array(list(ids), dtype=np.int64)
+        self.deleted_since = started
+        if self.pruned_at is None or started - self.pruned_at >= PRUNE_INTERVAL:
+            self.pruned_at = started
+            DeletedOrder.objects.filter(deleted_at__lt=started - TOMBSTONE_RETENTION).delete()
+        return gone
+
+    def refresh(self):
+        with self.lock:
+            # Tombstones older than the retention may be gone: start over
+            if self.watermark is None or timezone.now() - self.deleted_since >= TOMBSTONE_RETENTION:
+                return self.reload()
+            ids, days, totals, payments = self.read_orders(
+                Order.objects.filter(updated_at__gte=self.watermark - REFRESH_OVERLAP)
+            )
+            gone = self.read_deleted()
+            if not len(ids) and not len(gone):
+                return
+            live = ~np.isin(ids, gone)
+            ids, days, totals, payments = ids[live], days[live], totals[live], payments[live]
+            stale = np.concatenate([ids, gone])
+
+            kept = ~np.isin(self.order_id, stale)
+            self.set_orders(
+                np.concatenate([self.order_id[kept], ids]), np.concatenate([self.order_day[kept], days]),
+                np.concatenate([self.order_total[kept], totals]),
+                np.concatenate([self.order_payment[kept], payments]),
+            )
+            kept = ~np.isin(self.item_order, stale)
+            changed = [self.read_items(OrderItem.objects.filter(order_id__in=ids[start:start + 500].tolist()))
+                       for start in range(0, len(ids), 500)]
+            self.set_items(*(
+                np.concatenate([column[kept]] + [chunk[n] for chunk in changed])
+                for n, column in enumerate([self.item_order, self.item_product,
+                                            self.item_quantity, self.item_price])
+            ))
+
+    # Reports, with the same rows as the ORM serializers
+
+    def day_mask(self, days, start_date, end_date):
+        first, last = local_days(start_date, end_date)
+        return (days >= first.toordinal()) & (days <= last.toordinal())
+
+    # Group-bys are bincounts over small dense keys: day offsets, or ids
+    # mapped to codes 0..n-1 by np.unique
+
+    def sales(self, start_date, end_date):
+        first, last = local_days(start_date, end_date)
+        mask = self.day_mask(self.order_day, first, last)
+        offset = self.order_day[mask] - first.toordinal()
+        span = (last - first).days + 1
+        revenue = np.bincount(offset, weights=self.order_total[mask], minlength=span)
+        orders = np.bincount(offset, minlength=span)
+        return [{'date': first + timedelta(days=int(day)), 'revenue': money(revenue[day]), 'orders': int(orders[day])}
+                for day in np.flatnonzero(orders)]
+
+    def products(self, start_date, end_date):
+        mask = self.day_mask(self.item_day, start_date, end_date)
+        quantity = self.item_quantity[mask]
+        # Dense codes keep the bincounts as long as the distinct products, not the largest id
+        sold, codes = np.unique(self.item_product[mask], return_inverse=True)
+        units = np.bincount(codes, weights=quantity, minlength=len(sold))
+        revenue = np.bincount(codes, weights=quantity * self.item_price[mask], minlength=len(sold))
+        names = lookup(Product, sold, 'goods_name')
+        rows = [{
+            'product_id': int(product) if product != NO_PRODUCT else None,
+            'product_name': names.get(int(product)),
+            'units_sold': int(units[code]),
+            'revenue': money(revenue[code]),
+        } for code, product in enumerate(sold)]
+        return sorted(rows, key=lambda row: -row['units_sold'])
+
+    def payment_status(self, start_date, end_date):
+        mask = self.day_mask(self.order_day, start_date, end_date)
+        payments = self.order_payment[mask]
+        counts = np.bincount(payments[payments >= 0], minlength=len(PAYMENT_STATUSES))
+        total = int(mask.sum())
+        return [{'status': status, 'order_count': int(count), 'percentage': round(float(count) / total * 100, 2)}
+                for status, count in sorted(zip(PAYMENT_STATUSES, counts)) if count]
+
+    def categories(self, start_date, end_date):
+        # category_sales builds on this module
+        from .category_sales import category_rows, category_totals
+        mask = self.day_mask(self.item_day, start_date, end_date)
+        quantity = self.item_quantity[mask]
+        nodes = category_totals(self.item_order[mask], self.item_product[mask], quantity,
+                                quantity * self.item_price[mask])
+        return category_rows(nodes)
+
+    @staticmethod
+    def distinct_per_group(groups, values, size):
+        """Number of distinct values within each group, indexed by group."""
+        if not len(values):
+            return np.zeros(size, dtype=np.int64)
+        base = int(values.max()) + 1
+        pairs = np.sort(groups * base + values)
+        first = np.empty(len(pairs), dtype=bool)
+        first[0] = True
+        np.not_equal(pairs[1:], pairs[:-1], out=first[1:])
+        return np.bincount(pairs[first] // base, minlength=size)
+
+    def report(self, name, start_date, end_date):
+        """Refresh, then compute `name` (sales, products, payment_status or
+        categories) for the days start_date..end_date."""
+        # Held throughout so a concurrent refresh cannot swap columns mid-report
+        with self.lock:
+            self.refresh()
+            return getattr(self, name)(start_date, end_date)
+
+
+engine = OrderFacts()
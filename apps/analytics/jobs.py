@@ -0,0 +1,116 @@
+import json
+import logging
+from datetime import timedelta
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from .dashboard import SECTIONS, Scan
+from .models import ReportJob
+
+logger = logging.getLogger(__name__)
+
+RESULTS_DIR = 'reports'
+
+
+def month_chunks(first, last):
+    """(first, last) day pairs covering first..last, split at month ends."""
+    chunks = []
+    while first <= last:
+        next_month = (first.replace(day=28) + timedelta(days=4)).replace(day=1)
+        chunks.append((first, min(last, next_month - timedelta(days=1))))
+        first = next_month
+    return chunks
+
+
+def submit_job(report, start_date, end_date, user=None):
+    """Return (job, created). A pending or running job with the same
+    parameters is returned instead of queueing a second one."""
+    params = {'report': report, 'start_date': start_date, 'end_date': end_date}
+    while True:
+        job = ReportJob.objects.filter(status__in=ReportJob.ACTIVE, **params).first()
+        if job:
+            return job, False
+        try:
+            with transaction.atomic():
+                return ReportJob.objects.create(
+                    requested_by=user, chunks_total=len(month_chunks(start_date, end_date)), **params
+                ), True
+        except IntegrityError:
+            # Submitted concurrently; the other job may already be done, so look again
+            continue
+
+
+def requeue_stale_jobs():
+    """Put back jobs whose worker stopped reporting progress (e.g. it was
+    killed) for longer than REPORT_JOB_TIMEOUT."""
+    now = timezone.now()
+    cutoff = now - timedelta(seconds=settings.REPORT_JOB_TIMEOUT)
+    return ReportJob.objects.filter(status=ReportJob.RUNNING, updated_at__lt=cutoff).update(
+        status=ReportJob.PENDING, updated_at=now
+    )
+
+
+def claim_job():
+    """Mark the oldest pending job RUNNING and return it, or None. The
+    conditional update lets several workers poll the same table."""
+    pending = ReportJob.objects.filter(status=ReportJob.PENDING).order_by('created_at', 'id')
+    for job_id in pending.values_list('id', flat=True)[:10]:
+        now = timezone.now()
+        if ReportJob.objects.filter(pk=job_id, status=ReportJob.PENDING).update(
+            status=ReportJob.RUNNING, started_at=now, updated_at=now, chunks_done=0, rows=0
+        ):
+            return ReportJob.objects.get(pk=job_id)
+    return None
+
+
+def run_job(job):
+    """Compute a claimed job one month at a time and store the result as
+    JSON under MEDIA_ROOT/reports/. Only the sections' totals and the items
+    as numeric columns are kept between months, not the orders themselves.
+
+    Every write is conditional on the claim's started_at, so once the job
+    was requeued and claimed by another worker this one stops writing."""
+    claimed = ReportJob.objects.filter(pk=job.pk, status=ReportJob.RUNNING, started_at=job.started_at)
+    scan = Scan(SECTIONS if job.report == 'dashboard' else [job.report])
+    timings = {}
+    try:
+        for first, last in month_chunks(job.start_date, job.end_date):
+            job.rows += scan.read(first, last)
+            job.chunks_done += 1
+            # Also the heartbeat checked by requeue_stale_jobs
+            if not claimed.update(chunks_done=job.chunks_done, rows=job.rows, updated_at=timezone.now()):
+                logger.warning("Report job %s was taken away from this worker", job.pk)
+                return
+        data = scan.results(timings)
+        content = json.dumps({
+            'report': job.report,
+            'start_date': job.start_date,
+            'end_date': job.end_date,
+            'rows': job.rows,
+            'data': data if job.report == 'dashboard' else data[job.report],
+        }, cls=DjangoJSONEncoder)
+        path = default_storage.save(f'{RESULTS_DIR}/report-job-{job.pk}.json', ContentFile(content.encode()))
+    except Exception as e:
+        logger.exception("Report job %s failed", job.pk)
+        claimed.update(status=ReportJob.FAILED, error=str(e), finished_at=timezone.now(), updated_at=timezone.now())
+        return
+    if not claimed.update(status=ReportJob.READY, result=path, finished_at=timezone.now(), updated_at=timezone.now()):
+        logger.warning("Report job %s was taken away from this worker", job.pk)
+        default_storage.delete(path)
+
+
+def run_pending_jobs(limit=10):
+    """Run up to `limit` pending jobs one after another. Returns how many
+    were run."""
+    requeue_stale_jobs()
+    handled = 0
+    while handled < limit:
+        job = claim_job()
+        if job is None:
+            break
+        run_job(job)
+        handled += 1
+    return handled
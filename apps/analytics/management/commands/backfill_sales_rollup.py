@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+from apps.analytics.rollups import order_history_days, rebuild_daily_sales
+
+
+def date_option(value):
+    parsed = parse_date(value)
+    if not parsed:
+        raise CommandError(f'Invalid date: {value}')
+    return parsed
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the daily sales rollup from the order table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', type=date_option, help='First day (YYYY-MM-DD), default: first order')
+        parser.add_argument('--end', type=date_option, help='Last day (YYYY-MM-DD), default: last order')
+
+    def handle(self, *args, **options):
+        first, last = order_history_days()
+        start, end = options['start'] or first, options['end'] or last
+        if start is None or end is None:
+            self.stdout.write('No orders to roll up')
+            return
+        days = rebuild_daily_sales(start, end)
+        self.stdout.write(f'Rebuilt {start} to {end}: {days} day(s) with sales')
@@ -0,0 +1,78 @@
+import resource
+import time
+from datetime import timedelta
+from statistics import median
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from apps.analytics.engine import OrderFacts
+from apps.analytics.serializers import (
+    PaymentStatusSerializer, ProductCategoryReportSerializer, ProductPopularitySerializer, SalesReportSerializer,
+)
+from apps.analytics.synthetic import generate_categories, generate_orders
+from apps.orders.models import Order
+
+SERIALIZERS = {
+    'sales': SalesReportSerializer,
+    'products': ProductPopularitySerializer,
+    'payment_status': PaymentStatusSerializer,
+    'categories': ProductCategoryReportSerializer,
+}
+
+
+class Command(BaseCommand):
+    help = 'Compare the ORM reports with the NumPy engine on synthetic orders (rolled back afterwards)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--items', type=int, default=5_000_000, help='Approximate number of order items')
+        parser.add_argument('--days', type=int, default=365)
+        parser.add_argument('--products', type=int, default=2000)
+        parser.add_argument('--categories', type=int, default=50)
+        parser.add_argument('--repeat', type=int, default=3)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--keep', action='store_true', help='Commit the synthetic rows instead of rolling back')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self.run(options)
+            if not options['keep']:
+                transaction.set_rollback(True)
+
+    def timed(self, func, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            func()
+            timings.append((time.perf_counter() - started) * 1000)
+        return median(timings)
+
+    def run(self, options):
+        started = time.perf_counter()
+        # generate_orders puts 1 to 3 items (2 on average) in each order
+        products = generate_orders(options['items'] // 2, days=options['days'], products=options['products'],
+                                   seed=options['seed'])
+        generate_categories(products, options['categories'], seed=options['seed'])
+        # Back-date updated_at so the refresh timing below is not re-reading every order
+        Order.objects.update(updated_at=F('created_at'))
+        self.stdout.write(f'Generated data in {time.perf_counter() - started:.1f}s')
+
+        facts = OrderFacts()
+        rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        started = time.perf_counter()
+        facts.reload()
+        self.stdout.write(
+            f'Loaded {len(facts.order_id):,} orders and {len(facts.item_order):,} items in '
+            f'{time.perf_counter() - started:.1f}s (peak RSS +{resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024 - rss_before:.0f} MB)'
+        )
+        self.stdout.write(f"Incremental refresh with no changes: {self.timed(facts.refresh, options['repeat']):.1f} ms")
+
+        end = timezone.localdate()
+        start = end - timedelta(days=options['days'])
+        self.stdout.write(f"{'report':<16}{'orm ms':>12}{'numpy ms':>12}{'speedup':>10}")
+        for name, serializer_class in SERIALIZERS.items():
+            serializer = serializer_class(data=[])
+            orm_ms = self.timed(lambda: [serializer.to_representation(item)
+                                         for item in serializer.get_queryset(start, end)], options['repeat'])
+            numpy_ms = self.timed(lambda: getattr(facts, name)(start, end), options['repeat'])
+            self.stdout.write(f'{name:<16}{orm_ms:>12.1f}{numpy_ms:>12.1f}{orm_ms / numpy_ms:>9.1f}x')
@@ -0,0 +1,168 @@
+import json
+import time
+import tracemalloc
+from datetime import timedelta
+from statistics import median
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import F
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+from apps.analytics.cache import invalidate_range
+from apps.analytics.synthetic import generate_categories, generate_orders
+from apps.analytics.views import ReportViewSet
+from apps.orders.models import Order
+from apps.users.models import User
+
+# (name, action, query params, view kwargs); trending is left out since it
+# never reads the order tables
+CASES = [
+    ('sales', 'sales', {}, {}),
+    ('sales_by_week', 'sales', {'granularity': 'week'}, {}),
+    ('products', 'products', {}, {}),
+    ('payment_status', 'payment_status', {}, {}),
+    ('categories', 'categories', {}, {}),
+    ('categories_tree', 'categories', {'view': 'tree'}, {}),
+    ('dashboard', 'dashboard', {}, {}),
+    ('export_products', 'export', {}, {'report': 'products', 'file_format': 'csv'}),
+]
+SCALE = ['items', 'days', 'products', 'categories', 'users', 'seed']
+# The reports the dashboard answers in one response
+DASHBOARD_SECTIONS = ['sales', 'products', 'payment_status', 'categories']
+
+
+class Command(BaseCommand):
+    help = 'Time every report on synthetic orders and compare with a stored baseline (rolled back afterwards)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--items', type=int, default=1_000_000, help='Approximate number of order items')
+        parser.add_argument('--days', type=int, default=365)
+        parser.add_argument('--products', type=int, default=2000)
+        parser.add_argument('--categories', type=int, default=50)
+        parser.add_argument('--users', type=int, default=5000)
+        parser.add_argument('--repeat', type=int, default=3)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--case', action='append', dest='cases', choices=[name for name, *_ in CASES],
+                            help='Report to time (repeatable). Defaults to all of them.')
+        parser.add_argument('--baseline', help='JSON file from --save-baseline to compare with')
+        parser.add_argument('--save-baseline', help='Write the results to this JSON file')
+        parser.add_argument('--tolerance', type=float, default=0.25,
+                            help='Allowed slowdown and memory growth over the baseline (0.25 = 25%%)')
+        parser.add_argument('--keep', action='store_true', help='Commit the synthetic rows instead of rolling back')
+
+    def handle(self, *args, **options):
+        scale = {name: options[name] for name in SCALE}
+        scale['vendor'] = connection.vendor
+        baseline = None
+        if options['baseline']:
+            with open(options['baseline']) as f:
+                baseline = json.load(f)
+            if baseline['scale'] != scale:
+                raise CommandError(f"The baseline was recorded at {baseline['scale']}, not {scale}")
+
+        with transaction.atomic():
+            results = self.run(options, baseline)
+            if not options['keep']:
+                transaction.set_rollback(True)
+
+        if options['save_baseline']:
+            with open(options['save_baseline'], 'w') as f:
+                json.dump({'scale': scale, 'results': results}, f, indent=2, sort_keys=True)
+            self.stdout.write(f"Baseline written to {options['save_baseline']}")
+        if baseline:
+            regressions = self.regressions(results, baseline['results'], options['tolerance'])
+            if regressions:
+                raise CommandError('Regressions against the baseline:\n' + '\n'.join(regressions))
+            self.stdout.write('No regressions against the baseline')
+
+    def generate(self, options):
+        started = time.perf_counter()
+        # generate_orders puts 1 to 3 items (2 on average) in each order
+        products = generate_orders(options['items'] // 2, days=options['days'], users=options['users'],
+                                   products=options['products'], seed=options['seed'])
+        generate_categories(products, options['categories'], seed=options['seed'])
+        Order.objects.update(updated_at=F('created_at'))
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        self.stdout.write(
+            f'Generated {Order.objects.count():,} orders in {time.perf_counter() - started:.1f}s'
+        )
+
+    def call(self, user, action, params, kwargs):
+        request = APIRequestFactory().get(f'/reports/{action}/', params)
+        force_authenticate(request, user=user)
+        response = ReportViewSet.as_view({'get': action})(request, **kwargs)
+        # Rendering (or draining the stream) is part of the cost
+        if response.streaming:
+            for _ in response.streaming_content:
+                pass
+        else:
+            response.render()
+        if response.status_code != 200:
+            raise CommandError(f'{action} returned {response.status_code}')
+
+    def measure(self, user, action, params, kwargs, first, last, repeat):
+        timings = []
+        for _ in range(repeat):
+            # Bumping the months' versions forces a cold, uncached computation
+            invalidate_range(first, last)
+            started = time.perf_counter()
+            self.call(user, action, params, kwargs)
+            timings.append((time.perf_counter() - started) * 1000)
+        # A second run without invalidating: served from the cache, except exports
+        started = time.perf_counter()
+        self.call(user, action, params, kwargs)
+        warm_ms = (time.perf_counter() - started) * 1000
+
+        # Counted on a separate run, since tracing allocations slows everything down
+        invalidate_range(first, last)
+        tracemalloc.start()
+        try:
+            with CaptureQueriesContext(connection) as ctx:
+                self.call(user, action, params, kwargs)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        return {'ms': round(median(timings), 1), 'warm_ms': round(warm_ms, 1),
+                'queries': len(ctx.captured_queries), 'peak_mb': round(peak / 2 ** 20, 1)}
+
+    def run(self, options, baseline):
+        self.generate(options)
+        user = User.objects.create(username='bench-reports-admin', email='bench-reports-admin@example.com',
+                                   is_staff=True)
+        last = timezone.localdate()
+        first = last - timedelta(days=options['days'])
+        params = {'start_date': str(first), 'end_date': str(last)}
+        previous = baseline['results'] if baseline else {}
+
+        self.stdout.write(f"{'report':<18}{'ms':>10}{'warm ms':>11}{'queries':>9}{'peak MB':>9}{'vs baseline':>13}")
+        results = {}
+        for name, action, extra, kwargs in CASES:
+            if options['cases'] and name not in options['cases']:
+                continue
+            result = results[name] = self.measure(user, action, {**params, **extra}, kwargs, first, last,
+                                                  options['repeat'])
+            change = f"{result['ms'] / previous[name]['ms'] - 1:+.0%}" if previous.get(name) else '-'
+            self.stdout.write(f"{name:<18}{result['ms']:>10.1f}{result['warm_ms']:>11.1f}"
+                              f"{result['queries']:>9}{result['peak_mb']:>9.1f}{change:>13}")
+        if all(name in results for name in ['dashboard', *DASHBOARD_SECTIONS]):
+            separate = sum(results[name]['ms'] for name in DASHBOARD_SECTIONS)
+            self.stdout.write(f"dashboard: {results['dashboard']['ms']:.1f}ms, "
+                              f"the four reports separately: {separate:.1f}ms")
+        return results
+
+    def regressions(self, results, baseline, tolerance):
+        found = []
+        for name, result in results.items():
+            before = baseline.get(name)
+            if not before:
+                continue
+            if result['ms'] > before['ms'] * (1 + tolerance):
+                found.append(f"{name}: {result['ms']}ms, was {before['ms']}ms")
+            if result['queries'] > before['queries']:
+                found.append(f"{name}: {result['queries']} queries, was {before['queries']}")
+            # Under 1 MB of growth is allocator noise
+            if result['peak_mb'] > max(before['peak_mb'] * (1 + tolerance), before['peak_mb'] + 1):
+                found.append(f"{name}: {result['peak_mb']} MB peak, was {before['peak_mb']} MB")
+        return found
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+from apps.analytics.rollups import compare_daily_sales, order_history_days, rebuild_daily_sales
+from .backfill_sales_rollup import date_option
+
+
+class Command(BaseCommand):
+    help = 'Compare the daily sales rollup with a fresh aggregation of the order table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', type=date_option, help='First day (YYYY-MM-DD), default: first order')
+        parser.add_argument('--end', type=date_option, help='Last day (YYYY-MM-DD), default: last order')
+        parser.add_argument('--fix', action='store_true', help='Rebuild the days that differ')
+
+    def handle(self, *args, **options):
+        first, last = order_history_days()
+        start, end = options['start'] or first, options['end'] or last
+        if start is None or end is None:
+            self.stdout.write('No orders to check')
+            return
+
+        mismatches = compare_daily_sales(start, end)
+        for day, (rollup, raw) in mismatches.items():
+            self.stdout.write(f'{day}: rollup {rollup or (0, 0)} != orders {raw or (0, 0)}')
+            if options['fix']:
+                rebuild_daily_sales(day, day)
+        if mismatches and not options['fix']:
+            raise CommandError(f'{len(mismatches)} day(s) out of sync, run with --fix to rebuild them')
+        self.stdout.write(f'Checked {start} to {end}: {len(mismatches)} day(s) differed')
@@ -0,0 +1,22 @@
+import time
+from django.core.management.base import BaseCommand
+from apps.analytics.jobs import run_pending_jobs
+
+
+class Command(BaseCommand):
+    help = 'Compute queued report jobs'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch', type=int, default=10, help='Jobs run per round')
+        parser.add_argument('--interval', type=float, default=2.0, help='Seconds to sleep when the queue is empty')
+        parser.add_argument('--once', action='store_true', help='Drain the queue and exit')
+
+    def handle(self, *args, **options):
+        while True:
+            handled = run_pending_jobs(limit=options['batch'])
+            if handled:
+                self.stdout.write(f'Ran {handled} report job(s)')
+            elif options['once']:
+                return
+            else:
+                time.sleep(options['interval'])
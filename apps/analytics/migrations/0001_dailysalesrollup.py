@@ -0,0 +1,40 @@
+# Generated by Django 5.2 on 2026-10-18 17:58
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+
+
+def backfill(apps, schema_editor):
+    Order = apps.get_model('apps_orders', 'Order')
+    DailySalesRollup = apps.get_model('apps_analytics', 'DailySalesRollup')
+    days = Order.objects.annotate(date=TruncDate('created_at')).values('date').annotate(
+        revenue=Sum('total_amount'), orders=Count('id')
+    ).order_by()
+    DailySalesRollup.objects.bulk_create([DailySalesRollup(**day) for day in days], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('apps_orders', '0003_order_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailySalesRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(unique=True)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('orders', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'apps_analytics_dailysalesrollup',
+            },
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
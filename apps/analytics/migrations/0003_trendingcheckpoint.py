@@ -0,0 +1,31 @@
+# Generated by Django 5.2 on 2026-10-18 18:24
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apps_analytics', '0002_reportjob'),
+        ('apps_products', '0004_productpicture_status'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrendingCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('worker', models.CharField(max_length=100)),
+                ('bucket', models.DateTimeField()),
+                ('units', models.PositiveIntegerField()),
+                ('error', models.PositiveIntegerField(default=0)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='apps_products.product')),
+            ],
+            options={
+                'db_table': 'apps_analytics_trendingcheckpoint',
+                'indexes': [models.Index(fields=['bucket'], name='trending_bucket_idx')],
+                'unique_together': {('worker', 'bucket', 'product')},
+            },
+        ),
+    ]
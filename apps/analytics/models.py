@@ -1,3 +1,178 @@
-from django.db import models
+from datetime import datetime
+from django.db import IntegrityError, models, transaction
+from django.db.models import F, Q
+from django.db.models.signals import post_delete, post_init, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+from apps.orders.models import Order, OrderItem
+from apps.products.models import Product
+from apps.users.models import User
+from .cache import invalidate_days
+
+
+class DailySalesRollup(models.Model):
+    date = models.DateField(unique=True)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    orders = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'apps_analytics_dailysalesrollup'
+
+    def __str__(self):
+        return f'{self.date}: {self.orders} orders, {self.revenue}'
+
+    @classmethod
+    def apply(cls, day, revenue, orders):
+        """Add (or with negative values, remove) sales to a day's row."""
+        changes = {'revenue': F('revenue') + revenue, 'orders': F('orders') + orders, 'updated_at': timezone.now()}
+        if cls.objects.filter(date=day).update(**changes):
+            return
+        try:
+            with transaction.atomic():
+                cls.objects.create(date=day, revenue=revenue, orders=orders)
+        except IntegrityError:
+            # Another writer created the day first
+            cls.objects.filter(date=day).update(**changes)
+
+
+
+class ReportJob(models.Model):
+    """A report computed in the background by `manage.py run_report_jobs`."""
+    PENDING = 'PENDING'
+    RUNNING = 'RUNNING'
+    READY = 'READY'
+    FAILED = 'FAILED'
+    STATUS_CHOICES = ((PENDING, 'Pending'), (RUNNING, 'Running'), (READY, 'Ready'), (FAILED, 'Failed'))
+    ACTIVE = (PENDING, RUNNING)
+    REPORT_CHOICES = (
+        ('sales', 'Sales'),
+        ('products', 'Products'),
+        ('payment_status', 'Payment status'),
+        ('categories', 'Categories'),
+        ('dashboard', 'Dashboard'),
+    )
+
+    report = models.CharField(max_length=20, choices=REPORT_CHOICES)
+    start_date = models.DateField()
+    end_date = models.DateField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING, db_index=True)
+    requested_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='report_jobs')
+    chunks_done = models.PositiveIntegerField(default=0)
+    chunks_total = models.PositiveIntegerField(default=0)
+    rows = models.PositiveBigIntegerField(default=0)
+    # Media-relative path of the JSON result once READY
+    result = models.CharField(max_length=255, blank=True, default='')
+    error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'apps_analytics_reportjob'
+        constraints = [
+            # At most one pending or running job per set of parameters
+            models.UniqueConstraint(
+                fields=['report', 'start_date', 'end_date'], condition=Q(status__in=['PENDING', 'RUNNING']),
+                name='reportjob_active_unique',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.report} {self.start_date}..{self.end_date} ({self.status})'
+
+
+
+class TrendingCheckpoint(models.Model):
+    """One worker's Space-Saving counters for a time bucket, written by
+    apps.analytics.trending so other workers (and restarts) see its sales."""
+    worker = models.CharField(max_length=100)
+    bucket = models.DateTimeField()
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')
+    units = models.PositiveIntegerField()
+    error = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        db_table = 'apps_analytics_trendingcheckpoint'
+        unique_together = ['worker', 'bucket', 'product']
+        indexes = [models.Index(fields=['bucket'], name='trending_bucket_idx')]
+
+
+class DeletedOrder(models.Model):
+    """Tombstone for a deleted order, so every process's OrderFacts engine
+    drops it on its next refresh. Old rows are pruned by the engine."""
+    order_id = models.BigIntegerField()
+    deleted_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        db_table = 'apps_analytics_deletedorder'
+
+
+def sales_key(created_at, total_amount):
+    # Unsaved orders may not have a timestamp (or hold a plain date) yet
+    if not isinstance(created_at, datetime):
+        return None
+    return timezone.localdate(created_at), total_amount
+
+
+# Saving an order updates the rollup and invalidates cached reports for its
+# days; bulk writes bypass these signals and are picked up by
+# `manage.py backfill_sales_rollup`.
+@receiver(post_init, sender=Order)
+def remember_order_sales(sender, instance, **kwargs):
+    # Deferred fields are skipped: reading them here would cost a query per row
+    if 'created_at' in instance.__dict__ and 'total_amount' in instance.__dict__:
+        instance._rollup_key = sales_key(instance.created_at, instance.total_amount)
+
+
+@receiver(pre_save, sender=Order)
+@receiver(pre_delete, sender=Order)
+def load_order_sales(sender, instance, raw=False, **kwargs):
+    # Only needed when the instance was loaded with those fields deferred
+    if raw or instance._state.adding or hasattr(instance, '_rollup_key'):
+        return
+    stored = Order.objects.filter(pk=instance.pk).values('created_at', 'total_amount').first()
+    instance._rollup_key = sales_key(**stored) if stored else None
+
+
+@receiver(post_save, sender=Order)
+def update_sales_rollup(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    old, new = getattr(instance, '_rollup_key', None), sales_key(instance.created_at, instance.total_amount)
+    # Any change (payment status too) can alter a cached report for those days
+    invalidate_days(*(key[0] for key in (old, new) if key))
+    if old == new and not created:
+        return
+    if old and not created:
+        DailySalesRollup.apply(old[0], -old[1], -1)
+    DailySalesRollup.apply(new[0], new[1], 1)
+    instance._rollup_key = new
+
+
+@receiver(post_delete, sender=Order)
+def remove_from_sales_rollup(sender, instance, **kwargs):
+    key = getattr(instance, '_rollup_key', None)
+    if key:
+        DailySalesRollup.apply(key[0], -key[1], -1)
+        invalidate_days(key[0])
+
+
+@receiver(post_delete, sender=Order)
+def record_deleted_order(sender, instance, **kwargs):
+    DeletedOrder.objects.create(order_id=instance.pk)
+
+
+@receiver(post_save, sender=OrderItem)
+@receiver(post_delete, sender=OrderItem)
+def invalidate_item_reports(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    if OrderItem.order.is_cached(instance):
+        created_at = instance.order.created_at
+    else:
+        created_at = Order.objects.filter(pk=instance.order_id).values_list('created_at', flat=True).first()
+    if isinstance(created_at, datetime):
+        invalidate_days(timezone.localdate(created_at))
 
-# Create your models here.
@@ -0,0 +1,115 @@
+from datetime import timedelta, timezone as datetime_timezone
+from decimal import Decimal
+from django.db import transaction
+from django.db.models import Count, F, Max, Min, Sum
+from django.db.models.functions import TruncDate, TruncHour, TruncMonth, TruncWeek
+from django.utils import timezone
+from apps.orders.models import Order
+from .models import DailySalesRollup
+from .cache import invalidate_range
+from .dates import day_range, local_days
+
+
+def order_history_days():
+    """First and last day with orders, or (None, None) without any."""
+    bounds = Order.objects.aggregate(first=Min('created_at'), last=Max('created_at'))
+    if bounds['first'] is None:
+        return None, None
+    return timezone.localdate(bounds['first']), timezone.localdate(bounds['last'])
+
+
+def orders_by_day(start_date, end_date):
+    """Daily revenue and order counts aggregated from the raw order table."""
+    start, end = day_range(start_date, end_date)
+    return Order.objects.filter(created_at__gte=start, created_at__lt=end).annotate(
+        date=TruncDate('created_at')
+    ).values('date').annotate(revenue=Sum('total_amount'), orders=Count('id')).order_by()
+
+
+def daily_sales_from_orders(start_date, end_date):
+    return {row['date']: (row['revenue'], row['orders']) for row in orders_by_day(start_date, end_date)}
+
+
+def daily_sales_from_rollup(start_date, end_date):
+    first, last = local_days(start_date, end_date)
+    rows = DailySalesRollup.objects.filter(date__gte=first, date__lte=last, orders__gt=0)
+    return {row.date: (row.revenue, row.orders) for row in rows}
+
+
+GRANULARITIES = ('hour', 'day', 'week', 'month')
+# Hourly buckets come from the order table, so their range is kept short
+MAX_HOURLY_DAYS = 31
+
+
+def bucket_starts(first, last, granularity):
+    """Start of every bucket overlapping the days first..last: aware local
+    datetimes for hours, dates (Monday for weeks, the 1st for months) otherwise."""
+    if granularity == 'hour':
+        # Stepped in UTC so DST changes neither skip nor repeat an hour
+        start, end = (moment.astimezone(datetime_timezone.utc) for moment in day_range(first, last))
+        hours = int((end - start).total_seconds() // 3600)
+        return [timezone.localtime(start + timedelta(hours=n)) for n in range(hours)]
+    if granularity == 'week':
+        first -= timedelta(days=first.weekday())
+        step = timedelta(days=7)
+    elif granularity == 'month':
+        first = first.replace(day=1)
+    else:
+        step = timedelta(days=1)
+    starts = []
+    while first <= last:
+        starts.append(first)
+        if granularity == 'month':
+            first = (first.replace(day=28) + timedelta(days=4)).replace(day=1)
+        else:
+            first += step
+    return starts
+
+
+def sales_by_bucket(start_date, end_date, granularity):
+    """Revenue and order count per hour, day, week or month, with a zero
+    row for every empty bucket. Days, weeks and months are summed from the
+    daily rollup in the database; hours are grouped from the orders."""
+    first, last = local_days(start_date, end_date)
+    if granularity == 'hour':
+        start, end = day_range(first, last)
+        rows = Order.objects.filter(created_at__gte=start, created_at__lt=end).annotate(
+            bucket=TruncHour('created_at')
+        ).values('bucket').annotate(revenue=Sum('total_amount'), orders=Count('id')).order_by()
+    else:
+        trunc = {'day': F('date'), 'week': TruncWeek('date'), 'month': TruncMonth('date')}[granularity]
+        rows = DailySalesRollup.objects.filter(date__gte=first, date__lte=last).annotate(
+            bucket=trunc
+        ).values('bucket').annotate(revenue=Sum('revenue'), orders=Sum('orders')).order_by()
+    totals = {row['bucket']: (row['revenue'], row['orders']) for row in rows}
+    buckets = []
+    for bucket in bucket_starts(first, last, granularity):
+        revenue, orders = totals.get(bucket, (Decimal(0), 0))
+        buckets.append({'date': bucket, 'revenue': revenue, 'orders': orders})
+    return buckets
+
+
+@transaction.atomic
+def rebuild_daily_sales(start_date, end_date):
+    """Recompute the rollup rows for start_date..end_date from the orders.
+    Returns the number of days with sales."""
+    first, last = local_days(start_date, end_date)
+    days = daily_sales_from_orders(first, last)
+    DailySalesRollup.objects.filter(date__gte=first, date__lte=last).delete()
+    DailySalesRollup.objects.bulk_create([
+        DailySalesRollup(date=day, revenue=revenue, orders=orders) for day, (revenue, orders) in days.items()
+    ], batch_size=1000)
+    invalidate_range(first, last)
+    return len(days)
+
+
+def compare_daily_sales(start_date, end_date):
+    """Days on which the rollup and the raw aggregation disagree, as
+    {date: (rollup, raw)} with (revenue, orders) pairs or None."""
+    rollup = daily_sales_from_rollup(start_date, end_date)
+    raw = daily_sales_from_orders(start_date, end_date)
+    return {
+        day: (rollup.get(day), raw.get(day))
+        for day in sorted(rollup.keys() | raw.keys())
+        if rollup.get(day) != raw.get(day)
+    }
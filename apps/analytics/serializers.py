@@ -1,24 +1,29 @@
 from rest_framework import serializers
-from django.db.models import Sum, Count, F, Q, ExpressionWrapper, DecimalField
+from django.db.models import Sum, Count, F, ExpressionWrapper, DecimalField
 from apps.orders.models import Order, OrderItem
-from django.db.models.functions import TruncDate
-from apps.categories.models import Category
+from django.utils import timezone
+from datetime import timedelta
+from .models import DailySalesRollup, ReportJob
+from .dates import day_range, local_days
+from .rollups import sales_by_bucket
+from .category_sales import category_report
+
 
 class SalesReportSerializer(serializers.Serializer):
     date = serializers.DateField()
     revenue = serializers.DecimalField(max_digits=10, decimal_places=2)
     orders = serializers.IntegerField()
 
-    def get_queryset(self, start_date, end_date):
-        return Order.objects.filter(
-                    created_at__date__gte=start_date,
-                    created_at__date__lte=end_date
-                ).annotate(
-                    date=TruncDate('created_at')
-                ).values('date').annotate(
-                    revenue=Sum('total_amount'),
-                    orders=Count('id')
-                ).order_by('date')
+    def get_queryset(self, start_date, end_date, granularity=None):
+        if granularity:
+            return sales_by_bucket(start_date, end_date, granularity)
+        # One row per day from the rollup, however many orders the range holds
+        first, last = local_days(start_date, end_date)
+        return DailySalesRollup.objects.filter(
+                    date__gte=first,
+                    date__lte=last,
+                    orders__gt=0
+                ).values('date', 'revenue', 'orders').order_by('date')
 
     def to_representation(self, instance):
         return {
@@ -34,9 +39,10 @@ class ProductPopularitySerializer(serializers.Serializer):
     revenue = serializers.DecimalField(max_digits=10, decimal_places=2)
 
     def get_queryset(self, start_date, end_date):
+        start, end = day_range(start_date, end_date)
         return OrderItem.objects.filter(
-            order__created_at__date__gte=start_date,
-            order__created_at__date__lte=end_date
+            order__created_at__gte=start,
+            order__created_at__lt=end
         ).annotate(
             product_name=F('product__goods_name')
         ).values(
@@ -64,16 +70,14 @@ class PaymentStatusSerializer(serializers.Serializer):
     percentage = serializers.FloatField()
 
     def get_queryset(self, start_date, end_date):
-        total_orders = Order.objects.filter(
-            created_at__date__gte=start_date,
-            created_at__date__lte=end_date
-        ).count()
-        queryset = Order.objects.filter(
-            created_at__date__gte=start_date,
-            created_at__date__lte=end_date
+        start, end = day_range(start_date, end_date)
+        queryset = list(Order.objects.filter(
+            created_at__gte=start,
+            created_at__lt=end
         ).values('payment_status').annotate(
             order_count=Count('id')
-        )
+        ).order_by('payment_status'))
+        total_orders = sum(item['order_count'] for item in queryset)
         for item in queryset:
             item['percentage'] = (item['order_count'] / total_orders * 100) if total_orders else 0
         return queryset
@@ -90,27 +94,41 @@ class ProductCategoryReportSerializer(serializers.Serializer):
     category_name = serializers.CharField()
     total_sales = serializers.DecimalField(max_digits=10, decimal_places=2)
     order_count = serializers.IntegerField()
+    product_count = serializers.IntegerField()
+    total_quantity = serializers.IntegerField()
+
+    def get_queryset(self, start_date, end_date):
+        # Subtree totals, from the same source as the tree, level and dashboard views
+        return category_report(start_date, end_date)
+
+    def to_representation(self, instance):
+        return {
+            'category_id': instance['category_id'],
+            'category_name': instance['category_name'],
+            'total_sales': instance['total_sales'],
+            'order_count': instance['order_count'],
+            'product_count': instance['product_count'],
+            'total_quantity': instance['total_quantity']
+        }
+
+
+class ReportJobSerializer(serializers.ModelSerializer):
+    start_date = serializers.DateField(required=False)
+    end_date = serializers.DateField(required=False)
 
-    def get_queryset(self, start_date, end_date):       
-        return Category.objects.filter(
-            is_deleted=False,
-            products__order_items__order__created_at__date__gte=start_date,
-            products__order_items__order__created_at__date__lte=end_date
-
-            ).annotate(
-                
-            category_id=F('id'),
-            category_name=F('name'),
-            total_sales=Sum(F('products__order_items__unit_price') * F('products__order_items__quantity')),
-            order_count=Count('products__order_items__order', distinct=True),
-            product_count=Count('products',distinct=True, filter=Q(products__is_deleted=False)),
-            total_quantity=Sum('products__order_items__quantity')            
-            ).values(
-            'category_id',
-            'category_name',
-            'total_sales',
-            'order_count',
-            'product_count',
-            'total_quantity'
-        ).order_by('-total_sales')
+    class Meta:
+        model = ReportJob
+        fields = ['id', 'report', 'start_date', 'end_date', 'status', 'chunks_done', 'chunks_total',
+                  'rows', 'error', 'created_at', 'started_at', 'finished_at']
+        read_only_fields = ['status', 'chunks_done', 'chunks_total', 'rows', 'error',
+                            'created_at', 'started_at', 'finished_at']
+        # A duplicate of an active job is not an error: submit_job hands back the existing one
+        validators = []
 
+    def validate(self, attrs):
+        # Same defaults as the synchronous reports: the last 30 days
+        attrs.setdefault('end_date', timezone.localdate())
+        attrs.setdefault('start_date', attrs['end_date'] - timedelta(days=30))
+        if attrs['start_date'] > attrs['end_date']:
+            raise serializers.ValidationError({'start_date': 'start_date cannot be after end_date.'})
+        return attrs
@@ -0,0 +1,99 @@
+import random
+from datetime import timedelta
+from decimal import Decimal
+from django.utils import timezone
+from apps.core.bulk import bulk_update_values
+from apps.analytics.rollups import rebuild_daily_sales
+from apps.categories.models import Category
+from apps.categories.tree import rebuild_paths
+from apps.orders.models import Order, OrderItem
+from apps.products.models import Product
+from apps.users.models import User
+
+PAYMENT_STATUSES = ['PAID', 'PENDING', 'FAILED']
+PAYMENT_WEIGHTS = [80, 15, 5]
+
+
+def zipf_weights(count):
+    return [1 / (rank + 1) for rank in range(count)]
+
+
+def generate_orders(count, days=365, end=None, users=50, products=200, max_items=3, seed=0, batch_size=5000):
+    """Bulk-insert `count` synthetic orders for benchmarks and query-plan tests.
+
+    Orders are spread uniformly over the `days` before `end` (default: now),
+    and items are drawn from `products` new products with a Zipf-like skew,
+    so a few products sell far more than the rest; customers are skewed the
+    same way, so a few of them place most orders. The daily sales rollup is
+    rebuilt for the range, since bulk inserts bypass its signals. Returns
+    the products.
+    """
+    rng = random.Random(seed)
+    end = end or timezone.now()
+    span = days * 86400
+    customers = User.objects.bulk_create([
+        User(username=f'synthetic-{seed}-{n}', email=f'synthetic-{seed}-{n}@example.com') for n in range(users)
+    ])
+    catalog = Product.objects.bulk_create([
+        Product(goods_name=f'Synthetic product {seed}-{n}', goods_price=Decimal(rng.randint(100, 50000)) / 100,
+                goods_quantity=1000, goods_weight=1)
+        for n in range(products)
+    ])
+    weights = zipf_weights(len(catalog))
+    customer_weights = zipf_weights(len(customers))
+
+    for offset in range(0, count, batch_size):
+        size = min(batch_size, count - offset)
+        baskets = [
+            [(product, rng.randint(1, 5)) for product in rng.choices(catalog, weights, k=rng.randint(1, max_items))]
+            for _ in range(size)
+        ]
+        orders = Order.objects.bulk_create([
+            Order(
+                user=rng.choices(customers, customer_weights)[0],
+                order_number=f'SYN-{seed}-{offset + n}',
+                total_amount=sum(product.goods_price * quantity for product, quantity in basket),
+                payment_status=rng.choices(PAYMENT_STATUSES, PAYMENT_WEIGHTS)[0],
+                shipping_address='1 Synthetic St',
+            )
+            for n, basket in enumerate(baskets)
+        ])
+        # created_at is auto_now_add, so the spread is applied after the insert
+        for order in orders:
+            order.created_at = end - timedelta(seconds=rng.uniform(0, span))
+        bulk_update_values(Order, orders, ['created_at'])
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, product=product, quantity=quantity, unit_price=product.goods_price)
+            for order, basket in zip(orders, baskets)
+            for product, quantity in basket
+        ])
+    rebuild_daily_sales(end - timedelta(seconds=span), end)
+    return catalog
+
+
+def generate_categories(products, count=50, roots=5, max_per_product=2, seed=0, batch_size=5000):
+    """Bulk-insert `count` synthetic categories and link `products` to them.
+
+    The first `roots` categories are top level and the rest are spread under
+    them. Each product gets 1 to `max_per_product` categories drawn with a
+    Zipf-like skew, so a few categories hold most of the catalog. Returns
+    the categories.
+    """
+    rng = random.Random(seed)
+    parents = Category.objects.bulk_create([
+        Category(name=f'Synthetic category {seed}-{n}') for n in range(min(roots, count))
+    ])
+    children = Category.objects.bulk_create([
+        Category(name=f'Synthetic category {seed}-{n}', parent=parents[n % len(parents)], level=2)
+        for n in range(len(parents), count)
+    ])
+    rebuild_paths()
+    categories = parents + children
+    weights = zipf_weights(len(categories))
+    links = Product.categories.through
+    rows = []
+    for product in products:
+        picked = set(rng.choices(categories, weights, k=rng.randint(1, max_per_product)))
+        rows.extend(links(product_id=product.id, category_id=category.id) for category in picked)
+    links.objects.bulk_create(rows, batch_size=batch_size)
+    return categories
@@ -1,4 +1,5 @@
 import pytest
+from django.core.cache import cache
 from rest_framework.test import APIClient
 from pytest_factoryboy import register
 from apps.analytics.tests.factories import UserFactory, CategoryFactory, ProductFactory, OrderFactory, OrderItemFactory
@@ -20,4 +21,11 @@ def admin_client(api_client, user_factory):
     """Authenticated API client with an admin user"""
     user = user_factory(is_staff=True)
     api_client.force_authenticate(user=user)
-    return api_client
\ No newline at end of file
+    return api_client
+
+@pytest.fixture(autouse=True)
+def clear_cache(settings):
+    """Cached reports must not leak between tests: the database is rolled back, the cache is not.
+    Each test gets an empty in-memory cache, so the configured Redis is never flushed."""
+    settings.CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'tests'}}
+    cache.clear()
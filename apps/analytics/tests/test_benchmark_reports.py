@@ -0,0 +1,49 @@
+import io
+import json
+import pytest
+from django.core.management import CommandError, call_command
+from apps.analytics.synthetic import generate_categories, generate_orders
+from apps.categories.models import Category
+from apps.orders.models import Order
+
+SMALL = ['--items', '200', '--days', '10', '--products', '8', '--categories', '6', '--users', '5', '--repeat', '1']
+
+
+class TestSyntheticData:
+
+    @pytest.mark.django_db
+    def test_categories_are_skewed_and_nested(self):
+        products = generate_orders(50, days=5, users=3, products=40)
+        categories = generate_categories(products, count=10, roots=2)
+
+        sizes = [category.products.count() for category in categories]
+        assert all(1 <= product.categories.count() <= 2 for product in products)
+        assert sizes[0] > sizes[-1]
+        assert Category.objects.filter(parent__isnull=True).count() == 2
+        assert Category.objects.filter(level=2).count() == 8
+
+
+class TestBenchmarkReports:
+
+    @pytest.mark.django_db
+    def test_compares_with_the_saved_baseline(self, tmp_path):
+        path = tmp_path / 'baseline.json'
+        out = io.StringIO()
+        call_command('benchmark_reports', *SMALL, '--save-baseline', str(path), stdout=out)
+        assert 'the four reports separately' in out.getvalue()
+
+        baseline = json.loads(path.read_text())
+        assert baseline['scale']['items'] == 200
+        assert set(baseline['results']) >= {'sales', 'products', 'categories', 'dashboard'}
+        assert all(result['queries'] >= 1 for result in baseline['results'].values())
+        # Synthetic rows are rolled back
+        assert not Order.objects.exists()
+
+        for result in baseline['results'].values():
+            result['ms'], result['queries'] = 0.001, 0
+        path.write_text(json.dumps(baseline))
+        with pytest.raises(CommandError, match='Regressions'):
+            call_command('benchmark_reports', *SMALL, '--baseline', str(path))
+
+        with pytest.raises(CommandError, match='recorded at'):
+            call_command('benchmark_reports', *SMALL, '--seed', '1', '--baseline', str(path))
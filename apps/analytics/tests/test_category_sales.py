@@ -0,0 +1,101 @@
+import json
+import pytest
+from datetime import timedelta
+from decimal import Decimal
+from django.utils import timezone
+from apps.analytics.category_sales import subtree_totals
+from apps.analytics.engine import OrderFacts
+
+
+@pytest.fixture
+def catalog(category_factory, product_factory, order_factory, order_item_factory):
+    """Electronics > Computers > Laptops/Phones, plus Garden; the laptop is
+    in both Computers and Laptops, the tablet in both Laptops and Phones."""
+    electronics = category_factory(name='Electronics', level=1)
+    computers = category_factory(name='Computers', parent=electronics, level=2)
+    laptops = category_factory(name='Laptops', parent=computers, level=3)
+    phones = category_factory(name='Phones', parent=computers, level=3)
+    garden = category_factory(name='Garden', level=1)
+    category_factory(name='Empty', parent=garden, level=2)
+    laptop, phone, tablet, hose = (product_factory(goods_name=name) for name in ('Laptop', 'Phone', 'Tablet', 'Hose'))
+    laptop.categories.set([computers, laptops])
+    phone.categories.set([phones])
+    tablet.categories.set([laptops, phones])
+    hose.categories.set([garden])
+
+    order = order_factory()
+    for product, quantity, price in ((laptop, 1, '1000.00'), (phone, 2, '300.00'), (tablet, 1, '400.00'),
+                                     (hose, 3, '10.00')):
+        order_item_factory(order=order, product=product, quantity=quantity, unit_price=Decimal(price))
+    return {'electronics': electronics, 'computers': computers, 'laptops': laptops, 'phones': phones,
+            'garden': garden}
+
+
+def totals(row):
+    return row['total_sales'], row['total_quantity'], row['product_count']
+
+
+class TestCategorySales:
+
+    @pytest.mark.django_db
+    def test_subtrees_count_each_product_once(self, catalog, django_assert_num_queries):
+        today = timezone.localdate()
+        # Items, categories, and the sold products' category links
+        with django_assert_num_queries(3):
+            nodes = subtree_totals(today, today)
+
+        assert totals(nodes[catalog['laptops'].id]) == (Decimal('1400.00'), 2, 2)
+        assert totals(nodes[catalog['phones'].id]) == (Decimal('1000.00'), 3, 2)
+        # Laptop and tablet are attached twice inside these subtrees
+        assert totals(nodes[catalog['computers'].id]) == (Decimal('2000.00'), 4, 3)
+        assert totals(nodes[catalog['electronics'].id]) == (Decimal('2000.00'), 4, 3)
+        assert totals(nodes[catalog['garden'].id]) == (Decimal('30.00'), 3, 1)
+
+    @pytest.mark.django_db
+    def test_every_category_report_has_subtree_totals(self, admin_client, catalog):
+        today = timezone.localdate()
+        query = f'start_date={today}&end_date={today}'
+        expected = {catalog[name].id: total for name, total in (
+            ('electronics', (Decimal('2000.00'), 4, 3)), ('computers', (Decimal('2000.00'), 4, 3)),
+            ('laptops', (Decimal('1400.00'), 2, 2)), ('phones', (Decimal('1000.00'), 3, 2)),
+            ('garden', (Decimal('30.00'), 3, 1)),
+        )}
+
+        flat = admin_client.get(f'/api/private/v1/reports/categories/?{query}').data['data']
+        dashboard = admin_client.get(f'/api/private/v1/reports/dashboard/?{query}').data['data']['categories']
+        export = admin_client.get(f'/api/private/v1/reports/categories/export.ndjson?{query}')
+        exported = [json.loads(line) for line in b''.join(export.streaming_content).decode().splitlines()]
+        for row in exported:
+            row['total_sales'] = Decimal(row['total_sales'])
+        numpy = OrderFacts().report('categories', today, today)
+
+        for rows in (flat, dashboard, exported, numpy):
+            assert {row['category_id']: totals(row) for row in rows} == expected
+            assert all(row['order_count'] == 1 for row in rows)
+
+    @pytest.mark.django_db
+    def test_tree_and_level_views(self, admin_client, catalog):
+        today = timezone.localdate()
+        url = f'/api/private/v1/reports/categories/?start_date={today}&end_date={today}'
+
+        tree = admin_client.get(f'{url}&view=tree').data
+        assert tree['meta']['view'] == 'tree'
+        assert [node['category_name'] for node in tree['data']] == ['Electronics', 'Garden']
+        computers = tree['data'][0]['children'][0]
+        assert [child['category_name'] for child in computers['children']] == ['Laptops', 'Phones']
+        # Subtrees without sales are left out
+        assert tree['data'][1]['children'] == []
+
+        level = admin_client.get(f'{url}&level=3').data['data']
+        assert [(row['category_name'], row['total_sales']) for row in level] == \
+            [('Laptops', Decimal('1400.00')), ('Phones', Decimal('1000.00'))]
+
+    @pytest.mark.django_db
+    def test_invalid_view(self, admin_client):
+        url = '/api/private/v1/reports/categories/'
+        assert admin_client.get(f'{url}?view=graph').status_code == 400
+        assert admin_client.get(f'{url}?level=4').status_code == 400
+        assert admin_client.get(f'{url}?view=tree&level=1').status_code == 400
+        assert admin_client.get(f'{url}?view=tree&engine=numpy').status_code == 400
+        old = timezone.localdate() - timedelta(days=400)
+        assert admin_client.get(f'{url}?view=tree&start_date={old}').data['data'] == []
@@ -0,0 +1,58 @@
+import pytest
+from datetime import timedelta
+from decimal import Decimal
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from apps.analytics.synthetic import generate_orders
+from apps.categories.models import Category
+from apps.products.models import Product
+
+REPORTS = ['sales', 'products', 'payment_status', 'categories']
+
+
+def comparable(rows, key):
+    # SQLite sums decimals as floats, so money is compared to the cent
+    def normalize(value):
+        return f'{value:.2f}' if isinstance(value, (Decimal, float)) else str(value)
+    return sorted(({name: normalize(value) for name, value in row.items()} for row in rows), key=lambda row: row[key])
+
+
+class TestDashboard:
+
+    @pytest.mark.django_db
+    def test_dashboard_matches_the_individual_reports(self, admin_client):
+        products = generate_orders(300, days=20, users=3, products=12)
+        shoes, hats = Category.objects.create(name='Shoes'), Category.objects.create(name='Hats')
+        for n, product in enumerate(products):
+            product.categories.set([shoes, hats] if n % 3 == 0 else [shoes])
+        Product.objects.filter(pk=products[0].pk).update(is_deleted=True)
+        end = timezone.localdate()
+        query = f'start_date={end - timedelta(days=10)}&end_date={end}'
+
+        with CaptureQueriesContext(connection) as ctx:
+            dashboard = admin_client.get(f'/api/private/v1/reports/dashboard/?{query}')
+        order_scans = [q for q in ctx.captured_queries if 'FROM "apps_orders_order"' in q['sql']]
+        item_scans = [q for q in ctx.captured_queries if 'FROM "apps_orders_orderitem"' in q['sql']]
+        with CaptureQueriesContext(connection) as separate_ctx:
+            separate = {name: admin_client.get(f'/api/private/v1/reports/{name}/?{query}').data['data']
+                        for name in REPORTS}
+        separate_item_scans = [q for q in separate_ctx.captured_queries if '"apps_orders_orderitem"' in q['sql']]
+
+        assert dashboard.status_code == 200
+        data = dashboard.data['data']
+        keys = {'sales': 'date', 'products': 'product_id', 'payment_status': 'status', 'categories': 'category_id'}
+        for name in REPORTS:
+            assert comparable(data[name], keys[name]) == comparable(separate[name], keys[name]), name
+        assert set(dashboard.data['meta']['timings_ms']) == {'fetch', *REPORTS}
+        assert len(order_scans) == len(item_scans) == 1
+        # The items are read once, where the products and categories reports each read them
+        assert len(separate_item_scans) > len(item_scans)
+
+    @pytest.mark.django_db
+    def test_empty_range(self, admin_client):
+        response = admin_client.get('/api/private/v1/reports/dashboard/?start_date=2024-01-01&end_date=2024-01-31')
+
+        assert response.status_code == 200
+        assert response.data['data'] == {name: [] for name in REPORTS}
+        assert response.data['meta']['rows'] == 0
@@ -0,0 +1,85 @@
+import pytest
+from datetime import timedelta
+from decimal import Decimal
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from apps.analytics.engine import OrderFacts, engine
+from apps.analytics.synthetic import generate_orders
+from apps.analytics.tests.test_dashboard import comparable
+from apps.categories.models import Category
+from apps.orders.models import Order
+from apps.products.models import Product
+
+REPORTS = {'sales': 'date', 'products': 'product_id', 'payment_status': 'status', 'categories': 'category_id'}
+
+
+@pytest.fixture(autouse=True)
+def empty_engine():
+    # The database is rolled back between tests, the process-wide engine is not
+    engine.clear()
+    yield
+    engine.clear()
+
+
+class TestOrderFacts:
+
+    @pytest.mark.django_db
+    def test_reports_match_the_orm(self, admin_client):
+        products = generate_orders(400, days=30, users=3, products=15)
+        shoes, hats = Category.objects.create(name='Shoes'), Category.objects.create(name='Hats')
+        for n, product in enumerate(products):
+            product.categories.set([shoes, hats] if n % 3 == 0 else [shoes])
+        Product.objects.filter(pk=products[0].pk).update(is_deleted=True)
+        end = timezone.localdate()
+        query = f'start_date={end - timedelta(days=20)}&end_date={end}'
+
+        for report, key in REPORTS.items():
+            orm = admin_client.get(f'/api/private/v1/reports/{report}/?{query}').data
+            numpy = admin_client.get(f'/api/private/v1/reports/{report}/?{query}&engine=numpy').data
+            assert numpy['meta']['engine'] == 'numpy'
+            assert comparable(numpy['data'], key) == comparable(orm['data'], key), report
+
+        # Only the sold products' category links are read, never the whole catalog
+        with CaptureQueriesContext(connection) as ctx:
+            engine.categories(end - timedelta(days=20), end)
+        catalog = [q['sql'] for q in ctx.captured_queries if 'apps_products_product' in q['sql']]
+        assert catalog and all(' IN (' in sql for sql in catalog)
+
+    @pytest.mark.django_db
+    def test_refresh_reads_only_changed_orders(self, order_factory, order_item_factory):
+        first = order_factory(total_amount=Decimal('10.00'))
+        order_item_factory(order=first, quantity=2, unit_price=Decimal('5.00'))
+        facts = OrderFacts()
+        today = timezone.localdate()
+        assert facts.report('sales', today, today)[0]['revenue'] == Decimal('10.00')
+
+        second = order_factory(total_amount=Decimal('2.50'))
+        order_item_factory(order=second, quantity=1, unit_price=Decimal('2.50'))
+        first.payment_status = 'PAID'
+        first.save()
+        with CaptureQueriesContext(connection) as ctx:
+            facts.refresh()
+        order_reads = [q['sql'] for q in ctx.captured_queries if 'FROM "apps_orders_order"' in q['sql']]
+        item_reads = [q['sql'] for q in ctx.captured_queries if 'FROM "apps_orders_orderitem"' in q['sql']]
+        assert order_reads and all('"updated_at" >=' in sql for sql in order_reads)
+        assert item_reads and all(' IN (' in sql for sql in item_reads)
+
+        assert facts.sales(today, today) == [{'date': today, 'revenue': Decimal('12.50'), 'orders': 2}]
+        assert {row['status']: row['order_count'] for row in facts.payment_status(today, today)} == \
+            {'PAID': 1, 'PENDING': 1}
+        assert sum(row['units_sold'] for row in facts.products(today, today)) == 3
+
+        Order.objects.filter(pk=second.pk).delete()
+        with CaptureQueriesContext(connection) as ctx:
+            assert facts.report('sales', today, today)[0]['orders'] == 1
+        # The delete left a tombstone: no COUNT and no reload
+        assert not [q for q in ctx.captured_queries if 'COUNT' in q['sql']]
+        assert all(' IN (' in q['sql'] for q in ctx.captured_queries if 'FROM "apps_orders_orderitem"' in q['sql'])
+        assert len(facts.item_order) == 1
+        assert list(facts.order_id) == [first.pk]
+
+    @pytest.mark.django_db
+    def test_invalid_engine(self, admin_client):
+        assert admin_client.get('/api/private/v1/reports/products/?engine=pandas').status_code == 400
+        assert admin_client.get('/api/private/v1/reports/sales/?engine=numpy&granularity=week').status_code == 400
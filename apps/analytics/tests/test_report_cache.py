@@ -0,0 +1,43 @@
+import pytest
+from datetime import datetime
+from django.utils import timezone
+
+URL = '/api/private/v1/reports/payment_status/'
+
+
+class TestReportCache:
+
+    def report(self, client, query):
+        response = client.get(f'{URL}?{query}')
+        assert response.status_code == 200
+        return response.data
+
+    @pytest.mark.django_db
+    def test_key_ignores_parameter_order(self, admin_client):
+        first = self.report(admin_client, 'start_date=2025-05-01&end_date=2025-05-20')
+        second = self.report(admin_client, 'end_date=2025-05-20&start_date=2025-05-01')
+
+        assert first['meta']['cached'] is False
+        assert second['meta']['cached'] is True
+
+    @pytest.mark.django_db
+    def test_order_writes_invalidate_only_their_months(self, admin_client, order_factory, django_capture_on_commit_callbacks):
+        may = 'start_date=2025-05-01&end_date=2025-05-20'
+        order = order_factory(payment_status='PAID')
+        self.report(admin_client, may)
+
+        order_factory(payment_status='PAID')
+        assert self.report(admin_client, may)['meta']['cached'] is True
+
+        with django_capture_on_commit_callbacks(execute=True) as callbacks:
+            order.created_at = timezone.make_aware(datetime(2025, 5, 10))
+            order.save()
+        fresh = self.report(admin_client, may)
+
+        assert callbacks
+        assert fresh['meta']['cached'] is False
+        assert [row['order_count'] for row in fresh['data']] == [1]
+
+        order.payment_status = 'FAILED'
+        order.save()
+        assert self.report(admin_client, may)['data'][0]['status'] == 'FAILED'
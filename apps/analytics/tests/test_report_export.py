@@ -0,0 +1,49 @@
+import csv
+import io
+import json
+import pytest
+from datetime import timedelta
+from django.utils import timezone
+from apps.analytics.synthetic import generate_orders
+
+REPORTS = {'sales': 'date', 'products': 'product_id', 'payment_status': 'status', 'categories': 'category_id'}
+
+
+class TestReportExport:
+
+    @pytest.mark.django_db
+    @pytest.mark.parametrize('report', REPORTS)
+    def test_csv_matches_the_report(self, admin_client, report):
+        generate_orders(200, days=10, users=3, products=8)
+        end = timezone.localdate()
+        query = f'start_date={end - timedelta(days=10)}&end_date={end}'
+
+        response = admin_client.get(f'/api/private/v1/reports/{report}/export.csv?{query}')
+        body = b''.join(response.streaming_content).decode()
+
+        assert response.status_code == 200
+        assert response['Content-Disposition'] == (
+            f'attachment; filename="{report}-{end - timedelta(days=10)}-{end}.csv"'
+        )
+        rows = list(csv.DictReader(io.StringIO(body)))
+        expected = admin_client.get(f'/api/private/v1/reports/{report}/?{query}').data['data']
+        # csv writes str() of each value
+        expected = [{field: str(value) for field, value in row.items()} for row in expected]
+        key = REPORTS[report]
+        assert sorted(rows, key=lambda row: row[key]) == sorted(expected, key=lambda row: row[key])
+
+    @pytest.mark.django_db
+    def test_ndjson(self, admin_client):
+        generate_orders(50, days=5, users=2, products=4)
+
+        response = admin_client.get('/api/private/v1/reports/products/export.ndjson')
+
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        assert set(rows[0]) == {'product_id', 'product_name', 'units_sold', 'revenue'}
+        assert sum(row['units_sold'] for row in rows) > 0
+
+    @pytest.mark.django_db
+    def test_invalid_dates(self, admin_client):
+        response = admin_client.get('/api/private/v1/reports/sales/export.csv?start_date=nope')
+
+        assert response.status_code == 400
@@ -0,0 +1,134 @@
+import json
+import pytest
+from datetime import date, timedelta
+from django.core.management import call_command
+from django.utils import timezone
+from apps.analytics import jobs
+from apps.analytics.jobs import claim_job, month_chunks, requeue_stale_jobs, run_job
+from apps.analytics.models import ReportJob
+from apps.analytics.synthetic import generate_orders
+from apps.analytics.tests.test_dashboard import comparable
+
+JOBS_URL = '/api/private/v1/reports/jobs/'
+
+
+@pytest.fixture(autouse=True)
+def media(settings, tmp_path):
+    settings.MEDIA_ROOT = tmp_path
+    return tmp_path
+
+
+class TestReportJobs:
+
+    def test_month_chunks(self):
+        assert month_chunks(date(2024, 1, 15), date(2024, 3, 2)) == [
+            (date(2024, 1, 15), date(2024, 1, 31)),
+            (date(2024, 2, 1), date(2024, 2, 29)),
+            (date(2024, 3, 1), date(2024, 3, 2)),
+        ]
+        assert month_chunks(date(2024, 12, 31), date(2024, 12, 31)) == [(date(2024, 12, 31), date(2024, 12, 31))]
+
+    @pytest.mark.django_db
+    def test_identical_jobs_are_deduplicated_while_active(self, admin_client):
+        params = {'report': 'products', 'start_date': '2024-01-01', 'end_date': '2024-06-30'}
+
+        first = admin_client.post(JOBS_URL, params, format='json')
+        second = admin_client.post(JOBS_URL, params, format='json')
+        other = admin_client.post(JOBS_URL, {**params, 'report': 'sales'}, format='json')
+
+        assert first.status_code == 202
+        assert first.data['data']['status'] == 'PENDING'
+        assert first.data['data']['chunks_total'] == 6
+        assert second.data['data']['id'] == first.data['data']['id']
+        assert second.data['meta']['deduplicated'] is True
+        assert other.data['data']['id'] != first.data['data']['id']
+
+        call_command('run_report_jobs', '--once')
+        again = admin_client.post(JOBS_URL, params, format='json')
+        assert again.data['meta']['deduplicated'] is False
+        assert again.data['data']['id'] != first.data['data']['id']
+
+    @pytest.mark.django_db
+    def test_job_result_matches_the_synchronous_report(self, admin_client):
+        generate_orders(400, days=75, users=3, products=10)
+        end = timezone.localdate()
+        start = end - timedelta(days=70)
+        job = admin_client.post(JOBS_URL, {'report': 'dashboard', 'start_date': str(start), 'end_date': str(end)},
+                                format='json').data['data']
+
+        assert admin_client.get(f'{JOBS_URL}{job["id"]}/download/').status_code == 409
+        call_command('run_report_jobs', '--once')
+
+        status = admin_client.get(f'{JOBS_URL}{job["id"]}/').data['data']
+        assert status['status'] == 'READY'
+        assert status['chunks_done'] == status['chunks_total'] > 1
+        download = admin_client.get(f'{JOBS_URL}{job["id"]}/download/')
+        assert download.status_code == 200
+        result = json.loads(b''.join(download.streaming_content))
+        dashboard = admin_client.get(f'/api/private/v1/reports/dashboard/?start_date={start}&end_date={end}').data
+        assert result['rows'] == dashboard['meta']['rows']
+        # Same rows once dates and decimals have gone through JSON
+        for name, key in [('sales', 'date'), ('products', 'product_id'), ('payment_status', 'status')]:
+            expected = [{k: float(v) if k == 'revenue' else v for k, v in row.items()} for row in dashboard['data'][name]]
+            assert comparable(result['data'][name], key) == comparable(expected, key), name
+
+    @pytest.mark.django_db
+    def test_invalid_range(self, admin_client):
+        response = admin_client.post(JOBS_URL, {'report': 'sales', 'start_date': '2024-02-01', 'end_date': '2024-01-01'},
+                                     format='json')
+
+        assert response.status_code == 400
+        assert 'start_date' in response.data['errors']
+
+    @pytest.mark.django_db
+    def test_failed_job(self, admin_client, monkeypatch):
+        def broken(*args):
+            raise RuntimeError('database went away')
+        monkeypatch.setattr(jobs.Scan, 'read', broken)
+        job = admin_client.post(JOBS_URL, {'report': 'sales'}, format='json').data['data']
+
+        call_command('run_report_jobs', '--once')
+
+        job = ReportJob.objects.get(pk=job['id'])
+        assert job.status == ReportJob.FAILED
+        assert job.error == 'database went away'
+
+    @pytest.mark.django_db
+    def test_stale_running_jobs_are_requeued(self, settings):
+        ReportJob.objects.create(report='sales', start_date=date(2024, 1, 1), end_date=date(2024, 1, 31))
+        job = claim_job()
+        assert claim_job() is None
+
+        settings.REPORT_JOB_TIMEOUT = 60
+        ReportJob.objects.filter(pk=job.pk).update(updated_at=timezone.now() - timedelta(minutes=5))
+
+        assert requeue_stale_jobs() == 1
+        assert claim_job().pk == job.pk
+
+    @pytest.mark.django_db
+    def test_requeued_job_claimed_again_is_left_to_the_new_worker(self, settings, monkeypatch):
+        settings.REPORT_JOB_TIMEOUT = 60
+        ReportJob.objects.create(report='sales', start_date=date(2024, 1, 1), end_date=date(2024, 3, 31))
+        stale = claim_job()
+        claims = []
+        read = jobs.Scan.read
+
+        def stalled(scan, first, last):
+            # The first worker stalls on its first month: the job is requeued and claimed again
+            if not claims:
+                ReportJob.objects.filter(pk=stale.pk).update(updated_at=timezone.now() - timedelta(minutes=5))
+                requeue_stale_jobs()
+                claims.append(claim_job())
+            return read(scan, first, last)
+        monkeypatch.setattr(jobs.Scan, 'read', stalled)
+
+        run_job(stale)
+        job = ReportJob.objects.get(pk=stale.pk)
+        assert job.status == ReportJob.RUNNING
+        assert job.started_at == claims[0].started_at
+        assert job.chunks_done == 0
+
+        run_job(claims[0])
+        job = ReportJob.objects.get(pk=stale.pk)
+        assert job.status == ReportJob.READY
+        assert job.chunks_done == 3
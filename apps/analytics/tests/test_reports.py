@@ -168,7 +168,9 @@ class TestCategoryReport:
         product.save()
 
         order_date = timezone.make_aware(datetime(2025, 5, 10))
-        order = order_factory(created_at=order_date)
+        order = order_factory()
+        order.created_at = order_date
+        order.save()
         order_item_factory(order=order, product=product, quantity=2, unit_price=1000)
 
         response = admin_client.get(
@@ -0,0 +1,131 @@
+import pytest
+from datetime import datetime, timedelta
+from decimal import Decimal
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from apps.analytics.models import DailySalesRollup
+from apps.analytics.rollups import bucket_starts, compare_daily_sales, daily_sales_from_orders
+from apps.analytics.synthetic import generate_orders
+from apps.orders.models import Order
+
+
+class TestDailySalesRollup:
+
+    @pytest.mark.django_db
+    def test_rollup_follows_order_writes(self, order_factory):
+        today = timezone.localdate()
+        yesterday = today - timedelta(days=1)
+        first = order_factory(total_amount=Decimal('100.00'))
+        order_factory(total_amount=Decimal('20.00'))
+        assert daily_sales_from_orders(yesterday, today) == {today: (Decimal('120.00'), 2)}
+
+        first.total_amount = Decimal('150.00')
+        first.save()
+        Order.objects.get(pk=first.pk).save()  # unchanged: no rollup write
+        assert DailySalesRollup.objects.get(date=today).revenue == Decimal('170.00')
+
+        first.created_at -= timedelta(days=1)
+        first.save()
+        assert DailySalesRollup.objects.get(date=yesterday).orders == 1
+        assert DailySalesRollup.objects.get(date=today).revenue == Decimal('20.00')
+
+        Order.objects.only('id').get(pk=first.pk).delete()
+        assert compare_daily_sales(yesterday, today) == {}
+        assert DailySalesRollup.objects.get(date=yesterday).orders == 0
+
+    @pytest.mark.django_db
+    def test_sales_report_reads_only_the_rollup(self, admin_client):
+        generate_orders(500, days=60, users=3, products=10)
+        end = timezone.localdate()
+        start = end - timedelta(days=59)
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = admin_client.get(f'/api/private/v1/reports/sales/?start_date={start}&end_date={end}')
+
+        assert response.status_code == 200
+        assert not any('apps_orders_order' in query['sql'] for query in ctx.captured_queries)
+        assert {row['date']: (row['revenue'], row['orders']) for row in response.data['data']} == \
+            daily_sales_from_orders(start, end)
+
+    @pytest.mark.django_db
+    def test_check_and_backfill_commands(self, user_factory):
+        Order.objects.bulk_create([
+            Order(user=user_factory(), order_number=f'BULK-{n}', total_amount=10, shipping_address='x')
+            for n in range(3)
+        ])
+
+        with pytest.raises(CommandError, match='1 day'):
+            call_command('check_sales_rollup')
+        call_command('backfill_sales_rollup')
+        call_command('check_sales_rollup')
+
+        assert DailySalesRollup.objects.get().orders == 3
+
+
+class TestSalesGranularity:
+
+    def at(self, *args):
+        return timezone.make_aware(datetime(*args))
+
+    @pytest.fixture
+    def orders(self, order_factory):
+        # order_factory sets created_at through save(), which the rollup follows
+        for created_at, amount in [((2025, 1, 6, 9, 15), '10.00'), ((2025, 1, 6, 9, 45), '5.00'),
+                                   ((2025, 1, 8, 14, 0), '20.00'), ((2025, 3, 3, 8, 0), '1.00')]:
+            order = order_factory(total_amount=Decimal(amount))
+            order.created_at = self.at(*created_at)
+            order.save()
+
+    def sales(self, client, query):
+        response = client.get(f'/api/private/v1/reports/sales/?{query}')
+        assert response.status_code == 200, response.data
+        return [(row['date'], row['revenue'], row['orders']) for row in response.data['data']]
+
+    @pytest.mark.django_db
+    def test_month_and_week_buckets_are_zero_filled(self, admin_client, orders):
+        with CaptureQueriesContext(connection) as ctx:
+            months = self.sales(admin_client, 'start_date=2025-01-01&end_date=2025-03-31&granularity=month')
+        assert not any('apps_orders_order' in query['sql'] for query in ctx.captured_queries)
+        assert months == [
+            (datetime(2025, 1, 1).date(), Decimal('35.00'), 3),
+            (datetime(2025, 2, 1).date(), 0, 0),
+            (datetime(2025, 3, 1).date(), Decimal('1.00'), 1),
+        ]
+
+        weeks = self.sales(admin_client, 'start_date=2025-01-01&end_date=2025-01-19&granularity=week')
+        assert [row[0].isoformat() for row in weeks] == ['2024-12-30', '2025-01-06', '2025-01-13']
+        assert [row[2] for row in weeks] == [0, 3, 0]
+
+    @pytest.mark.django_db
+    def test_day_buckets(self, admin_client, orders):
+        days = self.sales(admin_client, 'start_date=2025-01-05&end_date=2025-01-09&granularity=day')
+
+        assert [row[2] for row in days] == [0, 2, 0, 1, 0]
+        # Without granularity the report keeps listing only days with sales
+        assert len(self.sales(admin_client, 'start_date=2025-01-05&end_date=2025-01-09')) == 2
+
+    @pytest.mark.django_db
+    def test_hour_buckets(self, admin_client, orders):
+        hours = self.sales(admin_client, 'start_date=2025-01-06&end_date=2025-01-06&granularity=hour')
+
+        assert len(hours) == 24
+        assert hours[9] == (self.at(2025, 1, 6, 9), Decimal('15.00'), 2)
+        assert sum(row[2] for row in hours) == 2
+
+    @pytest.mark.django_db
+    def test_invalid_granularity(self, admin_client):
+        response = admin_client.get('/api/private/v1/reports/sales/?granularity=year')
+        assert response.status_code == 400
+
+        response = admin_client.get(
+            '/api/private/v1/reports/sales/?start_date=2025-01-01&end_date=2025-03-01&granularity=hour'
+        )
+        assert response.status_code == 400
+        assert 'Hourly' in response.data['message']
+
+    def test_hours_follow_dst(self):
+        with timezone.override('Europe/Berlin'):
+            hours = bucket_starts(datetime(2025, 3, 30).date(), datetime(2025, 3, 30).date(), 'hour')
+        assert len(hours) == 23
@@ -0,0 +1,147 @@
+import random
+import pytest
+from collections import Counter
+from apps.analytics.models import TrendingCheckpoint
+from apps.analytics.trending import SpaceSaving, TrendingTracker, tracker
+
+NOW = 1_700_000_000.0
+
+
+@pytest.fixture(autouse=True)
+def fresh_tracker():
+    tracker.reset()
+    yield
+    tracker.reset()
+
+
+def zipf_stream(items, length, seed=0):
+    rng = random.Random(seed)
+    return rng.choices(range(items), [1 / (rank + 1) for rank in range(items)], k=length)
+
+
+class TestSpaceSaving:
+
+    def test_exact_below_capacity(self):
+        sketch = SpaceSaving(10)
+        for item in [1, 2, 1, 3, 1, 2]:
+            sketch.add(item)
+
+        assert sketch.top(2) == [(1, 3, 0), (2, 2, 0)]
+
+    def test_bounds_hold_for_a_skewed_stream(self):
+        stream = zipf_stream(500, 20000)
+        truth = Counter(stream)
+        sketch = SpaceSaving(50)
+        for item in stream:
+            sketch.add(item)
+
+        for item, count, error in sketch.top(50):
+            assert count - error <= truth[item] <= count
+        # Everything above total / capacity is guaranteed to be kept
+        assert {item for item, n in truth.items() if n > len(stream) / 50} <= set(sketch.counters)
+        assert [item for item, _, _ in sketch.top(5)] == [item for item, _ in truth.most_common(5)]
+
+    def test_merge_keeps_the_bounds(self):
+        first, second = zipf_stream(300, 5000, seed=1), zipf_stream(300, 5000, seed=2)
+        truth = Counter(first + second)
+        left, right = SpaceSaving(40), SpaceSaving(40)
+        for item in first:
+            left.add(item)
+        for item in second:
+            right.add(item)
+
+        merged = left.merge(right)
+
+        assert len(merged.counters) == 40
+        for item, count, error in merged.top(40):
+            assert count - error <= truth[item] <= count
+
+
+class TestTrendingTracker:
+
+    @pytest.mark.django_db
+    def test_windows_slide(self, product_factory):
+        old, new = product_factory(), product_factory()
+        trends = TrendingTracker()
+        trends.record({old.id: 50}, now=NOW - 2 * 3600)
+        trends.record({new.id: 3}, now=NOW - 60)
+
+        assert [row['product_id'] for row in trends.top('15m', 10, now=NOW)] == [new.id]
+        assert [row['product_id'] for row in trends.top('24h', 10, now=NOW)] == [old.id, new.id]
+        assert trends.top('24h', 1, now=NOW)[0] == {
+            'product_id': old.id, 'product_name': old.goods_name, 'units_sold': 50, 'error': 0
+        }
+
+    @pytest.mark.django_db
+    def test_workers_share_sales_through_checkpoints(self, product_factory):
+        shoe, hat = product_factory(), product_factory()
+        first, second = TrendingTracker(), TrendingTracker()
+        first.record({shoe.id: 4}, now=NOW)
+        second.record({shoe.id: 1, hat.id: 2}, now=NOW)
+
+        first.checkpoint(now=NOW)
+        second.checkpoint(now=NOW)
+        first.checkpoint(now=NOW)
+
+        for trends in (first, second):
+            assert [(row['product_id'], row['units_sold']) for row in trends.top('1h', 10, now=NOW + 1)] == \
+                [(shoe.id, 5), (hat.id, 2)]
+        # A restarted worker starts from the checkpoints
+        restarted = TrendingTracker()
+        restarted.checkpoint(now=NOW)
+        assert restarted.top('1h', 1, now=NOW + 1)[0]['units_sold'] == 5
+
+        first.checkpoint(now=NOW + 2 * 86400)
+        assert not TrendingCheckpoint.objects.exists()
+
+    @pytest.mark.django_db
+    def test_failed_checkpoint_is_retried(self, product_factory, monkeypatch):
+        shoe, hat = product_factory(), product_factory()
+        trends = TrendingTracker()
+        trends.record({shoe.id: 4, hat.id: 1}, now=NOW)
+        hat.delete()
+
+        def fail(*args, **kwargs):
+            raise RuntimeError('database went away')
+        with monkeypatch.context() as patched:
+            patched.setattr(TrendingCheckpoint.objects, 'bulk_create', fail)
+            with pytest.raises(RuntimeError):
+                trends.checkpoint(now=NOW)
+        assert trends.dirty
+
+        # The deleted product is skipped instead of failing the foreign key
+        trends.checkpoint(now=NOW)
+        assert not trends.dirty
+        assert list(TrendingCheckpoint.objects.values_list('product_id', 'units')) == [(shoe.id, 4)]
+
+    @pytest.mark.django_db
+    def test_checkpoints_run_in_the_background(self, settings):
+        settings.TRENDING_CHECKPOINT_SECONDS = 60
+        trends = TrendingTracker()
+        started = []
+        trends.run = lambda interval: started.append(interval)
+
+        trends.record({1: 1}, now=NOW)
+        trends.top('1h', 1, now=NOW)
+        trends.thread.join()
+
+        assert started == [60]
+
+    @pytest.mark.django_db
+    def test_checkout_updates_trending(self, admin_client, user_factory, product_factory,
+                                       django_capture_on_commit_callbacks):
+        shoe = product_factory(goods_quantity=10)
+        payload = {
+            'user_id': user_factory().id,
+            'shipping_address': '1 Main St',
+            'items': [{'product_id': shoe.id, 'quantity': 3}],
+        }
+        with django_capture_on_commit_callbacks(execute=True):
+            assert admin_client.post('/api/private/v1/orders/', payload, format='json').status_code == 201
+
+        response = admin_client.get('/api/private/v1/reports/trending/?window=15m&limit=5')
+
+        assert response.status_code == 200
+        assert response.data['data'][0]['product_id'] == shoe.id
+        assert response.data['data'][0]['units_sold'] == 3
+        assert admin_client.get('/api/private/v1/reports/trending/?window=year').status_code == 400
@@ -0,0 +1,230 @@
+import heapq
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from datetime import datetime, timezone as datetime_timezone
+from django.conf import settings
+from django.db import connection, transaction
+from apps.products.models import Product
+from .models import TrendingCheckpoint
+
+logger = logging.getLogger(__name__)
+
+BUCKET_SECONDS = 300
+WINDOWS = {'15m': 15 * 60, '1h': 60 * 60, '6h': 6 * 60 * 60, '24h': 24 * 60 * 60}
+# Merged windows are recomputed at most this often, so most queries are a dict lookup
+REFRESH_SECONDS = 1.0
+
+
+class SpaceSaving:
+    """Space-Saving summary holding at most `capacity` counters.
+
+    An item's count overestimates its true total by at most its error, and
+    any item whose total exceeds (sum of all weights) / capacity is present.
+    """
+
+    def __init__(self, capacity, counters=None):
+        self.capacity = capacity
+        self.counters = counters or {}  # item -> [count, error]
+        # (count when pushed, item); counts only grow, so stale entries sit
+        # below their item's real count and are refreshed when they surface
+        self.heap = [(count, item) for item, (count, _) in self.counters.items()]
+        heapq.heapify(self.heap)
+
+    def add(self, item, weight=1):
+        counter = self.counters.get(item)
+        if counter is not None:
+            counter[0] += weight
+        elif len(self.counters) < self.capacity:
+            self.counters[item] = [weight, 0]
+            heapq.heappush(self.heap, (weight, item))
+        else:
+            # Replace the smallest counter; the newcomer inherits its count as error
+            while True:
+                count, victim = self.heap[0]
+                current = self.counters[victim][0]
+                if current == count:
+                    break
+                heapq.heapreplace(self.heap, (current, victim))
+            del self.counters[victim]
+            self.counters[item] = [count + weight, count]
+            heapq.heapreplace(self.heap, (count + weight, item))
+
+    def floor(self):
+        """Upper bound on the count of any item the summary does not hold."""
+        if len(self.counters) < self.capacity:
+            return 0
+        return min(count for count, _ in self.counters.values())
+
+    @classmethod
+    def combine(cls, sketches, capacity):
+        """One summary of the union of the streams behind `sketches`. An
+        item missing from a full sketch is counted at that sketch's floor,
+        which keeps the bounds above; done in one pass over all counters."""
+        floors = [sketch.floor() for sketch in sketches]
+        base = sum(floors)
+        excess = {}
+        for sketch, floor in zip(sketches, floors):
+            for item, (count, error) in sketch.counters.items():
+                total = excess.get(item)
+                if total is None:
+                    total = excess[item] = [0, 0]
+                total[0] += count - floor
+                total[1] += error - floor
+        largest = heapq.nlargest(capacity, excess.items(), key=lambda entry: entry[1][0])
+        return cls(capacity, {item: [base + count, base + error] for item, (count, error) in largest})
+
+    def merge(self, other):
+        """Fold `other` into this summary."""
+        merged = self.combine([self, other], self.capacity)
+        self.counters, self.heap = merged.counters, merged.heap
+        return self
+
+    def top(self, n):
+        """[(item, count, error)] for the n largest counts."""
+        largest = heapq.nlargest(n, self.counters.items(), key=lambda entry: entry[1][0])
+        return [(item, count, error) for item, (count, error) in largest]
+
+
+class TrendingTracker:
+    """Per-process top sellers over sliding windows.
+
+    Sales go into a Space-Saving summary per BUCKET_SECONDS bucket, so
+    memory is O(capacity) per bucket over the longest window. Every
+    TRENDING_CHECKPOINT_SECONDS a background thread writes the process's
+    summaries to TrendingCheckpoint and reads back those of the other
+    workers (including ones that have since restarted), so every process
+    answers for all sales without a checkout or a query waiting on it.
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        # A fresh lock too: after a fork the parent's may be held by a thread that no longer exists
+        self.lock = threading.Lock()
+        # Random part: a restarted container can get the same pid back
+        self.worker = f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+        self.local = {}
+        self.remote = {}
+        self.dirty = set()
+        self.results = {}
+        self.thread = None
+
+    @property
+    def capacity(self):
+        return settings.TRENDING_CAPACITY
+
+    def record(self, quantities, now=None):
+        """Count {product_id: units} sold at `now` (default: the current time)."""
+        now = time.time() if now is None else now
+        bucket = int(now // BUCKET_SECONDS) * BUCKET_SECONDS
+        with self.lock:
+            sketch = self.local.get(bucket)
+            if sketch is None:
+                sketch = self.local[bucket] = SpaceSaving(self.capacity)
+            for product_id, units in quantities.items():
+                sketch.add(product_id, units)
+            self.dirty.add(bucket)
+        self.start()
+
+    def top(self, window, limit, now=None):
+        """Approximate [{'product_id', 'product_name', 'units_sold', 'error'}]
+        for the `limit` best sellers of the last `window` (a WINDOWS key)."""
+        now = time.time() if now is None else now
+        self.start()
+        with self.lock:
+            cached = self.results.get(window)
+            if cached and 0 <= now - cached[0] < REFRESH_SECONDS:
+                return cached[1][:limit]
+            since = now - WINDOWS[window]
+            sketches = [sketch for buckets in (self.local, self.remote) for bucket, sketch in buckets.items()
+                        if since < bucket + BUCKET_SECONDS and bucket <= now]
+            merged = SpaceSaving.combine(sketches, self.capacity)
+        rows = merged.top(self.capacity)
+        names = dict(Product.objects.filter(pk__in=[item for item, _, _ in rows]).values_list('id', 'goods_name'))
+        rows = [{'product_id': item, 'product_name': names.get(item), 'units_sold': count, 'error': error}
+                for item, count, error in rows]
+        with self.lock:
+            self.results[window] = (now, rows)
+        return rows[:limit]
+
+    def start(self):
+        """Start this process's checkpoint thread, unless it is running or
+        TRENDING_CHECKPOINT_SECONDS is unset (as in the tests)."""
+        interval = settings.TRENDING_CHECKPOINT_SECONDS
+        if not interval or self.thread is not None:
+            return
+        with self.lock:
+            if self.thread is not None:
+                return
+            self.thread = threading.Thread(target=self.run, args=(interval,), name='trending-checkpoint',
+                                           daemon=True)
+        self.thread.start()
+
+    def run(self, interval):
+        while True:
+            try:
+                self.checkpoint()
+            except Exception:
+                # The next round retries; the failed buckets are still dirty
+                logger.exception("Trending checkpoint failed")
+            finally:
+                # Sleeping with an open connection would hold it past CONN_MAX_AGE
+                connection.close()
+            time.sleep(interval)
+
+    def checkpoint(self, now=None):
+        """Write this worker's changed buckets and load everyone else's."""
+        now = time.time() if now is None else now
+        oldest = int((now - max(WINDOWS.values())) // BUCKET_SECONDS) * BUCKET_SECONDS
+        with self.lock:
+            self.local = {bucket: sketch for bucket, sketch in self.local.items() if bucket >= oldest}
+            changed = {bucket: self.local[bucket].top(self.capacity) for bucket in self.dirty if bucket in self.local}
+            self.dirty = set()
+
+        try:
+            # Products deleted since the sale would fail the foreign key
+            products = {item for counters in changed.values() for item, _, _ in counters}
+            existing = set(Product.objects.filter(pk__in=products).values_list('id', flat=True))
+            with transaction.atomic():
+                for bucket, counters in changed.items():
+                    moment = bucket_time(bucket)
+                    TrendingCheckpoint.objects.filter(worker=self.worker, bucket=moment).delete()
+                    TrendingCheckpoint.objects.bulk_create([
+                        TrendingCheckpoint(worker=self.worker, bucket=moment, product_id=item, units=count,
+                                           error=error)
+                        for item, count, error in counters if item in existing
+                    ])
+                TrendingCheckpoint.objects.filter(bucket__lt=bucket_time(oldest)).delete()
+        except Exception:
+            # Nothing was written: write these buckets again next time
+            with self.lock:
+                self.dirty.update(bucket for bucket in changed if bucket in self.local)
+            raise
+        rows = TrendingCheckpoint.objects.filter(bucket__gte=bucket_time(oldest)).exclude(
+            worker=self.worker
+        ).values_list('bucket', 'worker', 'product_id', 'units', 'error')
+
+        summaries = {}
+        for moment, worker, product_id, units, error in rows.iterator(chunk_size=2000):
+            summaries.setdefault((int(moment.timestamp()), worker), {})[product_id] = [units, error]
+        by_bucket = {}
+        for (bucket, _), counters in summaries.items():
+            by_bucket.setdefault(bucket, []).append(SpaceSaving(self.capacity, counters))
+        remote = {bucket: SpaceSaving.combine(sketches, self.capacity) for bucket, sketches in by_bucket.items()}
+        with self.lock:
+            self.remote = remote
+            self.results = {}
+
+
+def bucket_time(bucket):
+    return datetime.fromtimestamp(bucket, tz=datetime_timezone.utc)
+
+
+tracker = TrendingTracker()
+# A forked worker starts with its own (empty) counters under its own name
+os.register_at_fork(after_in_child=tracker.reset)
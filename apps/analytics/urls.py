@@ -1,10 +1,16 @@
-from django.urls import path
-from django.views.decorators.cache import cache_page
-from .views import ReportViewSet
+from django.urls import path, re_path
+from .views import ReportViewSet, ReportJobViewSet
 
 urlpatterns = [
-    path('sales/', cache_page(60 * 60)(ReportViewSet.as_view({'get': 'sales'})), name='sales-report'),
-    path('products/', cache_page(60 * 60)(ReportViewSet.as_view({'get': 'products'})), name='products-report'),
-    path('payment_status/', cache_page(60 * 60)(ReportViewSet.as_view({'get': 'payment_status'})), name='payment-status-report'),
-    path('categories/', cache_page(60 * 60)(ReportViewSet.as_view({'get': 'categories'})), name='categories-report'),
+    path('sales/', ReportViewSet.as_view({'get': 'sales'}), name='sales-report'),
+    path('products/', ReportViewSet.as_view({'get': 'products'}), name='products-report'),
+    path('payment_status/', ReportViewSet.as_view({'get': 'payment_status'}), name='payment-status-report'),
+    path('categories/', ReportViewSet.as_view({'get': 'categories'}), name='categories-report'),
+    path('trending/', ReportViewSet.as_view({'get': 'trending'}), name='trending-report'),
+    path('dashboard/', ReportViewSet.as_view({'get': 'dashboard'}), name='dashboard-report'),
+    re_path(r'^(?P<report>sales|products|payment_status|categories)/export\.(?P<file_format>csv|ndjson)$',
+            ReportViewSet.as_view({'get': 'export'}), name='report-export'),
+    path('jobs/', ReportJobViewSet.as_view({'post': 'create'}), name='report-jobs'),
+    path('jobs/<int:pk>/', ReportJobViewSet.as_view({'get': 'retrieve'}), name='report-job'),
+    path('jobs/<int:pk>/download/', ReportJobViewSet.as_view({'get': 'download'}), name='report-job-download'),
 ]
@@ -1,11 +1,24 @@
-from rest_framework import viewsets, status
+from rest_framework import mixins, viewsets, status
 from rest_framework.decorators import action
 from rest_framework.permissions import IsAdminUser
 from rest_framework.response import Response
 from .serializers import SalesReportSerializer, \
 ProductPopularitySerializer, \
-    PaymentStatusSerializer, ProductCategoryReportSerializer
+    PaymentStatusSerializer, ProductCategoryReportSerializer, ReportJobSerializer
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.http import FileResponse
 from django.utils import timezone
+from .models import ReportJob
+from .jobs import submit_job
+from apps.core.export import iterate, stream_export
+from .cache import cached_report
+from .dates import local_days
+from .rollups import GRANULARITIES, MAX_HOURLY_DAYS
+from .trending import WINDOWS, tracker as trending
+from .engine import engine as order_facts
+from .dashboard import build_dashboard
+from .category_sales import VIEWS as CATEGORY_VIEWS, category_level, category_tree
 from datetime import timedelta, datetime
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
@@ -60,9 +73,48 @@ class ReportViewSet(viewsets.ViewSet):
 
         return start_date, end_date, None
 
+    def get_granularity(self, request, start_date, end_date):
+        """Returns (granularity or None, error)"""
+        granularity = request.query_params.get('granularity')
+        if granularity is None:
+            return None, None
+        if granularity not in GRANULARITIES:
+            return None, {'error': f"granularity must be one of {', '.join(GRANULARITIES)}."}
+        first, last = local_days(start_date, end_date)
+        if granularity == 'hour' and (last - first).days >= MAX_HOURLY_DAYS:
+            return None, {'error': f'Hourly sales are limited to {MAX_HOURLY_DAYS} days.'}
+        return granularity, None
+
+    def get_engine(self, request):
+        """Returns (engine, error): 'orm' (default) or 'numpy' for the
+        in-memory columnar engine."""
+        engine = request.query_params.get('engine', 'orm')
+        if engine not in ('orm', 'numpy'):
+            return None, {'error': 'engine must be orm or numpy.'}
+        return engine, None
+
+    def compute(self, report, engine, serializer, start_date, end_date):
+        if engine == 'numpy':
+            return order_facts.report(report, start_date, end_date)
+        return [serializer.to_representation(item) for item in serializer.get_queryset(start_date, end_date)]
+
+    @swagger_auto_schema(
+        manual_parameters=[
+            openapi.Parameter('start_date', openapi.IN_QUERY, description="Start date (YYYY-MM-DD)", type=openapi.TYPE_STRING),
+            openapi.Parameter('end_date', openapi.IN_QUERY, description="End date (YYYY-MM-DD)", type=openapi.TYPE_STRING),
+            openapi.Parameter('granularity', openapi.IN_QUERY, description="hour, day, week or month; empty buckets are zero-filled",
+                              type=openapi.TYPE_STRING, enum=list(GRANULARITIES)),
+        ]
+    )
     @action(detail=False, methods=['get'])
     def sales(self, request):
         start_date, end_date, error = self.get_date_range(request)
+        if not error:
+            granularity, error = self.get_granularity(request, start_date, end_date)
+        if not error:
+            engine, error = self.get_engine(request)
+        if not error and engine == 'numpy' and granularity:
+            error = {'error': 'granularity is not supported by the numpy engine.'}
         if error:
             return Response({
                 'status': 'error',
@@ -73,19 +125,27 @@ class ReportViewSet(viewsets.ViewSet):
             }, status=status.HTTP_400_BAD_REQUEST)
 
         serializer = SalesReportSerializer(data=[])
-        queryset = serializer.get_queryset(start_date, end_date)
-        data = [serializer.to_representation(item) for item in queryset]
+        if engine == 'numpy':
+            compute = lambda: order_facts.report('sales', start_date, end_date)
+        else:
+            compute = lambda: [serializer.to_representation(item)
+                               for item in serializer.get_queryset(start_date, end_date, granularity)]
+        data, cached = cached_report('sales', start_date, end_date, compute,
+                                     params={'granularity': granularity, 'engine': engine})
         return Response({
             'status': 'success',
             'data': data,
             'message': 'Sales report generated successfully',
             'errors': None,
-            'meta': {'start_date': str(start_date), 'end_date': str(end_date)}
+            'meta': {'start_date': str(start_date), 'end_date': str(end_date), 'cached': cached,
+                     'granularity': granularity or 'day', 'engine': engine}
         })
 
     @action(detail=False, methods=['get'])
     def products(self, request):
         start_date, end_date, error = self.get_date_range(request)
+        if not error:
+            engine, error = self.get_engine(request)
         if error:
             return Response({
                 'status': 'error',
@@ -96,19 +156,22 @@ class ReportViewSet(viewsets.ViewSet):
             }, status=status.HTTP_400_BAD_REQUEST)
 
         serializer = ProductPopularitySerializer(data=[])
-        queryset = serializer.get_queryset(start_date, end_date)
-        data = [serializer.to_representation(item) for item in queryset]
+        data, cached = cached_report('products', start_date, end_date, lambda: self.compute(
+            'products', engine, serializer, start_date, end_date
+        ), params={'engine': engine})
         return Response({
             'status': 'success',
             'data': data,
             'message': 'Product popularity report generated successfully',
             'errors': None,
-            'meta': {'start_date': str(start_date), 'end_date': str(end_date)}
+            'meta': {'start_date': str(start_date), 'end_date': str(end_date), 'cached': cached, 'engine': engine}
         })
 
     @action(detail=False, methods=['get'])
     def payment_status(self, request):
         start_date, end_date, error = self.get_date_range(request)
+        if not error:
+            engine, error = self.get_engine(request)
         if error:
             return Response({
                 'status': 'error',
@@ -119,25 +182,51 @@ class ReportViewSet(viewsets.ViewSet):
             }, status=status.HTTP_400_BAD_REQUEST)
 
         serializer = PaymentStatusSerializer(data=[])
-        queryset = serializer.get_queryset(start_date, end_date)
-        data = [serializer.to_representation(item) for item in queryset]
+        data, cached = cached_report('payment_status', start_date, end_date, lambda: self.compute(
+            'payment_status', engine, serializer, start_date, end_date
+        ), params={'engine': engine})
         return Response({
             'status': 'success',
             'data': data,
             'message': 'Payment status report generated successfully',
             'errors': None,
-            'meta': {'start_date': str(start_date), 'end_date': str(end_date)}
+            'meta': {'start_date': str(start_date), 'end_date': str(end_date), 'cached': cached, 'engine': engine}
         })
     
+    def get_category_view(self, request):
+        """Returns (view, level, error): `view=tree` nests categories under
+        their parents and `level=1..3` lists one level, both with subtree totals."""
+        view = request.query_params.get('view')
+        level = request.query_params.get('level')
+        if view is not None and view not in CATEGORY_VIEWS:
+            return None, None, {'error': f"view must be one of {', '.join(CATEGORY_VIEWS)}."}
+        if level is not None:
+            if not (level.isdigit() and 1 <= int(level) <= 3):
+                return None, None, {'error': 'level must be 1, 2 or 3.'}
+            if view:
+                return None, None, {'error': 'Use either view or level, not both.'}
+            level = int(level)
+        return view, level, None
+
     @swagger_auto_schema(
         manual_parameters=[
             openapi.Parameter('start_date', openapi.IN_QUERY, description="Start date (YYYY-MM-DD)", type=openapi.TYPE_STRING),
             openapi.Parameter('end_date', openapi.IN_QUERY, description="End date (YYYY-MM-DD)", type=openapi.TYPE_STRING),
+            openapi.Parameter('view', openapi.IN_QUERY, description="tree: nested categories with subtree totals",
+                              type=openapi.TYPE_STRING, enum=list(CATEGORY_VIEWS)),
+            openapi.Parameter('level', openapi.IN_QUERY, description="Only this level (1-3), with subtree totals",
+                              type=openapi.TYPE_INTEGER),
         ]
     )
     @action(detail=False,methods=['get'], url_path='categories')
     def categories(self,request):
         start_date, end_date, error = self.get_date_range(request)
+        if not error:
+            engine, error = self.get_engine(request)
+        if not error:
+            view, level, error = self.get_category_view(request)
+        if not error and engine == 'numpy' and (view or level):
+            error = {'error': 'view and level are not supported by the numpy engine.'}
         
         if error:
             return Response({
@@ -149,15 +238,172 @@ class ReportViewSet(viewsets.ViewSet):
             }, status=status.HTTP_400_BAD_REQUEST)
         
         serializer = ProductCategoryReportSerializer(data=[])
-        data = serializer.get_queryset(
-            start_date=start_date, end_date=end_date
-        )
+        if view == 'tree':
+            compute = lambda: category_tree(start_date, end_date)
+        elif level:
+            compute = lambda: category_level(start_date, end_date, level)
+        else:
+            compute = lambda: self.compute('categories', engine, serializer, start_date, end_date)
+        data, cached = cached_report('categories', start_date, end_date, compute,
+                                     params={'engine': engine, 'view': view, 'level': level})
 
         return Response({
             'status': 'success',
             'data': data,
             'message': 'Category report retrieved successfully',
             'errors': None,
-            'meta': {'start_date': str(start_date), 'end_date': str(end_date)}
+            'meta': {'start_date': str(start_date), 'end_date': str(end_date), 'cached': cached, 'engine': engine,
+                     'view': view or 'flat', 'level': level}
+        })
+
+    @swagger_auto_schema(
+        manual_parameters=[
+            openapi.Parameter('start_date', openapi.IN_QUERY, description="Start date (YYYY-MM-DD)", type=openapi.TYPE_STRING),
+            openapi.Parameter('end_date', openapi.IN_QUERY, description="End date (YYYY-MM-DD)", type=openapi.TYPE_STRING),
+        ]
+    )
+    @action(detail=False, methods=['get'])
+    def dashboard(self, request):
+        start_date, end_date, error = self.get_date_range(request)
+        if error:
+            return Response({
+                'status': 'error',
+                'data': {},
+                'message': error['error'],
+                'errors': error,
+                'meta': {}
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        (data, stats), cached = cached_report('dashboard', start_date, end_date,
+                                              lambda: build_dashboard(start_date, end_date))
+        return Response({
+            'status': 'success',
+            'data': data,
+            'message': 'Dashboard generated successfully',
+            'errors': None,
+            'meta': {'start_date': str(start_date), 'end_date': str(end_date), 'cached': cached, **stats}
+        })
+
+
+    @swagger_auto_schema(
+        manual_parameters=[
+            openapi.Parameter('window', openapi.IN_QUERY, description="Sliding window", type=openapi.TYPE_STRING,
+                              enum=list(WINDOWS)),
+            openapi.Parameter('limit', openapi.IN_QUERY, description="Number of products (default 10)", type=openapi.TYPE_INTEGER),
+        ]
+    )
+    @action(detail=False, methods=['get'])
+    def trending(self, request):
+        """Approximate best sellers of the last window, from the in-process
+        Space-Saving counters rather than the order tables."""
+        window = request.query_params.get('window', '1h')
+        try:
+            limit = int(request.query_params.get('limit', 10))
+        except ValueError:
+            limit = 0
+        error = None
+        if window not in WINDOWS:
+            error = {'error': f"window must be one of {', '.join(WINDOWS)}."}
+        elif not 0 < limit <= settings.TRENDING_CAPACITY:
+            error = {'error': f'limit must be between 1 and {settings.TRENDING_CAPACITY}.'}
+        if error:
+            return Response({
+                'status': 'error',
+                'data': [],
+                'message': error['error'],
+                'errors': error,
+                'meta': {}
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({
+            'status': 'success',
+            'data': trending.top(window, limit),
+            'message': 'Trending products retrieved successfully',
+            'errors': None,
+            'meta': {'window': window, 'approximate': True}
         })
 
+    EXPORTS = {
+        'sales': SalesReportSerializer,
+        'products': ProductPopularitySerializer,
+        'payment_status': PaymentStatusSerializer,
+        'categories': ProductCategoryReportSerializer,
+    }
+
+    @swagger_auto_schema(
+        manual_parameters=[
+            openapi.Parameter('start_date', openapi.IN_QUERY, description="Start date (YYYY-MM-DD)", type=openapi.TYPE_STRING),
+            openapi.Parameter('end_date', openapi.IN_QUERY, description="End date (YYYY-MM-DD)", type=openapi.TYPE_STRING),
+        ]
+    )
+    @action(detail=False, methods=['get'])
+    def export(self, request, report=None, file_format='csv'):
+        """The full report as a streamed CSV or NDJSON file (uncached)."""
+        start_date, end_date, error = self.get_date_range(request)
+        if error:
+            return Response({
+                'status': 'error',
+                'data': [],
+                'message': error['error'],
+                'errors': error,
+                'meta': {}
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        serializer = self.EXPORTS[report](data=[])
+        rows = (serializer.to_representation(item)
+                for item in iterate(serializer.get_queryset(start_date, end_date)))
+        first, last = local_days(start_date, end_date)
+        return stream_export(rows, list(serializer.fields), file_format, f'{report}-{first}-{last}')
+
+class ReportJobViewSet(mixins.RetrieveModelMixin, viewsets.GenericViewSet):
+    """Reports computed in the background by `manage.py run_report_jobs`:
+    POST to queue one, poll it until READY, then download the result."""
+    queryset = ReportJob.objects.all()
+    serializer_class = ReportJobSerializer
+    permission_classes = [IsAdminUser]
+
+    def create(self, request):
+        serializer = self.get_serializer(data=request.data)
+        if not serializer.is_valid():
+            return Response({
+                'status': 'error',
+                'data': {},
+                'message': 'Invalid report job',
+                'errors': serializer.errors,
+                'meta': {}
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        job, created = submit_job(user=request.user, **serializer.validated_data)
+        return Response({
+            'status': 'success',
+            'data': self.get_serializer(job).data,
+            'message': 'Report job queued' if created else 'An identical report job is already queued',
+            'errors': None,
+            'meta': {'deduplicated': not created}
+        }, status=status.HTTP_202_ACCEPTED)
+
+    def retrieve(self, request, pk=None):
+        job = self.get_object()
+        return Response({
+            'status': 'success',
+            'data': self.get_serializer(job).data,
+            'message': 'Report job retrieved successfully',
+            'errors': None,
+            'meta': {}
+        })
+
+    @action(detail=True, methods=['get'])
+    def download(self, request, pk=None):
+        job = self.get_object()
+        if job.status != ReportJob.READY:
+            return Response({
+                'status': 'error',
+                'data': {},
+                'message': f'Report job is {job.status.lower()}',
+                'errors': {'status': job.status},
+                'meta': {}
+            }, status=status.HTTP_409_CONFLICT)
+        return FileResponse(
+            default_storage.open(job.result, 'rb'), as_attachment=True, content_type='application/json',
+            filename=f'{job.report}-{job.start_date}-{job.end_date}.json',
+        )
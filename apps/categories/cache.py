@@ -0,0 +1,76 @@
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+VERSION_KEY = 'categories:version'
+
+
+def tree_version():
+    """The shared version of the category tree, from Redis."""
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # Never restart from a low number after eviction: trees cached under
+        # that number in some process would become valid again
+        cache.add(VERSION_KEY, time.time_ns(), None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def bump_version():
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.add(VERSION_KEY, time.time_ns(), None)
+
+
+def invalidate_tree():
+    """Make every process drop its cached trees on its next request."""
+    # Bumped now, for readers in this transaction, and again after commit, so
+    # a tree serialized from pre-commit data cannot be cached as current
+    bump_version()
+    transaction.on_commit(bump_version)
+
+
+class TreeCache:
+    """Per-process LRU of serialized category trees, each stored with the
+    tree version it was built at; an entry from an older version is a miss."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def get(self, key, version):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[0] != version:
+                return None
+            self.entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, version, data):
+        with self.lock:
+            self.entries[key] = (version, data)
+            self.entries.move_to_end(key)
+            while len(self.entries) > settings.CATEGORY_TREE_CACHE_SIZE:
+                self.entries.popitem(last=False)
+
+    def fetch(self, key, build):
+        """Return (data, hit) for `key`, building and storing it on a miss."""
+        # Read before building: a write during the build then leaves the entry stale
+        version = tree_version()
+        data = self.get(key, version)
+        if data is not None:
+            return data, True
+        data = build()
+        self.set(key, version, data)
+        return data, False
+
+
+trees = TreeCache()
@@ -0,0 +1,34 @@
+# Generated by Django 5.2 on 2026-10-18 19:40
+
+from django.db import migrations, models
+from django.db.models import CharField, F, OuterRef, Subquery, Value
+from django.db.models.functions import Cast, Concat
+
+
+def backfill(apps, schema_editor):
+    Category = apps.get_model('apps_categories', 'Category')
+    Category.objects.filter(parent__isnull=True).update(
+        path=Concat(Value('/'), Cast('id', CharField()), Value('/'))
+    )
+    parent_path = Category.objects.filter(pk=OuterRef('parent_id')).values('path')
+    # One level per pass, until no category with a placed parent is left
+    while Category.objects.filter(path='', parent__path__gt='').update(
+        path=Concat(Subquery(parent_path), Cast(F('id'), CharField()), Value('/'))
+    ):
+        pass
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apps_categories', '0001_initial_categories'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='path',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=255),
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
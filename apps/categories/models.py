@@ -1,9 +1,14 @@
 from django.db import models
+from django.db.models import Q, Value
+from django.db.models.functions import Concat, Substr
 
 class Category(models.Model):
     name = models.CharField(max_length=255, unique=True)
     parent = models.ForeignKey('self', on_delete=models.CASCADE, null=True, blank=True, related_name='children')
     level = models.PositiveIntegerField(default=1)
+    # Materialized path: the ids from the root down to this category, e.g.
+    # '/3/17/42/'. A subtree is every row whose path starts with its root's.
+    path = models.CharField(max_length=255, db_index=True, default='', editable=False)
     is_deleted = models.BooleanField(default=False)
     created_at =  models.DateTimeField(auto_now_add=True)
     updated_at =  models.DateTimeField(auto_now=True)
@@ -12,4 +17,40 @@ class Category(models.Model):
         db_table = 'apps_categories_category'
 
     def __str__(self):
-        return self.name
\ No newline at end of file
+        return self.name
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        parent_path = '/'
+        if self.parent_id:
+            parent_path = Category.objects.filter(pk=self.parent_id).values_list('path', flat=True).get()
+            if not parent_path:
+                # Paths not backfilled yet; rebuild_paths() sets them all
+                return
+        path = f'{parent_path}{self.pk}/'
+        if path != self.path:
+            # New, or moved: rewrite the path of this category and everything below it
+            if self.path:
+                Category.objects.filter(path__startswith=self.path).update(
+                    path=Concat(Value(path), Substr('path', len(self.path) + 1))
+                )
+            else:
+                Category.objects.filter(pk=self.pk).update(path=path)
+            self.path = path
+
+    def subtree(self):
+        """This category and all its descendants."""
+        if not self.path:
+            # Not backfilled yet (an empty prefix would match every category):
+            # follow the parent links instead, at most three levels deep
+            return Category.objects.filter(Q(pk=self.pk) | Q(parent_id=self.pk) | Q(parent__parent_id=self.pk))
+        return Category.objects.filter(path__startswith=self.path)
+
+    def ancestor_ids(self):
+        """This category's id and its ancestors', by the parent links, so it
+        holds whether or not the paths have been built."""
+        ids, parent_id = [self.pk], self.parent_id
+        while parent_id is not None and parent_id not in ids:
+            ids.append(parent_id)
+            parent_id = Category.objects.filter(pk=parent_id).values_list('parent_id', flat=True).first()
+        return ids
@@ -1,5 +1,9 @@
 from rest_framework import serializers
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
 from .models import Category
+from .cache import invalidate_tree
+from .tree import LEVEL
 import logging
 
 logger = logging.getLogger(__name__)
@@ -18,6 +22,11 @@ class CategorySerializer(serializers.ModelSerializer):
         }
     
     def get_children(self, obj):
+        # Tree mode: the view fetched every descendant up front (see tree.py),
+        # so children are read from the map and rendered by this same serializer
+        tree = self.context.get('tree')
+        if tree is not None:
+            return [self.to_representation(child) for child in tree.get(obj.id, [])]
         is_deleted_filter = self.context.get('view').action == 'deleted' if self.context.get('view') else False
         children = obj.children.filter(is_deleted=is_deleted_filter)
         
@@ -46,6 +55,9 @@ class CategorySerializer(serializers.ModelSerializer):
         # Validate parent level
         if parent and parent.level >= level:
             raise serializers.ValidationError({"parent_id":"Parent level must be less than current level."})
+
+        if parent and self.instance and self.instance.pk in parent.ancestor_ids():
+            raise serializers.ValidationError({"parent_id":"A category cannot be moved under itself or its descendants."})
         
         # Validate name uniqueness
         if name and not is_deleted and Category.objects.filter(name=name, is_deleted=False).exclude(id=self.instance.id if self.instance else None).exists():
@@ -56,12 +68,12 @@ class CategorySerializer(serializers.ModelSerializer):
             #check parent is not deleted
             if self.instance.parent and self.instance.parent.is_deleted:
                 raise serializers.ValidationError({"parent_id":"Cannot reactivate: Parent category is deleted."})
-            def check_descendants(category):
-                if not category.is_deleted and Category.objects.filter(name=category.name, is_deleted=False).exclude(id=category.id).exists():
-                    raise serializers.ValidationError({"name":f"Name '{category.name}' conflicts with an active category."})
-                for child in category.children.all():
-                    check_descendants(child)
-            check_descendants(self.instance)
+            # Any active category of the subtree whose name another active category uses
+            conflict = self.instance.subtree().filter(is_deleted=False).filter(Exists(
+                Category.objects.filter(name=OuterRef('name'), is_deleted=False).exclude(id=OuterRef('id'))
+            )).values_list('name', flat=True).first()
+            if conflict:
+                raise serializers.ValidationError({"name":f"Name '{conflict}' conflicts with an active category."})
            
         return data
     
@@ -70,7 +82,9 @@ class CategorySerializer(serializers.ModelSerializer):
         parent = validated_data.pop('parent', None)
         validated_data.pop('parent_id', None) # Remove parent_id to avoid conflicts
         
-        return Category.objects.create(parent=parent, **validated_data)
+        category = Category.objects.create(parent=parent, **validated_data)
+        invalidate_tree()
+        return category
     
     def update(self, instance, validated_data):
         
@@ -85,15 +99,7 @@ class CategorySerializer(serializers.ModelSerializer):
         instance.level= instance.parent.level + 1 if instance.parent else 1
         instance.save()
 
-        # Update descendant levels
-        def update_descendant_levels(category):
-            new_level = min(category.parent.level + 1, 3) if category.parent else 1
-            if category.level != new_level:
-                category.level = new_level
-                category.save()
-            
-            for child in category.children.all():
-                update_descendant_levels(child)
-        for child in instance.children.all():
-            update_descendant_levels(child)
+        # Update descendant levels, from their (already rewritten) paths
+        instance.subtree().exclude(id=instance.id).exclude(level=LEVEL).update(level=LEVEL, updated_at=timezone.now())
+        invalidate_tree()
         return instance
\ No newline at end of file
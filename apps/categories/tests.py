@@ -1,3 +1,216 @@
-from django.test import TestCase
+import pytest
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from apps.categories.cache import TreeCache, bump_version, trees
+from apps.categories.models import Category
+from apps.categories.serializers import CategorySerializer
+from apps.categories.tree import rebuild_paths
+from apps.products.models import Product
+from apps.users.models import User
 
-# Create your tests here.
+
+@pytest.fixture
+def admin_client():
+    user = User.objects.create_user(username='admin', email='admin@example.com', password='test123', is_staff=True)
+    client = APIClient()
+    client.force_authenticate(user=user)
+    return client
+
+
+@pytest.fixture(autouse=True)
+def empty_tree_cache(settings):
+    # The database is rolled back between tests, the cache and the process-wide trees are not;
+    # an in-memory cache keeps the configured Redis out of it
+    settings.CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'tests'}}
+    cache.clear()
+    trees.clear()
+
+
+@pytest.fixture
+def tree():
+    """50 level-1 categories, each with 10 children with 9 children each: 5,050 nodes."""
+    roots = Category.objects.bulk_create([Category(name=f'root {n}') for n in range(50)])
+    children = Category.objects.bulk_create([
+        Category(name=f'{root.name}/{n}', parent=root, level=2) for root in roots for n in range(10)
+    ])
+    Category.objects.bulk_create([
+        Category(name=f'{child.name}/{n}', parent=child, level=3) for child in children for n in range(9)
+    ], batch_size=2000)
+    rebuild_paths()
+    return roots
+
+
+class TestCategoryTree:
+
+    @pytest.mark.django_db
+    def test_listing_the_tree_takes_constant_queries(self, admin_client, tree):
+        assert Category.objects.count() == 5050
+        Category.objects.filter(name__in=['root 0/3', 'root 1/2/8']).update(is_deleted=True)
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = admin_client.get('/api/private/v1/categories/?pagesize=100')
+
+        assert response.status_code == 200
+        # The roots and every descendant at once; later requests hit the tree cache
+        assert len(ctx.captured_queries) == 2
+        roots = response.data['results']
+        assert len(roots) == 50
+        assert sum(len(child['children']) for root in roots for child in root['children']) == 4500 - 9 - 1
+        # Same output as the per-node serializer
+        assert roots[1] == CategorySerializer(tree[1]).data
+
+    @pytest.mark.django_db
+    def test_retrieve_and_deleted(self, admin_client, tree):
+        child = Category.objects.get(name='root 2/4')
+        Category.objects.filter(pk=child.pk).update(is_deleted=True)
+        Category.objects.filter(parent=child).update(is_deleted=True)
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = admin_client.get(f'/api/private/v1/categories/{tree[2].id}/')
+        assert len(ctx.captured_queries) == 2
+        assert len(response.data['children']) == 9
+
+        deleted = admin_client.get('/api/private/v1/categories/deleted/').data['results']
+        assert deleted[0]['id'] == child.id
+        assert len(deleted[0]['children']) == 9
+
+
+@pytest.fixture
+def branch():
+    """electronics > computers > laptops, plus garden"""
+    electronics = Category.objects.create(name='electronics')
+    computers = Category.objects.create(name='computers', parent=electronics, level=2)
+    laptops = Category.objects.create(name='laptops', parent=computers, level=3)
+    garden = Category.objects.create(name='garden')
+    return electronics, computers, laptops, garden
+
+
+def updates(ctx):
+    return [query['sql'] for query in ctx.captured_queries if query['sql'].startswith('UPDATE')]
+
+
+class TestCategoryPaths:
+
+    @pytest.mark.django_db
+    def test_paths_are_kept_on_insert_and_move(self, admin_client, branch):
+        electronics, computers, laptops, garden = branch
+        laptops.refresh_from_db()
+        assert laptops.path == f'/{electronics.id}/{computers.id}/{laptops.id}/'
+
+        response = admin_client.patch(f'/api/private/v1/categories/{computers.id}/', {'parent_id': garden.id},
+                                      format='json')
+
+        assert response.status_code == 200
+        laptops.refresh_from_db()
+        assert laptops.path == f'/{garden.id}/{computers.id}/{laptops.id}/'
+        paths = dict(Category.objects.values_list('id', 'path'))
+        rebuild_paths()
+        assert dict(Category.objects.values_list('id', 'path')) == paths
+
+        response = admin_client.patch(f'/api/private/v1/categories/{computers.id}/', {'parent_id': None},
+                                      format='json')
+        assert response.status_code == 200
+        assert dict(Category.objects.filter(pk__in=[computers.id, laptops.id]).values_list('name', 'level')) == \
+            {'computers': 1, 'laptops': 2}
+
+        response = admin_client.patch(f'/api/private/v1/categories/{computers.id}/', {'parent_id': laptops.id},
+                                      format='json')
+        assert response.status_code == 400
+
+    @pytest.mark.django_db
+    def test_categories_without_paths_still_work(self, admin_client, branch):
+        electronics, computers, laptops, garden = branch
+        laptop = Product.objects.create(goods_name='laptop', goods_price=10, goods_quantity=1, goods_weight=1)
+        laptop.categories.set([laptops])
+        # As before the path backfill ran
+        Category.objects.update(path='')
+        url = '/api/private/v1/categories/'
+
+        response = admin_client.get(f'/api/private/v1/goods/?category={electronics.id}')
+        assert response.status_code == 200
+        assert [product['goods_name'] for product in response.data['results']] == ['laptop']
+
+        assert admin_client.patch(f'{url}{garden.id}/', {'parent_id': electronics.id}, format='json').status_code == 200
+        assert Category.objects.get(pk=garden.id).path == ''
+        assert admin_client.patch(f'{url}{electronics.id}/', {'parent_id': laptops.id},
+                                  format='json').status_code == 400
+
+    @pytest.mark.django_db
+    def test_subtree_delete_and_reactivate_are_single_updates(self, admin_client, branch):
+        electronics, computers, laptops, garden = branch
+
+        with CaptureQueriesContext(connection) as ctx:
+            assert admin_client.delete(f'/api/private/v1/categories/{electronics.id}/').status_code == 204
+        assert len(updates(ctx)) == 1
+        assert set(Category.objects.filter(is_deleted=True).values_list('name', flat=True)) == \
+            {'electronics', 'computers', 'laptops'}
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = admin_client.patch(f'/api/private/v1/categories/{electronics.id}/reactivate/')
+        assert response.status_code == 200
+        # The root's save (and its path check), the descendant levels, the subtree
+        assert len(updates(ctx)) <= 3
+        assert not Category.objects.filter(is_deleted=True).exists()
+
+    @pytest.mark.django_db
+    def test_products_under_a_category(self, admin_client, branch):
+        electronics, computers, laptops, garden = branch
+        laptop = Product.objects.create(goods_name='laptop', goods_price=10, goods_quantity=1, goods_weight=1)
+        laptop.categories.set([computers, laptops])
+        hose = Product.objects.create(goods_name='hose', goods_price=10, goods_quantity=1, goods_weight=1)
+        hose.categories.set([garden])
+
+        def listed(category):
+            response = admin_client.get(f'/api/private/v1/goods/?category={category}')
+            return [product['goods_name'] for product in response.data['results']]
+
+        assert listed(electronics.id) == ['laptop']
+        assert listed(laptops.id) == ['laptop']
+        assert listed(garden.id) == ['hose']
+        assert listed(999999) == []
+
+
+class TestCategoryTreeCache:
+
+    @pytest.mark.django_db
+    def test_served_from_memory_until_a_write(self, admin_client, branch):
+        url = '/api/private/v1/categories/'
+        assert [row['name'] for row in admin_client.get(url).data['results']] == ['electronics', 'garden']
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = admin_client.get(url)
+        assert not ctx.captured_queries
+        assert response.data['results'][0]['children'][0]['name'] == 'computers'
+
+        assert admin_client.post(url, {'name': 'books'}, format='json').status_code == 201
+        assert [row['name'] for row in admin_client.get(url).data['results']] == ['electronics', 'garden', 'books']
+
+        admin_client.delete(f'{url}{branch[1].id}/')
+        assert admin_client.get(url).data['results'][0]['children'] == []
+        assert [row['name'] for row in admin_client.get(f'{url}deleted/').data['results']] == \
+            ['computers', 'laptops']
+
+    @pytest.mark.django_db
+    def test_another_workers_write_is_seen_on_the_next_request(self, admin_client, branch):
+        url = '/api/private/v1/categories/?pagesize=1&pagenum=2'
+        assert admin_client.get(url).data['results'][0]['name'] == 'garden'
+
+        Category.objects.filter(name='garden').update(name='yard')
+        assert admin_client.get(url).data['results'][0]['name'] == 'garden'
+        # What invalidate_tree() in any process does
+        bump_version()
+        response = admin_client.get(url).data
+        assert response['count'] == 2
+        assert response['results'][0]['name'] == 'yard'
+
+    @pytest.mark.django_db
+    def test_least_recently_used_tree_is_evicted(self, settings):
+        settings.CATEGORY_TREE_CACHE_SIZE = 2
+        lru = TreeCache()
+        for key in ['a', 'b', 'a', 'c']:
+            lru.fetch(key, lambda: [key])
+
+        assert set(lru.entries) == {'a', 'c'}
+        assert lru.fetch('a', lambda: ['rebuilt']) == (['a'], True)
@@ -0,0 +1,41 @@
+from collections import defaultdict
+from django.db.models import CharField, F, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Cast, Concat, Least, Length, Replace
+from .models import Category
+
+MAX_LEVEL = 3
+# A category's level from its path: '/3/17/' has three slashes, depth 2
+DEPTH = Length('path') - Length(Replace('path', Value('/'), Value(''))) - 1
+LEVEL = Least(DEPTH, Value(MAX_LEVEL))
+
+
+def children_by_parent(roots, is_deleted=False):
+    """{parent_id: [children]} for every category below `roots`, in one query.
+
+    Categories are at most three levels deep, so every descendant is a child
+    or a grandchild of a root.
+    """
+    ids = [root.id for root in roots]
+    tree = defaultdict(list)
+    if not ids:
+        return tree
+    descendants = Category.objects.filter(
+        Q(parent_id__in=ids) | Q(parent__parent_id__in=ids), is_deleted=is_deleted
+    ).order_by('id')
+    for category in descendants:
+        tree[category.parent_id].append(category)
+    return tree
+
+
+def rebuild_paths(model=Category):
+    """Recompute every path from the parent links, one UPDATE per level.
+
+    Needed after writes that skip `Category.save()`, such as `bulk_create`.
+    """
+    model.objects.update(path='')
+    model.objects.filter(parent__isnull=True).update(path=Concat(Value('/'), Cast('id', CharField()), Value('/')))
+    parent_path = model.objects.filter(pk=OuterRef('parent_id')).values('path')
+    while model.objects.filter(path='', parent__path__gt='').update(
+        path=Concat(Subquery(parent_path), Cast(F('id'), CharField()), Value('/'))
+    ):
+        pass
@@ -1,9 +1,13 @@
+from django.db import transaction
+from django.utils import timezone
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from .models import Category
 from rest_framework.permissions import IsAdminUser
 from .serializers import CategorySerializer
+from .cache import invalidate_tree, trees
+from .tree import children_by_parent
 from apps.core.pagination import StandardResultsSetPagination
 
 class CategoryViewSet(viewsets.ModelViewSet):
@@ -18,33 +22,49 @@ class CategoryViewSet(viewsets.ModelViewSet):
         elif self.action == 'deleted':
             return Category.objects.filter(is_deleted=True).order_by('id')
         queryset = super().get_queryset()
-        level = self.request.query_params.get('level')
         if self.action == 'list':
-            if level and level.isdigit():
-                level = int(level)
-                if 1 <= level <= 3:
-                    queryset = queryset.filter(level=level)
-                else:
-                    queryset = queryset.filter(level=1) # Default to level 1
-            else:
-                queryset = queryset.filter(level=1) 
+            queryset = queryset.filter(level=self.get_level())
         return queryset
+
+    def get_level(self):
+        level = self.request.query_params.get('level')
+        if level and level.isdigit() and 1 <= int(level) <= 3:
+            return int(level)
+        return 1 # Default to level 1
+
+    def cached_tree(self, key):
+        """Paginated response for the whole tree of this listing, serialized
+        once per tree version and kept in this process (see cache.py)."""
+        params = self.request.query_params
+        pagination = self.pagination_class
+        if pagination.cursor_query_param in params or pagination.count_query_param in params:
+            return None # Keyset pages and estimated counts need the queryset
+        data, _ = trees.fetch(key, lambda: list(self.get_serializer(list(self.get_queryset()), many=True).data))
+        page = self.paginate_queryset(data)
+        return self.get_paginated_response(page)
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_tree(('list', self.get_level())) or super().list(request, *args, **kwargs)
     
     def get_serializer_context(self):
         context = super().get_serializer_context()
         context['depth'] = 0
         return context
+
+    def get_serializer(self, *args, **kwargs):
+        # Reads nest the whole subtree: fetch it in one query instead of one per node
+        if self.action in ['list', 'retrieve', 'deleted'] and args:
+            roots = args[0] if kwargs.get('many') else [args[0]]
+            kwargs['context'] = {**self.get_serializer_context(),
+                                 'tree': children_by_parent(roots, is_deleted=self.action == 'deleted')}
+        return super().get_serializer(*args, **kwargs)
     
     def destroy(self, request, *args, **kwargs):
         instance = self.get_object()
 
         # Mark category and all descendants as deleted
-        def mark_deleted(category):
-            category.is_deleted = True
-            category.save()
-            for child in category.children.all():
-                mark_deleted(child)
-        mark_deleted(instance)
+        instance.subtree().update(is_deleted=True, updated_at=timezone.now())
+        invalidate_tree()
         
         return Response({}, status=status.HTTP_204_NO_CONTENT)
     
@@ -52,18 +72,21 @@ class CategoryViewSet(viewsets.ModelViewSet):
     def reactivate(self,request, pk=None):
         instance = self.get_object()
 
-        def reactivate_category(category):
-            serializer = self.get_serializer(category, data={'is_deleted':False}, partial=True)
-            serializer.is_valid(raise_exception=True)
+        # Validates the whole subtree, then reactivates it in one UPDATE
+        serializer = self.get_serializer(instance, data={'is_deleted':False}, partial=True)
+        serializer.is_valid(raise_exception=True)
+        with transaction.atomic():
             serializer.save()
-            for child in category.children.all():
-                reactivate_category(child)
-        reactivate_category(instance)   
+            instance.subtree().filter(is_deleted=True).update(is_deleted=False, updated_at=timezone.now())
+            invalidate_tree()
            
         return Response(self.get_serializer(instance).data)
     
     @action(detail=False, methods=['get'], url_path='deleted')
     def deleted(self, request):
+        response = self.cached_tree(('deleted',))
+        if response is not None:
+            return response
         queryset = self.get_queryset()
         page = self.paginate_queryset(queryset)
         if page is not None:
@@ -78,6 +101,7 @@ class CategoryViewSet(viewsets.ModelViewSet):
         if not instance.is_deleted:
             return Response({"deatil": "Only soft-deleted categories can be permanently deleted."}, status=status.HTTP_400_BAD_REQUEST)
         instance.delete()
+        invalidate_tree()
         return Response({}, status=status.HTTP_204_NO_CONTENT)
     
     @action(detail=False, methods=['post'], url_path='permanent/bulk')
@@ -91,5 +115,6 @@ class CategoryViewSet(viewsets.ModelViewSet):
         if len(categories) != len(ids):
             return Response({"detail":"Some Ids do not correspond to soft-deleted categories."}, status=status.HTTP_400_BAD_REQUEST)
         categories.delete()
+        invalidate_tree()
         return Response(status=status.HTTP_204_NO_CONTENT)
        
\ No newline at end of file
@@ -0,0 +1,48 @@
+from django.db import connections, router
+
+
+def bulk_update_values(model, objs, fields, batch_size=1000):
+    """Same contract as `QuerySet.bulk_update`, but each batch is a single
+    `UPDATE ... FROM (VALUES ...)` joined on the primary key instead of one
+    CASE expression per field, which is far cheaper to build and to run.
+    Falls back to `bulk_update` on backends without UPDATE ... FROM."""
+    connection = connections[router.db_for_write(model)]
+    if connection.vendor not in ('postgresql', 'sqlite'):
+        model.objects.bulk_update(objs, fields, batch_size=batch_size)
+        return
+
+    with connection.cursor() as cursor:
+        for sql, params in update_statements(connection, model, objs, fields, batch_size):
+            cursor.execute(sql, params)
+
+
+def update_statements(connection, model, objs, fields, batch_size):
+    """(sql, params) of each batch's `UPDATE ... FROM (VALUES ...)` on
+    `connection`, a PostgreSQL or SQLite backend. Every name goes through
+    `connection.ops.quote_name`."""
+    opts = model._meta
+    qn = connection.ops.quote_name
+    columns = [opts.pk] + [opts.get_field(name) for name in fields]
+    if connection.vendor == 'postgresql':
+        # VALUES rows are untyped text on Postgres; cast to the column types
+        placeholders = [f'CAST(%s AS {field.db_type(connection)})' for field in columns]
+    else:
+        placeholders = ['%s'] * len(columns)
+    row_sql = f"({', '.join(placeholders)})"
+    aliases = [qn(f'v{index}') for index in range(len(columns))]
+    table = qn(opts.db_table)
+    assignments = ', '.join(
+        f'{qn(field.column)} = v.{alias}' for field, alias in zip(columns[1:], aliases[1:])
+    )
+
+    for start in range(0, len(objs), batch_size):
+        batch = objs[start:start + batch_size]
+        params = [
+            field.get_db_prep_save(getattr(obj, field.attname), connection)
+            for obj in batch for field in columns
+        ]
+        yield (
+            f"WITH v({', '.join(aliases)}) AS (VALUES {', '.join([row_sql] * len(batch))}) "
+            f"UPDATE {table} SET {assignments} FROM v WHERE {table}.{qn(opts.pk.column)} = v.{aliases[0]}",
+            params,
+        )
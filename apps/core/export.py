@@ -0,0 +1,47 @@
+import csv
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import QuerySet
+from django.http import StreamingHttpResponse
+
+EXPORT_CHUNK_SIZE = 2000
+CONTENT_TYPES = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson',
+}
+
+
+class Echo:
+    """File-like object that hands back what csv.writer writes to it."""
+
+    def write(self, value):
+        return value
+
+
+def iterate(rows):
+    # Querysets are read in chunks instead of being loaded whole
+    if isinstance(rows, QuerySet):
+        return rows.iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    return iter(rows)
+
+
+def csv_lines(rows, fields):
+    writer = csv.writer(Echo())
+    yield writer.writerow(fields)
+    for row in rows:
+        yield writer.writerow([row[field] for field in fields])
+
+
+def ndjson_lines(rows, fields):
+    encoder = DjangoJSONEncoder()
+    for row in rows:
+        yield encoder.encode({field: row[field] for field in fields}) + '\n'
+
+
+def stream_export(rows, fields, file_format, filename):
+    """StreamingHttpResponse writing `rows` (dicts with at least `fields`)
+    as CSV or NDJSON while they are read, so memory use does not grow with
+    the number of rows."""
+    lines = csv_lines(rows, fields) if file_format == 'csv' else ndjson_lines(rows, fields)
+    response = StreamingHttpResponse(lines, content_type=CONTENT_TYPES[file_format])
+    response['Content-Disposition'] = f'attachment; filename="{filename}.{file_format}"'
+    return response
@@ -1,7 +1,61 @@
-from rest_framework.pagination import PageNumberPagination
+import json
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+
+class EstimatedCountPaginator(Paginator):
+    # Below this many rows the planner estimate is not worth the inaccuracy
+    exact_count_threshold = 10000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if connections[queryset.db].vendor == 'postgresql':
+            plan = json.loads(queryset.explain(format='json'))
+            estimate = int(plan[0]['Plan']['Plan Rows'])
+            if estimate > self.exact_count_threshold:
+                return estimate
+        return super().count
+
+
+class KeysetPagination(CursorPagination):
+    page_size = 10
+    page_size_query_param = 'pagesize'
+    cursor_query_param = 'cursor'
+    max_page_size = 100
+    ordering = 'id'
+
 
 class StandardResultsSetPagination(PageNumberPagination):
+    """Page-number pagination by default.
+
+    `?cursor=` (empty to start) switches to keyset pagination on the view's
+    `cursor_ordering` (default `id`): no OFFSET and no COUNT(*), so deep pages
+    cost the same as the first one. `?count=estimate` keeps page numbers but
+    takes the total from the planner's row estimate on large Postgres tables.
+    """
     page_size = 10
     page_size_query_param = 'pagesize'
     page_query_param = 'pagenum'
     max_page_size = 100
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'
+
+    keyset = None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.cursor_query_param in request.query_params:
+            self.keyset = KeysetPagination()
+            self.keyset.ordering = getattr(view, 'cursor_ordering', KeysetPagination.ordering)
+            return self.keyset.paginate_queryset(queryset, request, view)
+
+        if request.query_params.get(self.count_query_param) == 'estimate':
+            self.django_paginator_class = EstimatedCountPaginator
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
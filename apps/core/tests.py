@@ -0,0 +1,49 @@
+from decimal import Decimal
+import pytest
+from django.db import connection
+from django.db.backends.postgresql.base import DatabaseWrapper
+from apps.core.bulk import bulk_update_values, update_statements
+from apps.products.models import Product
+
+
+def make_products(count):
+    return Product.objects.bulk_create([
+        Product(goods_name=f'Product {n}', goods_price=10, goods_quantity=5, goods_weight=1) for n in range(count)
+    ])
+
+
+class TestBulkUpdateValues:
+
+    def test_postgres_sql_casts_values_and_quotes_names(self, monkeypatch):
+        # Never connects: the SQL is only built
+        postgres = DatabaseWrapper({**connection.settings_dict, 'ENGINE': 'django.db.backends.postgresql'})
+        quoted = []
+
+        def quote_name(name):
+            quoted.append(name)
+            return f'"{name}"'
+        monkeypatch.setattr(postgres.ops, 'quote_name', quote_name)
+        products = [Product(id=n, goods_price=Decimal('1.50'), goods_quantity=n) for n in (1, 2, 3)]
+
+        statements = list(update_statements(postgres, Product, products, ['goods_price', 'goods_quantity'], 2))
+
+        assert [len(params) for _, params in statements] == [6, 3]
+        sql, params = statements[0]
+        row = '(CAST(%s AS bigint), CAST(%s AS numeric(10, 2)), CAST(%s AS integer))'
+        assert sql == (
+            f'WITH v("v0", "v1", "v2") AS (VALUES {row}, {row}) '
+            'UPDATE "apps_products_product" SET "goods_price" = v."v1", "goods_quantity" = v."v2" '
+            'FROM v WHERE "apps_products_product"."id" = v."v0"'
+        )
+        assert params == [1, Decimal('1.50'), 1, 2, Decimal('1.50'), 2]
+        assert {'apps_products_product', 'id', 'goods_price', 'goods_quantity'} <= set(quoted)
+
+    @pytest.mark.django_db
+    def test_updates_every_batch(self):
+        products = make_products(5)
+        for n, product in enumerate(products):
+            product.goods_quantity = n * 10
+
+        bulk_update_values(Product, products, ['goods_quantity'], batch_size=2)
+
+        assert list(Product.objects.order_by('id').values_list('goods_quantity', flat=True)) == [0, 10, 20, 30, 40]
@@ -0,0 +1,102 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connection, transaction
+from django.db.models import Sum
+from rest_framework.exceptions import ValidationError
+from apps.orders.models import Order, OrderItem
+from apps.orders.numbers import allocator
+from apps.orders.serializers import OrderSerializer
+from apps.products.models import Product
+from apps.users.models import User
+
+
+def legacy_create(validated_data):
+    # The checkout this replaced: unlocked read-modify-write per item
+    items_data = validated_data.pop('items')
+    validated_data['order_number'] = allocator.allocate()
+    with transaction.atomic():
+        order = Order.objects.create(**validated_data)
+        for item_data in items_data:
+            product = item_data['product']
+            OrderItem.objects.create(order=order, product=product, quantity=item_data['quantity'],
+                                     unit_price=product.goods_price)
+            product.goods_quantity -= item_data['quantity']
+            product.save()
+    return order
+
+
+class Command(BaseCommand):
+    help = 'Measure checkouts/sec and oversell under concurrent checkouts (synthetic rows are deleted afterwards)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--orders', type=int, default=50, help='Checkouts attempted per thread')
+        parser.add_argument('--products', type=int, default=5)
+        parser.add_argument('--stock', type=int, default=100, help='Initial units per product')
+        parser.add_argument('--legacy', action='store_true', help='Also time the previous checkout code')
+        parser.add_argument('--keep', action='store_true', help='Keep the synthetic rows')
+
+    def handle(self, *args, **options):
+        variants = [('current', None)] + ([('legacy', legacy_create)] if options['legacy'] else [])
+        for name, create in variants:
+            self.run(name, create, options)
+
+    def run(self, name, create, options):
+        users = User.objects.bulk_create([
+            User(username=f'bench-checkout-{name}-{n}', email=f'bench-checkout-{name}-{n}@example.com')
+            for n in range(options['threads'])
+        ])
+        products = Product.objects.bulk_create([
+            Product(goods_name=f'Bench {name} {n}', goods_price=10, goods_quantity=options['stock'], goods_weight=1)
+            for n in range(options['products'])
+        ])
+        # Every order takes one unit of each product, in varying item order
+        items = [{'product_id': product.id, 'quantity': 1} for product in products]
+        retries = []
+
+        def worker(index):
+            payload = {'user_id': users[index].id, 'shipping_address': '1 Bench St',
+                       'items': items[index % len(items):] + items[:index % len(items)]}
+            accepted = retried = 0
+            try:
+                for _ in range(options['orders']):
+                    while True:
+                        serializer = OrderSerializer(data=payload)
+                        try:
+                            serializer.is_valid(raise_exception=True)
+                            if create:
+                                create(dict(serializer.validated_data))
+                            else:
+                                serializer.save()
+                            accepted += 1
+                        except ValidationError:
+                            pass
+                        except OperationalError:
+                            retried += 1
+                            continue
+                        break
+            finally:
+                retries.append(retried)
+                connection.close()
+            return accepted
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['threads']) as pool:
+            accepted = sum(pool.map(worker, range(options['threads'])))
+        elapsed = time.perf_counter() - started
+
+        attempted = options['threads'] * options['orders']
+        sold = OrderItem.objects.filter(product__in=products).aggregate(units=Sum('quantity'))['units'] or 0
+        remaining = Product.objects.filter(pk__in=[p.id for p in products]).aggregate(units=Sum('goods_quantity'))['units']
+        lost = sold - (options['stock'] * len(products) - remaining)
+        self.stdout.write(
+            f'{name}: {attempted} checkouts in {elapsed:.2f}s ({attempted / elapsed:.0f}/s), '
+            f'{accepted} accepted, {sold} units sold of {options["stock"] * len(products)}, '
+            f'{lost} units oversold, {sum(retries)} lock retries'
+        )
+
+        if not options['keep']:
+            Order.objects.filter(user__in=users).delete()
+            Product.objects.filter(pk__in=[p.id for p in products]).delete()
+            User.objects.filter(pk__in=[u.id for u in users]).delete()
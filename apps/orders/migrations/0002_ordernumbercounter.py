@@ -0,0 +1,36 @@
+from django.db import migrations, models
+
+from apps.orders.numbers import first_free_value, install_sequence, uninstall_sequence
+
+
+def forwards(apps, schema_editor):
+    Order = apps.get_model('apps_orders', 'Order')
+    OrderNumberCounter = apps.get_model('apps_orders', 'OrderNumberCounter')
+    start = first_free_value(Order.objects.values_list('order_number', flat=True).iterator())
+    OrderNumberCounter.objects.create(pk=1, next_value=start)
+    install_sequence(schema_editor, start)
+
+
+def backwards(apps, schema_editor):
+    uninstall_sequence(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apps_orders', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderNumberCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('next_value', models.BigIntegerField(default=1)),
+            ],
+            options={
+                'db_table': 'apps_orders_ordernumbercounter',
+            },
+        ),
+        migrations.RunPython(forwards, backwards),
+    ]
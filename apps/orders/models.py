@@ -1,8 +1,8 @@
 from django.db import models
 # from django.conf import settings
 from apps.products.models import Product
-from apps.categories.models import Category
 from apps.users.models import User
+from .numbers import allocator
 
 class Order(models.Model):
     STATUS_CHOICES = (
@@ -32,15 +32,30 @@ class Order(models.Model):
         db_table = 'apps_orders_order'
         verbose_name = 'Order'
         verbose_name_plural = 'Orders'
+        indexes = [
+            # Reports filter on created_at ranges, customers list their own orders newest first
+            models.Index(fields=['created_at'], name='order_created_idx'),
+            models.Index(fields=['user', 'created_at'], name='order_user_created_idx'),
+            models.Index(fields=['payment_status', 'created_at'], name='order_payment_created_idx'),
+            # Incremental refresh of the analytics engine reads orders changed since its last load
+            models.Index(fields=['updated_at'], name='order_updated_idx'),
+        ]
 
     def save(self, *args, **kwargs):
         if not self.order_number:
-            self.order_number = f'ORD-{Category.objects.count():06d}{self.user.id}'
+            self.order_number = allocator.allocate()
         super().save(*args, **kwargs)
 
     def __str__(self):
         return f'Order {self.order_number} - {self.user.username}'
 
+class OrderNumberCounter(models.Model):
+    # Single row backing order numbers on databases without sequences
+    next_value = models.BigIntegerField(default=1)
+
+    class Meta:
+        db_table = 'apps_orders_ordernumbercounter'
+
 class OrderItem(models.Model):
     order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='items')
     product = models.ForeignKey(Product, on_delete=models.SET_NULL, null=True, related_name='order_items')
@@ -0,0 +1,84 @@
+import os
+import re
+import threading
+from django.db import connection, transaction
+from django.db.models import F
+
+SEQUENCE = 'apps_orders_order_number_seq'
+BLOCK_SIZE = 50
+NUMBER_PATTERN = re.compile(r'^ORD-(\d+)$')
+
+
+def format_order_number(value):
+    return f'ORD-{value:012d}'
+
+
+def first_free_value(order_numbers):
+    """Smallest value above every existing numeric order number, so new
+    fixed-width numbers can never collide with older ones."""
+    values = (NUMBER_PATTERN.match(number) for number in order_numbers)
+    return max((int(match.group(1)) for match in values if match), default=0) + 1
+
+
+def install_sequence(schema_editor, start):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(
+            f'CREATE SEQUENCE IF NOT EXISTS {SEQUENCE} START WITH {int(start)} INCREMENT BY {BLOCK_SIZE}'
+        )
+
+
+def uninstall_sequence(schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(f'DROP SEQUENCE IF EXISTS {SEQUENCE}')
+
+
+def reserve(count):
+    """First value of a newly reserved range of `count` numbers.
+
+    Postgres uses a sequence stepping by BLOCK_SIZE; nextval() is never
+    rolled back, so a range stays reserved even if the caller's transaction
+    fails. Other backends bump a counter row instead.
+    """
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT nextval(%s)', [SEQUENCE])
+            return cursor.fetchone()[0]
+    from .models import Order, OrderNumberCounter
+    with transaction.atomic():
+        if not OrderNumberCounter.objects.filter(pk=1).update(next_value=F('next_value') + count):
+            # Row missing (e.g. the table was flushed): rebuild it from the orders
+            start = first_free_value(Order.objects.values_list('order_number', flat=True).iterator())
+            OrderNumberCounter.objects.get_or_create(pk=1, defaults={'next_value': start + count})
+        return OrderNumberCounter.objects.get(pk=1).next_value - count
+
+
+class OrderNumberAllocator:
+    """Hands out unique order numbers from ranges reserved BLOCK_SIZE at a
+    time, so only one order in BLOCK_SIZE goes to the database for its
+    number. Numbers increase within a process; ranges held by different
+    processes interleave."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.next = self.end = 0
+
+    def allocate(self):
+        if connection.vendor != 'postgresql' and connection.in_atomic_block:
+            # The counter update would roll back with the caller while the rest
+            # of the range stayed cached here, so take just this one number
+            return format_order_number(reserve(1))
+        with self.lock:
+            if self.next == self.end:
+                self.next = reserve(BLOCK_SIZE)
+                self.end = self.next + BLOCK_SIZE
+            value = self.next
+            self.next += 1
+        return format_order_number(value)
+
+
+allocator = OrderNumberAllocator()
+# A forked worker must not reuse the range its parent was holding
+os.register_at_fork(after_in_child=allocator.reset)
@@ -1,21 +1,38 @@
 from rest_framework import serializers
 from .models import Order, OrderItem, ShippingTracking
+from .numbers import allocator
 from apps.products.models import Product
 from apps.products.serializers import ProductSerializer
+from collections import defaultdict
 from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
 from apps.users.models import User
+from apps.analytics.trending import tracker as trending
+
+class ProductSnapshotSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Product
+        fields = ['id', 'goods_name', 'goods_price', 'goods_small_logo']
 
 class OrderItemSerializer(serializers.ModelSerializer):
     product_id = serializers.PrimaryKeyRelatedField(
         queryset=Product.objects.all(), source='product'
     )
-    product = ProductSerializer(read_only=True)
+    product = ProductSnapshotSerializer(read_only=True)
 
     class Meta:
         model = OrderItem
         fields = ['id', 'product_id', 'product', 'quantity', 'unit_price']
         read_only_fields = ['id', 'unit_price']
 
+    def get_fields(self):
+        fields = super().get_fields()
+        # ?expand=product: full product with categories, pictures and attributes
+        if self.context.get('expand_product'):
+            fields['product'] = ProductSerializer(read_only=True)
+        return fields
+
     def validate(self, data):
         product = data.get('product')
         quantity = data.get('quantity')
@@ -55,22 +72,41 @@ class OrderSerializer(serializers.ModelSerializer):
         data['total_amount'] = total_amount
         return data
 
-    @transaction.atomic
     def create(self, validated_data):
         items_data = validated_data.pop('items')
-        order = Order.objects.create(**validated_data)
+        # Allocated outside the transaction so it comes from the reserved range
+        validated_data['order_number'] = allocator.allocate()
 
+        quantities = defaultdict(int)
         for item_data in items_data:
-            product = item_data['product']
-            quantity = item_data['quantity']
-            OrderItem.objects.create(
-                order=order,
-                product=product,
-                quantity=quantity,
-                unit_price=product.goods_price
-            )
-            product.goods_quantity -= quantity
-            product.save()
+            quantities[item_data['product'].id] += item_data['quantity']
+
+        with transaction.atomic():
+            # Conditional decrements in id order: no lost updates, no oversell,
+            # and concurrent checkouts lock rows in the same order
+            now = timezone.now()
+            for product_id in sorted(quantities):
+                reserved = Product.objects.filter(
+                    pk=product_id, goods_quantity__gte=quantities[product_id]
+                ).update(goods_quantity=F('goods_quantity') - quantities[product_id], updated_at=now)
+                if not reserved:
+                    product = Product.objects.get(pk=product_id)
+                    raise serializers.ValidationError({
+                        'quantity': f'Only {product.goods_quantity} units of {product.goods_name} available.'
+                    })
+
+            order = Order.objects.create(**validated_data)
+            OrderItem.objects.bulk_create([
+                OrderItem(
+                    order=order,
+                    product=item_data['product'],
+                    quantity=item_data['quantity'],
+                    unit_price=item_data['product'].goods_price
+                )
+                for item_data in items_data
+            ])
+            # Only orders that commit count towards the trending top sellers
+            transaction.on_commit(lambda: trending.record(quantities))
 
         return order
 
@@ -0,0 +1,50 @@
+import pytest
+import time
+from django.db import OperationalError, connection
+from rest_framework.exceptions import ValidationError
+from rest_framework.test import APIClient
+from pytest_factoryboy import register
+from apps.orders.serializers import OrderSerializer
+from apps.analytics.tests.factories import UserFactory, ProductFactory, OrderFactory, OrderItemFactory
+
+register(UserFactory)
+register(ProductFactory)
+register(OrderFactory)
+register(OrderItemFactory)
+
+
+@pytest.fixture
+def api_client():
+    """DRF test client"""
+    return APIClient()
+
+@pytest.fixture
+def admin_client(api_client, user_factory):
+    """Authenticated API client with an admin user"""
+    user = user_factory(is_staff=True)
+    api_client.force_authenticate(user=user)
+    return api_client
+
+@pytest.fixture
+def place_orders():
+    """Checks out `count` orders through OrderSerializer, meant to run in a
+    worker thread. Returns the order numbers, with None for orders rejected
+    by validation."""
+    def place(user_id, items, count):
+        payload = {'user_id': user_id, 'shipping_address': '1 Main St', 'items': items}
+        placed = []
+        try:
+            while len(placed) < count:
+                serializer = OrderSerializer(data=payload)
+                try:
+                    serializer.is_valid(raise_exception=True)
+                    placed.append(serializer.save().order_number)
+                except ValidationError:
+                    placed.append(None)
+                except OperationalError:
+                    # In-memory SQLite locks whole tables across threads instead of waiting
+                    time.sleep(0.001)
+            return placed
+        finally:
+            connection.close()
+    return place
@@ -0,0 +1,68 @@
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from django.db import connection
+from django.db.models import Sum
+from django.test.utils import CaptureQueriesContext
+from apps.orders.models import Order, OrderItem
+from apps.products.models import Product
+
+
+@pytest.fixture
+def customer_client(api_client, user_factory):
+    api_client.user = user_factory()
+    api_client.force_authenticate(user=api_client.user)
+    return api_client
+
+
+class TestCheckout:
+
+    @pytest.mark.django_db
+    def test_items_are_written_in_one_insert(self, customer_client, product_factory):
+        shoe, hat = product_factory(goods_quantity=5), product_factory(goods_quantity=5)
+        payload = {
+            'user_id': customer_client.user.id,
+            'shipping_address': '1 Main St',
+            'items': [
+                {'product_id': hat.id, 'quantity': 1},
+                {'product_id': shoe.id, 'quantity': 2},
+                {'product_id': hat.id, 'quantity': 2},
+            ],
+        }
+        with CaptureQueriesContext(connection) as queries:
+            response = customer_client.post('/api/private/v1/orders/', payload, format='json')
+
+        assert response.status_code == 201
+        assert len([q for q in queries if q['sql'].startswith('INSERT INTO "apps_orders_orderitem"')]) == 1
+        assert dict(Product.objects.values_list('id', 'goods_quantity')) == {shoe.id: 3, hat.id: 2}
+        assert OrderItem.objects.count() == 3
+
+    @pytest.mark.django_db
+    def test_insufficient_stock_rolls_back_the_whole_order(self, customer_client, product_factory):
+        shoe, hat = product_factory(goods_quantity=5), product_factory(goods_quantity=1)
+        payload = {
+            'user_id': customer_client.user.id,
+            'shipping_address': '1 Main St',
+            'items': [{'product_id': shoe.id, 'quantity': 2}, {'product_id': hat.id, 'quantity': 1},
+                      {'product_id': hat.id, 'quantity': 1}],
+        }
+
+        response = customer_client.post('/api/private/v1/orders/', payload, format='json')
+
+        assert response.status_code == 400
+        assert not Order.objects.exists()
+        assert dict(Product.objects.values_list('id', 'goods_quantity')) == {shoe.id: 5, hat.id: 1}
+
+    @pytest.mark.django_db(transaction=True)
+    def test_concurrent_checkouts_never_oversell(self, user_factory, product_factory, place_orders):
+        users = [user_factory() for _ in range(8)]
+        shoe, hat = product_factory(goods_quantity=30), product_factory(goods_quantity=45)
+        items = [{'product_id': hat.id, 'quantity': 2}, {'product_id': shoe.id, 'quantity': 1}]
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            results = pool.map(place_orders, [user.id for user in users], [items] * 8, [10] * 8)
+            placed = [number for numbers in results for number in numbers]
+
+        sold = dict(OrderItem.objects.values('product').annotate(units=Sum('quantity')).values_list('product', 'units'))
+        assert len([number for number in placed if number]) == Order.objects.count() == 22
+        assert sold == {shoe.id: 22, hat.id: 44}
+        assert dict(Product.objects.values_list('id', 'goods_quantity')) == {shoe.id: 8, hat.id: 1}
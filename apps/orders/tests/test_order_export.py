@@ -0,0 +1,51 @@
+import csv
+import io
+import json
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+
+@pytest.fixture
+def orders(order_factory, order_item_factory, product_factory):
+    first, second = order_factory(), order_factory()
+    for order in (first, second):
+        for quantity in (1, 2):
+            order_item_factory(order=order, product=product_factory(), quantity=quantity, unit_price=10)
+    return first, second
+
+
+class TestOrderExport:
+
+    @pytest.mark.django_db
+    def test_csv_has_a_row_per_item(self, admin_client, orders):
+        with CaptureQueriesContext(connection) as ctx:
+            response = admin_client.get('/api/private/v1/orders/export.csv')
+            body = b''.join(response.streaming_content).decode()
+
+        assert response.status_code == 200
+        assert response['Content-Type'].startswith('text/csv')
+        assert response['Content-Disposition'] == 'attachment; filename="orders.csv"'
+        rows = list(csv.DictReader(io.StringIO(body)))
+        assert len(rows) == 4
+        assert {row['order_number'] for row in rows} == {order.order_number for order in orders}
+        assert sorted(row['quantity'] for row in rows) == ['1', '1', '2', '2']
+        # A single query for the rows, however many orders there are
+        assert len([q for q in ctx.captured_queries if 'apps_orders_order' in q['sql']]) == 1
+
+    @pytest.mark.django_db
+    def test_ndjson(self, admin_client, orders):
+        response = admin_client.get('/api/private/v1/orders/export.ndjson')
+
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        assert response['Content-Type'] == 'application/x-ndjson'
+        rows = [json.loads(line) for line in lines]
+        assert len(rows) == 4
+        assert rows[0]['order_id'] == orders[1].id
+        assert rows[0]['unit_price'] == '10.00'
+
+    @pytest.mark.django_db
+    def test_export_is_admin_only(self, api_client, user_factory, orders):
+        api_client.force_authenticate(user=user_factory())
+
+        assert api_client.get('/api/private/v1/orders/export.csv').status_code == 403
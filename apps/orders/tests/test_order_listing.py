@@ -0,0 +1,77 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from apps.categories.models import Category
+from apps.orders.models import ShippingTracking
+from apps.products.models import ProductPicture
+
+
+@pytest.fixture
+def orders(order_factory, order_item_factory, product_factory, user_factory):
+    def make(count):
+        category = Category.objects.create(name=f'Category {count}')
+        user = user_factory()
+        for n in range(count):
+            order = order_factory(user=user)
+            for _ in range(3):
+                product = product_factory()
+                product.categories.set([category])
+                ProductPicture.objects.create(product=product, pics_big='big.png', pics_mid='mid.png', pics_sma='sma.png')
+                order_item_factory(order=order, product=product)
+            if n % 2:
+                ShippingTracking.objects.create(order=order, carrier='DHL', tracking_number=f'T{n}')
+    return make
+
+
+class TestOrderListing:
+
+    def list_queries(self, client, query=''):
+        with CaptureQueriesContext(connection) as ctx:
+            response = client.get(f'/api/private/v1/orders/?pagesize=100{query}')
+        assert response.status_code == 200
+        return response, len(ctx.captured_queries)
+
+    @pytest.mark.django_db
+    def test_listing_query_count_is_constant(self, admin_client, orders):
+        orders(2)
+        _, small = self.list_queries(admin_client)
+        orders(30)
+        response, large = self.list_queries(admin_client)
+
+        assert len(response.data['results']) == 32
+        # count, orders + tracking, items + product
+        assert large == small == 3
+
+    @pytest.mark.django_db
+    def test_cursor_pages_follow_the_listing_order(self, admin_client, orders):
+        orders(5)
+        listed = [row['id'] for row in admin_client.get('/api/private/v1/orders/').data['results']]
+
+        first = admin_client.get('/api/private/v1/orders/?cursor=&pagesize=3').data
+        second = admin_client.get(first['next']).data
+
+        assert [row['id'] for row in first['results'] + second['results']] == listed
+
+    @pytest.mark.django_db
+    def test_items_carry_a_product_snapshot(self, admin_client, orders):
+        orders(2)
+
+        response, _ = self.list_queries(admin_client)
+
+        rows = sorted(response.data['results'], key=lambda row: row['id'])
+        item = rows[0]['items'][0]
+        assert set(item['product']) == {'id', 'goods_name', 'goods_price', 'goods_small_logo'}
+        assert rows[0]['tracking'] is None
+        assert rows[1]['tracking']['carrier'] == 'DHL'
+
+    @pytest.mark.django_db
+    def test_full_product_on_request(self, admin_client, orders):
+        orders(2)
+        _, small = self.list_queries(admin_client, '&expand=product')
+        orders(30)
+        response, large = self.list_queries(admin_client, '&expand=product')
+
+        product = response.data['results'][0]['items'][0]['product']
+        assert product['goods_cat'] and product['pics']
+        # + products, categories, pics, attrs
+        assert large == small == 7
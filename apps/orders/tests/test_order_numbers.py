@@ -0,0 +1,54 @@
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from django.db import connection
+from apps.orders.models import Order
+from apps.orders.numbers import BLOCK_SIZE, allocator, first_free_value
+
+
+def allocate_many(count):
+    try:
+        return [allocator.allocate() for _ in range(count)]
+    finally:
+        connection.close()
+
+
+class TestOrderNumbers:
+
+    def test_new_numbers_start_above_existing_ones(self):
+        assert first_free_value(['ORD-0000051', 'ORD-000000000120', 'legacy-999']) == 121
+        assert first_free_value([]) == 1
+
+    @pytest.mark.django_db(transaction=True)
+    def test_numbers_come_from_reserved_blocks(self, django_assert_num_queries):
+        allocator.reset()
+        first = allocator.allocate()
+        with django_assert_num_queries(0):
+            rest = [allocator.allocate() for _ in range(BLOCK_SIZE - 1)]
+
+        numbers = [first, *rest]
+        assert numbers == sorted(numbers)
+        assert len(set(numbers)) == BLOCK_SIZE
+        assert first == 'ORD-000000000001'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_allocator_is_thread_safe(self):
+        allocator.reset()
+        with ThreadPoolExecutor(max_workers=16) as pool:
+            batches = list(pool.map(allocate_many, [500] * 16))
+
+        numbers = [number for batch in batches for number in batch]
+        assert len(set(numbers)) == 16 * 500
+        assert all(batch == sorted(batch) for batch in batches)
+
+    @pytest.mark.django_db(transaction=True)
+    def test_parallel_checkouts_get_unique_numbers(self, user_factory, product_factory, place_orders):
+        allocator.reset()
+        users = [user_factory() for _ in range(8)]
+        items = [{'product_id': product_factory(goods_quantity=1000).id, 'quantity': 1}]
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            results = pool.map(place_orders, [user.id for user in users], [items] * 8, [10] * 8)
+            placed = [number for numbers in results for number in numbers]
+
+        assert len(set(placed)) == 80
+        assert set(Order.objects.values_list('order_number', flat=True)) == set(placed)
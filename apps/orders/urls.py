@@ -1,4 +1,4 @@
-from django.urls import path, include
+from django.urls import path, re_path, include
 from rest_framework.routers import DefaultRouter
 from .views import OrderViewSet
 
@@ -6,5 +6,6 @@ router = DefaultRouter()
 router.register(r'',OrderViewSet, basename='order')
 
 urlpatterns = [
+    re_path(r'^export\.(?P<file_format>csv|ndjson)$', OrderViewSet.as_view({'get': 'export'}), name='order-export'),
     path('', include(router.urls)),
 ]
\ No newline at end of file
@@ -2,23 +2,62 @@ from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
-from .models import Order, ShippingTracking
+from django.db.models import Prefetch
+from .models import Order, OrderItem, ShippingTracking
+from apps.products.models import Product
 from .serializers import OrderSerializer, ChangeShippingAddressSerializer, UpdateTrackingSerializer
+from apps.core.export import iterate, stream_export
+
+# One export row per order item; orders without items get a single row with empty item columns
+EXPORT_COLUMNS = {
+    'order_id': 'id',
+    'order_number': 'order_number',
+    'created_at': 'created_at',
+    'user_id': 'user_id',
+    'status': 'status',
+    'payment_status': 'payment_status',
+    'total_amount': 'total_amount',
+    'item_id': 'items__id',
+    'product_id': 'items__product_id',
+    'product_name': 'items__product__goods_name',
+    'quantity': 'items__quantity',
+    'unit_price': 'items__unit_price',
+}
 
 class OrderViewSet(viewsets.ModelViewSet):
     queryset = Order.objects.all()
     serializer_class = OrderSerializer
     permission_classes = [IsAuthenticated]
+    # ?cursor= pages in the listing's order, newest first
+    cursor_ordering = ('-created_at', '-id')
 
     def get_permissions(self):
         if self.action in ['create','update','partial_update','change_address']:
             return [IsAuthenticated()]
         return [IsAdminUser()]
     
+    def expand_product(self):
+        return self.request.query_params.get('expand') == 'product'
+
     def get_queryset(self):
+        queryset = self.queryset.select_related('tracking').order_by('-created_at', '-id')
+        if self.expand_product():
+            queryset = queryset.prefetch_related(
+                Prefetch('items', queryset=OrderItem.objects.order_by('id')),
+                Prefetch('items__product', queryset=Product.objects.with_related()),
+            )
+        else:
+            queryset = queryset.prefetch_related(
+                Prefetch('items', queryset=OrderItem.objects.select_related('product').order_by('id'))
+            )
         if self.request.user.is_staff:
-            return self.queryset
-        return self.queryset.filter(user=self.request.user)
+            return queryset
+        return queryset.filter(user=self.request.user)
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['expand_product'] = self.expand_product()
+        return context
     
     def perform_create(self,serializer):
         serializer.save(user=self.request.user)
@@ -56,3 +95,11 @@ class OrderViewSet(viewsets.ModelViewSet):
                 "data":{},
                 "message":"Failed to update Tracking"
             }, status=status.HTTP_400_BAD_REQUEST)
+
+    def export(self, request, file_format='csv'):
+        """Every order, newest first, streamed as CSV or NDJSON from plain
+        rows instead of serialized order objects. Routed in urls.py, without
+        the router's trailing slash."""
+        fields = list(EXPORT_COLUMNS)
+        rows = Order.objects.order_by('-created_at', '-id', 'items__id').values_list(*EXPORT_COLUMNS.values())
+        return stream_export((dict(zip(fields, row)) for row in iterate(rows)), fields, file_format, 'orders')
@@ -0,0 +1,188 @@
+import multiprocessing
+import os
+import random
+import resource
+import tempfile
+import time
+from statistics import median
+from PIL import Image
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from apps.attributes.models import CategoryAttribute
+from apps.categories.models import Category
+from apps.products.models import Product
+from apps.products.search import icontains_search, search_products
+from apps.products.serializers import BulkProductSerializer, BulkProductListSerializer
+from apps.products.thumbnails import SIZES, make_thumbnails
+
+SYLLABLES = ['ka', 'lo', 'mi', 'ra', 'ten', 'pho', 'ne', 'lap', 'top', 'sun', 'gra', 'vi', 'tor', 'bel', 'zu', 'cam']
+
+
+def legacy_thumbnails(path, out_dir):
+    # The resize code this module replaced: three full-resolution resizes
+    img = Image.open(path)
+    name = os.path.basename(path)
+    for prefix, size in SIZES:
+        img.resize((size, size), Image.LANCZOS).save(os.path.join(out_dir, f'{prefix}_{name}'))
+
+
+def current_thumbnails(path, out_dir):
+    stem = os.path.splitext(os.path.basename(path))[0]
+    make_thumbnails(path, {prefix: os.path.join(out_dir, f'{prefix}_{stem}.jpg') for prefix, _ in SIZES})
+
+
+def time_thumbnails(func, paths, out_dir, results):
+    # Runs in a forked child, whose ru_maxrss starts at the pages shared with
+    # the parent; only the growth above that is this variant's own. Pillow
+    # allocates outside the Python heap, so tracemalloc would miss it.
+    at_fork = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    started = time.perf_counter()
+    for path in paths:
+        func(path, out_dir)
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    results.put((elapsed_ms / len(paths), (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - at_fork) / 1024))
+
+
+class Command(BaseCommand):
+    help = 'Benchmark product catalog operations on a synthetic catalog (rolled back afterwards)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scenario', choices=['search', 'bulk_create', 'bulk_update', 'thumbnails'], default='search')
+        parser.add_argument('--rows', type=int, help='Catalog size for search/bulk_update, batch size for bulk_create')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--query', action='append', dest='queries',
+                            help='Query to time (repeatable). Defaults to a mix of common and rare terms.')
+        parser.add_argument('--keep', action='store_true', help='Commit the synthetic rows instead of rolling back')
+        parser.add_argument('--images', help='Folder of source images for thumbnails (default: generated 12MP JPEGs)')
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        with transaction.atomic():
+            getattr(self, f"run_{options['scenario']}")(rng, options)
+            if not options['keep']:
+                transaction.set_rollback(True)
+
+    def make_vocabulary(self, rng):
+        return [''.join(rng.choices(SYLLABLES, k=rng.randint(2, 4))) for _ in range(5000)]
+
+    def generate_catalog(self, rng, vocabulary, rows, batch_size):
+        # Zipf-like skew: a few words are very common, most are rare
+        weights = [1 / (rank + 1) for rank in range(len(vocabulary))]
+        started = time.perf_counter()
+        for offset in range(0, rows, batch_size):
+            Product.objects.bulk_create([
+                Product(
+                    goods_name=' '.join(rng.choices(vocabulary, weights, k=3)),
+                    goods_description=' '.join(rng.choices(vocabulary, weights, k=20)),
+                    goods_price=rng.randint(1, 100000) / 100,
+                    goods_quantity=rng.randint(0, 500),
+                    goods_weight=1,
+                )
+                for _ in range(min(batch_size, rows - offset))
+            ])
+        self.stdout.write(f'Generated {rows} products in {time.perf_counter() - started:.1f}s')
+
+    def time_page(self, queryset, repeat, page_size=10):
+        # Mirrors one listing request: COUNT(*) plus the first page
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            total = queryset.count()
+            list(queryset[:page_size])
+            timings.append((time.perf_counter() - started) * 1000)
+        return total, median(timings)
+
+    def run_search(self, rng, options):
+        vocabulary = self.make_vocabulary(rng)
+        self.generate_catalog(rng, vocabulary, options['rows'] or 1_000_000, options['batch_size'])
+        queries = options['queries'] or [vocabulary[0], vocabulary[0][:3], vocabulary[200], vocabulary[-1]]
+        base = Product.objects.filter(is_deleted=False).order_by('id')
+        self.stdout.write(f"{'query':<20}{'hits':>10}{'icontains ms':>16}{'search ms':>14}{'speedup':>10}")
+        for query in queries:
+            hits, legacy_ms = self.time_page(icontains_search(base, query), options['repeat'])
+            search_hits, search_ms = self.time_page(search_products(base, query), options['repeat'])
+            self.stdout.write(
+                f'{query:<20}{search_hits:>10}{legacy_ms:>16.1f}{search_ms:>14.1f}{legacy_ms / search_ms:>9.1f}x'
+            )
+
+    def run_bulk_create(self, rng, options):
+        rows = options['rows'] or 10_000
+        categories = [Category.objects.create(name=f'bench-category-{n}') for n in range(20)]
+        attributes = [
+            CategoryAttribute.objects.create(attr_name='Color', cat_id=category, attr_sel='many', attr_write='list')
+            for category in categories
+        ]
+        payload = []
+        for n in range(rows):
+            picked = rng.sample(range(len(categories)), 2)
+            payload.append({
+                'goods_name': f'bench product {n}',
+                'goods_cat': [categories[i].id for i in picked],
+                'goods_price': '19.99',
+                'goods_quantity': rng.randint(0, 500),
+                'goods_weight': '1.00',
+                'attrs': [{'attr_id': attributes[i].id, 'attr_value': f'value {n}'} for i in picked],
+            })
+
+        timings = []
+        for _ in range(options['repeat']):
+            sid = transaction.savepoint()
+            started = time.perf_counter()
+            serializer = BulkProductSerializer(data=payload, many=True)
+            serializer.is_valid(raise_exception=True)
+            serializer.save()
+            timings.append(time.perf_counter() - started)
+            transaction.savepoint_rollback(sid)
+
+        seconds = median(timings)
+        self.stdout.write(
+            f'{rows} products (2 categories, 2 attributes each): {seconds:.2f}s, {rows / seconds:,.0f} products/s'
+        )
+
+    def run_bulk_update(self, rng, options):
+        rows = options['rows'] or 50_000
+        self.generate_catalog(rng, self.make_vocabulary(rng), rows, options['batch_size'])
+        products = list(Product.objects.order_by('id'))
+        chunk = BulkProductListSerializer.max_batch_size
+
+        started = time.perf_counter()
+        for start in range(0, rows, chunk):
+            batch = products[start:start + chunk]
+            payload = [{'id': product.id, 'goods_price': f'{rng.randint(100, 99999) / 100:.2f}'} for product in batch]
+            serializer = BulkProductSerializer(batch, data=payload, many=True, partial=True)
+            serializer.is_valid(raise_exception=True)
+            serializer.save()
+        seconds = time.perf_counter() - started
+        self.stdout.write(f'Repriced {rows} products in batches of {chunk}: {seconds:.2f}s, {rows / seconds:,.0f} products/s')
+
+    def run_thumbnails(self, rng, options):
+        with tempfile.TemporaryDirectory() as work_dir:
+            source_dir = options['images']
+            if not source_dir:
+                source_dir = os.path.join(work_dir, 'sources')
+                os.makedirs(source_dir)
+                for n in range(options['rows'] or 8):
+                    noise = Image.effect_noise((1000, 750), rng.randint(20, 80)).convert('RGB')
+                    noise.resize((4000, 3000)).save(os.path.join(source_dir, f'photo_{n}.jpg'), quality=90)
+            paths = sorted(
+                os.path.join(source_dir, name) for name in os.listdir(source_dir)
+                if name.lower().endswith(('.jpg', '.jpeg', '.png', '.webp'))
+            )
+
+            self.stdout.write(f"{len(paths)} images from {source_dir}")
+            self.stdout.write(f"{'variant':<10}{'ms/image':>12}{'peak MB':>14}")
+            # fork: the child only runs PIL code and must not re-import Django
+            context = multiprocessing.get_context('fork')
+            for label, func in (('legacy', legacy_thumbnails), ('current', current_thumbnails)):
+                out_dir = os.path.join(work_dir, label)
+                os.makedirs(out_dir)
+                results = context.Queue()
+                process = context.Process(target=time_thumbnails, args=(func, paths, out_dir, results))
+                process.start()
+                process.join()
+                if process.exitcode:
+                    raise CommandError(f'{label} variant failed with exit code {process.exitcode}')
+                ms_per_image, peak_mb = results.get()
+                self.stdout.write(f'{label:<10}{ms_per_image:>12.1f}{peak_mb:>14.1f}')
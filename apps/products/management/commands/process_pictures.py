@@ -0,0 +1,27 @@
+import time
+from django.core.management.base import BaseCommand
+from apps.products.tasks import process_pending_pictures, requeue_processing_pictures
+
+
+class Command(BaseCommand):
+    help = 'Generate resized copies for pending product pictures'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=2, help='Size of the process pool (0 = inline)')
+        parser.add_argument('--batch', type=int, default=100, help='Distinct images claimed per round')
+        parser.add_argument('--interval', type=float, default=2.0, help='Seconds to sleep when the queue is empty')
+        parser.add_argument('--once', action='store_true', help='Drain the queue and exit')
+        parser.add_argument('--requeue', action='store_true',
+                            help='First put back pictures left PROCESSING by a killed worker (no other worker may run)')
+
+    def handle(self, *args, **options):
+        if options['requeue']:
+            self.stdout.write(f'Requeued {requeue_processing_pictures()} picture(s)')
+        while True:
+            handled = process_pending_pictures(limit=options['batch'], workers=options['workers'])
+            if handled:
+                self.stdout.write(f'Processed {handled} image(s)')
+            elif options['once']:
+                return
+            else:
+                time.sleep(options['interval'])
@@ -4,6 +4,15 @@ from apps.attributes.models import CategoryAttribute
 
 STATE = [(0, 'Non-Confirmed'), (1, 'Pending'),(2, 'Confirmed')]
 
+class ProductQuerySet(models.QuerySet):
+    def with_related(self):
+        # Everything ProductSerializer touches, loaded in one query per relation
+        return self.prefetch_related(
+            'categories',
+            'pics',
+            models.Prefetch('attrs', queryset=ProductAttribute.objects.select_related('attribute')),
+        )
+
 class Product(models.Model):
     goods_name = models.CharField(max_length=255)
     goods_description = models.TextField(blank=True, null=True)
@@ -20,6 +29,8 @@ class Product(models.Model):
     categories = models.ManyToManyField(Category, related_name='products')
     is_deleted = models.BooleanField(default=False)
 
+    objects = ProductQuerySet.as_manager()
+
     class Meta:
         db_table = 'apps_products_product'
     
@@ -28,10 +39,20 @@ class Product(models.Model):
     
 
 class ProductPicture(models.Model):
+    PENDING = 'PENDING'
+    PROCESSING = 'PROCESSING'
+    READY = 'READY'
+    FAILED = 'FAILED'
+    STATUS_CHOICES = ((PENDING, 'Pending'), (PROCESSING, 'Processing'), (READY, 'Ready'), (FAILED, 'Failed'))
+
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='pics')
     pics_big = models.CharField(max_length=255)
     pics_mid = models.CharField(max_length=255)
     pics_sma = models.CharField(max_length=255)
+    # Uploaded original; the pics_* derivatives are produced from it by `manage.py process_pictures`
+    source = models.CharField(max_length=255, blank=True, default='')
+    content_hash = models.CharField(max_length=64, blank=True, default='', db_index=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING, db_index=True)
 
     class Meta:
         db_table = 'apps_products_productpicture'
@@ -0,0 +1,115 @@
+import re
+from django.db import connection
+from django.db.models import BooleanField, FloatField, Q
+from django.db.models.expressions import RawSQL
+
+# Postgres keeps a generated tsvector column behind a GIN index, SQLite an
+# external-content FTS5 table maintained by triggers (see migration 0003).
+# Both are written by the database itself, so save(), bulk_create() and
+# queryset.update() all keep the index in sync.
+PRODUCT_TABLE = 'apps_products_product'
+FTS_TABLE = 'apps_products_product_fts'
+SEARCH_CONFIG = 'simple'
+
+POSTGRES_INSTALL = [
+    f"""
+    ALTER TABLE {PRODUCT_TABLE} ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(goods_name, '')), 'A') ||
+        setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(goods_description, '')), 'B')
+    ) STORED
+    """,
+    f"CREATE INDEX IF NOT EXISTS {PRODUCT_TABLE}_search_idx ON {PRODUCT_TABLE} USING GIN (search_vector)",
+]
+POSTGRES_UNINSTALL = [
+    f"DROP INDEX IF EXISTS {PRODUCT_TABLE}_search_idx",
+    f"ALTER TABLE {PRODUCT_TABLE} DROP COLUMN IF EXISTS search_vector",
+]
+
+SQLITE_INSTALL = [
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        goods_name, goods_description, content='{PRODUCT_TABLE}', content_rowid='id'
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON {PRODUCT_TABLE} BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, goods_name, goods_description)
+        VALUES (new.id, new.goods_name, new.goods_description);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON {PRODUCT_TABLE} BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, goods_name, goods_description)
+        VALUES ('delete', old.id, old.goods_name, old.goods_description);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF goods_name, goods_description ON {PRODUCT_TABLE} BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, goods_name, goods_description)
+        VALUES ('delete', old.id, old.goods_name, old.goods_description);
+        INSERT INTO {FTS_TABLE}(rowid, goods_name, goods_description)
+        VALUES (new.id, new.goods_name, new.goods_description);
+    END
+    """,
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')",
+]
+SQLITE_UNINSTALL = [
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_ai",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_ad",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_au",
+    f"DROP TABLE IF EXISTS {FTS_TABLE}",
+]
+
+
+def install_search_index(schema_editor):
+    statements = {'postgresql': POSTGRES_INSTALL, 'sqlite': SQLITE_INSTALL}
+    for sql in statements.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(sql)
+
+
+def uninstall_search_index(schema_editor):
+    statements = {'postgresql': POSTGRES_UNINSTALL, 'sqlite': SQLITE_UNINSTALL}
+    for sql in statements.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(sql)
+
+
+def search_terms(query):
+    return re.findall(r'\w+', query.lower())
+
+
+def icontains_search(queryset, query):
+    return queryset.filter(Q(goods_name__icontains=query) | Q(goods_description__icontains=query))
+
+
+def search_products(queryset, query):
+    """Filter `queryset` to products matching every term of `query` (as a
+    prefix), ordered by relevance. Falls back to icontains on other backends."""
+    terms = search_terms(query)
+    if not terms:
+        return icontains_search(queryset, query)
+
+    if connection.vendor == 'postgresql':
+        tsquery = ' & '.join(f'{term}:*' for term in terms)
+        match = RawSQL(
+            f"{PRODUCT_TABLE}.search_vector @@ to_tsquery('{SEARCH_CONFIG}', %s)",
+            [tsquery], output_field=BooleanField()
+        )
+        rank = RawSQL(
+            f"ts_rank({PRODUCT_TABLE}.search_vector, to_tsquery('{SEARCH_CONFIG}', %s))",
+            [tsquery], output_field=FloatField()
+        )
+        return queryset.filter(match).annotate(search_rank=rank).order_by('-search_rank', 'id')
+
+    if connection.vendor == 'sqlite':
+        fts_query = ' '.join(f'"{term}"*' for term in terms)
+        # Join the FTS table so MATCH runs once for the whole result; bm25()
+        # is lower-is-better, negate it so both backends sort descending
+        return queryset.extra(
+            tables=[FTS_TABLE],
+            where=[f"{FTS_TABLE}.rowid = {PRODUCT_TABLE}.id", f"{FTS_TABLE} MATCH %s"],
+            params=[fts_query],
+            select={'search_rank': f"-{FTS_TABLE}.rank"},
+        ).order_by('-search_rank', 'id')
+
+    return icontains_search(queryset, query)
@@ -2,8 +2,14 @@ from rest_framework import serializers
 from .models import Product, ProductPicture, ProductAttribute
 from apps.categories.models import Category
 from apps.attributes.models import CategoryAttribute
+from apps.core.bulk import bulk_update_values
+from .tasks import content_hash, derivative_paths, derivatives_exist
+from .thumbnails import output_extension
+from .uploads import hash_from_path
 from django.conf import settings
 from PIL import Image
+from django.db import transaction
+from django.utils import timezone
 import os
 
 class ProductPictureSerializer(serializers.ModelSerializer):
@@ -11,15 +17,15 @@ class ProductPictureSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = ProductPicture
-        fields = ['id', 'pics_big', 'pics_mid', 'pics_sma', 'pic']
-        read_only_fields = ['id', 'pics_big', 'pics_mid', 'pics_sma']
+        fields = ['id', 'pics_big', 'pics_mid', 'pics_sma', 'status', 'pic']
+        read_only_fields = ['id', 'pics_big', 'pics_mid', 'pics_sma', 'status']
 
     def to_representation(self, instance):
         representation = super().to_representation(instance)
         representation['pic'] = representation.pop('pics_big')
         representation.pop('pics_mid')
         representation.pop('pics_sma')
-        representation['product'] = instance.product.id
+        representation['product'] = instance.product_id
         return representation
 
     def to_internal_value(self, data):
@@ -31,49 +37,36 @@ class ProductPictureSerializer(serializers.ModelSerializer):
         if not pic_path:
             raise serializers.ValidationError({"pic": "This field is required when provided."})
 
-        filename = os.path.basename(pic_path)
         full_path = os.path.join(settings.MEDIA_ROOT, pic_path)
 
         if not os.path.exists(full_path):
             raise serializers.ValidationError({"pic": f"File {pic_path} does not exist."})
 
+        # Only the header is read here; resizing happens in `manage.py process_pictures`
         try:
-            img = Image.open(full_path)
-            big_path = os.path.join(settings.MEDIA_ROOT, 'uploads/goodspics', f"big_{filename}")
-            mid_path = os.path.join(settings.MEDIA_ROOT, 'uploads/goodspics', f"mid_{filename}")
-            sma_path = os.path.join(settings.MEDIA_ROOT, 'uploads/goodspics', f"sma_{filename}")
-            os.makedirs(os.path.dirname(big_path), exist_ok=True)
-
-            img.resize((800, 800), Image.LANCZOS).save(big_path)
-            img.resize((400, 400), Image.LANCZOS).save(mid_path)
-            img.resize((100, 100), Image.LANCZOS).save(sma_path)
-
-            data = {
-                'pics_big': os.path.join('uploads/goodspics', f"big_{filename}"),
-                'pics_mid': os.path.join('uploads/goodspics', f"mid_{filename}"),
-                'pics_sma': os.path.join('uploads/goodspics', f"sma_{filename}")
-            }
+            with Image.open(full_path) as img:
+                ext = output_extension(img)
+            # Uploads are stored under their hash, which saves re-reading them
+            digest = hash_from_path(pic_path) or content_hash(full_path)
         except Exception as e:
             raise serializers.ValidationError({"pic": f"Failed to process image: {str(e)}"})
 
-        return data
+        paths = derivative_paths(digest, ext)
+        return {
+            'pics_big': paths['big'],
+            'pics_mid': paths['mid'],
+            'pics_sma': paths['sma'],
+            'source': pic_path,
+            'content_hash': digest,
+            'status': ProductPicture.READY if derivatives_exist(paths) else ProductPicture.PENDING,
+        }
 
     def create(self, validated_data):
         product = self.context.get('product')
         if not product:
             raise serializers.ValidationError({"product": "Product is required."})
 
-        pics_big = validated_data.pop('pics_big')
-        pics_mid = validated_data.pop('pics_mid')
-        pics_sma = validated_data.pop('pics_sma')
-        instance = ProductPicture.objects.create(
-            product=product,
-            pics_big=pics_big,
-            pics_mid=pics_mid,
-            pics_sma=pics_sma,
-            **validated_data
-        )
-        return instance
+        return ProductPicture.objects.create(product=product, **validated_data)
 
 class ProductAttributeSerializer(serializers.ModelSerializer):
     attr_id = serializers.PrimaryKeyRelatedField(
@@ -93,7 +86,7 @@ class ProductAttributeSerializer(serializers.ModelSerializer):
 
     def to_representation(self, instance):
         representation = super().to_representation(instance)
-        representation['product'] = instance.product.id
+        representation['product'] = instance.product_id
         return representation
 
     def validate(self, data):
@@ -122,15 +115,6 @@ class ProductSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['id', 'created_at', 'updated_at', 'is_deleted']
 
-    def to_internal_value(self, data):
-        validated_data = super().to_internal_value(data)
-
-        # Store original pics data for create/update
-        pics_data = data.get('pics', [])
-        validated_data['pics'] = pics_data  # Keep original [{'pic': ...}]
-
-        return validated_data
-
     def validate(self, value):
         goods_cat = value.get('categories', [])
         attrs = value.get('attrs', [])
@@ -140,7 +124,7 @@ class ProductSerializer(serializers.ModelSerializer):
         for attr in attrs:
             attribute = attr.get('attribute')
             if attribute:
-                cat_id = attribute.cat_id.id
+                cat_id = attribute.cat_id_id
                 if not product and cat_id not in goods_cat_ids:
                     raise serializers.ValidationError({
                         "attrs": f"Attribute {attribute} does not belong to provided categories {goods_cat_ids}."
@@ -160,12 +144,8 @@ class ProductSerializer(serializers.ModelSerializer):
         product = Product.objects.create(**validated_data)
         product.categories.set(categories)
 
-        for pic_data in pics:
-            pic_serializer = ProductPictureSerializer(data=pic_data, context={'product': product})
-            if pic_serializer.is_valid():
-                pic_serializer.save()
-            else:
-                raise serializers.ValidationError(pic_serializer.errors)
+        # Already validated by the `pics` field: paths, hash and status are resolved
+        ProductPicture.objects.bulk_create([ProductPicture(product=product, **pic_data) for pic_data in pics])
 
         for attr_data in attrs:
             ProductAttribute.objects.create(product=product, **attr_data)
@@ -186,12 +166,7 @@ class ProductSerializer(serializers.ModelSerializer):
 
         if pics is not None:
             instance.pics.all().delete()
-            for pic_data in pics:
-                pic_serializer = ProductPictureSerializer(data=pic_data, context={'product': instance})
-                if pic_serializer.is_valid():
-                    pic_serializer.save()
-                else:
-                    raise serializers.ValidationError(pic_serializer.errors)
+            ProductPicture.objects.bulk_create([ProductPicture(product=instance, **pic_data) for pic_data in pics])
 
         if attrs is not None:
             instance.attrs.all().delete()
@@ -200,12 +175,182 @@ class ProductSerializer(serializers.ModelSerializer):
 
         return instance
 
+class CachedPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    # Resolves ids from context['related_cache'] when a list serializer has
+    # preloaded them for the whole batch, instead of one query per id
+    def to_internal_value(self, data):
+        cache = self.context.get('related_cache', {}).get(self.get_queryset().model)
+        if cache is None:
+            return super().to_internal_value(data)
+        if isinstance(data, bool):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        try:
+            instance = cache.get(int(data))
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        if instance is None:
+            self.fail('does_not_exist', pk_value=data)
+        return instance
+
+class BulkProductAttributeSerializer(ProductAttributeSerializer):
+    attr_id = CachedPrimaryKeyRelatedField(
+        queryset=CategoryAttribute.objects.all(), source='attribute'
+    )
+
+class BulkProductListSerializer(serializers.ListSerializer):
+    # Largest payload accepted by /goods/bulk/; bigger imports must be split
+    max_batch_size = 10000
+    insert_batch_size = 1000
+
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault('max_length', self.max_batch_size)
+        super().__init__(*args, **kwargs)
+
+    def to_internal_value(self, data):
+        if isinstance(data, list):
+            self._context['related_cache'] = self.load_related(data)
+        if self.instance is not None:
+            self.instance_map = {product.id: product for product in self.instance}
+        return super().to_internal_value(data)
+
+    def run_child_validation(self, data):
+        # On update each item is validated against the product it targets
+        if self.instance is not None:
+            self.child.instance = self.instance_map.get(data.get('id')) if isinstance(data, dict) else None
+        return super().run_child_validation(data)
+
+    def load_related(self, data):
+        cat_ids, attr_ids = set(), set()
+        for item in data:
+            if not isinstance(item, dict):
+                continue
+            goods_cat = item.get('goods_cat')
+            if isinstance(goods_cat, list):
+                cat_ids.update(goods_cat)
+            attrs = item.get('attrs')
+            if isinstance(attrs, list):
+                attr_ids.update(attr.get('attr_id') for attr in attrs if isinstance(attr, dict))
+
+        def in_bulk(queryset, ids):
+            ids = [int(pk) for pk in ids if isinstance(pk, (int, str)) and str(pk).isdigit()]
+            return queryset.in_bulk(ids)
+
+        cat_queryset = self.child.fields['goods_cat'].child_relation.get_queryset()
+        attr_queryset = self.child.fields['attrs'].child.fields['attr_id'].get_queryset()
+        return {
+            cat_queryset.model: in_bulk(cat_queryset, cat_ids),
+            attr_queryset.model: in_bulk(attr_queryset, attr_ids),
+        }
+
+    @transaction.atomic
+    def create(self, validated_data):
+        products, categories, pics, attrs = [], [], [], []
+        for item in validated_data:
+            categories.append(item.pop('categories', []))
+            pics.append(item.pop('pics', []))
+            attrs.append(item.pop('attrs', []))
+            products.append(Product(**item))
+
+        Product.objects.bulk_create(products, batch_size=self.insert_batch_size)
+
+        ProductCategory = Product.categories.through
+        ProductCategory.objects.bulk_create([
+            ProductCategory(product_id=product.id, category_id=category_id)
+            for product, product_categories in zip(products, categories)
+            for category_id in dict.fromkeys(category.id for category in product_categories)
+        ], batch_size=self.insert_batch_size)
+        ProductPicture.objects.bulk_create([
+            ProductPicture(product=product, **pic_data)
+            for product, product_pics in zip(products, pics)
+            for pic_data in product_pics
+        ], batch_size=self.insert_batch_size)
+        ProductAttribute.objects.bulk_create([
+            ProductAttribute(product=product, **attr_data)
+            for product, product_attrs in zip(products, attrs)
+            for attr_data in product_attrs
+        ], batch_size=self.insert_batch_size)
+
+        return products
+
+    @transaction.atomic
+    def update(self, instances, validated_data):
+        categories, pics, attrs = {}, {}, {}
+        fields = set()
+        for product, item in zip(instances, validated_data):
+            if 'categories' in item:
+                categories[product.id] = item.pop('categories')
+            if 'pics' in item:
+                pics[product.id] = item.pop('pics')
+            if 'attrs' in item:
+                attrs[product.id] = item.pop('attrs')
+            for attr, value in item.items():
+                setattr(product, attr, value)
+            fields.update(item)
+
+        if fields:
+            now = timezone.now()
+            for product in instances:
+                product.updated_at = now
+            bulk_update_values(Product, instances, [*fields, 'updated_at'], batch_size=self.insert_batch_size)
+
+        ProductCategory = Product.categories.through
+        self.sync_rows(
+            ProductCategory.objects.filter(product_id__in=categories),
+            lambda row: (row.product_id, row.category_id),
+            {
+                (product_id, category.id): ProductCategory(product_id=product_id, category_id=category.id)
+                for product_id, product_categories in categories.items()
+                for category in product_categories
+            },
+        )
+        self.sync_rows(
+            ProductPicture.objects.filter(product_id__in=pics),
+            lambda row: (row.product_id, row.pics_big),
+            {
+                (product_id, pic['pics_big']): ProductPicture(product_id=product_id, **pic)
+                for product_id, product_pics in pics.items()
+                for pic in product_pics
+            },
+        )
+        self.sync_rows(
+            ProductAttribute.objects.filter(product_id__in=attrs),
+            lambda row: (row.product_id, row.attribute_id, row.attr_value),
+            {
+                (product_id, attr['attribute'].id, attr['attr_value']): ProductAttribute(product_id=product_id, **attr)
+                for product_id, product_attrs in attrs.items()
+                for attr in product_attrs
+            },
+            update_fields=['attr_price'],
+        )
+
+        return instances
+
+    def sync_rows(self, existing, key, wanted, update_fields=None):
+        # Diff current child rows against the wanted ones: delete what is gone,
+        # insert what is new, and update the rest only when `update_fields` differ
+        stale, changed = [], []
+        for row in existing:
+            target = wanted.pop(key(row), None)
+            if target is None:
+                stale.append(row.pk)
+            elif update_fields and any(getattr(row, f) != getattr(target, f) for f in update_fields):
+                for f in update_fields:
+                    setattr(row, f, getattr(target, f))
+                changed.append(row)
+
+        model = existing.model
+        for start in range(0, len(stale), self.insert_batch_size):
+            model.objects.filter(pk__in=stale[start:start + self.insert_batch_size]).delete()
+        if changed:
+            model.objects.bulk_update(changed, update_fields, batch_size=self.insert_batch_size)
+        model.objects.bulk_create(wanted.values(), batch_size=self.insert_batch_size)
+
 class BulkProductSerializer(serializers.ModelSerializer):
-    goods_cat = serializers.PrimaryKeyRelatedField(
+    goods_cat = CachedPrimaryKeyRelatedField(
         queryset=Category.objects.filter(is_deleted=False), many=True, source='categories'
     )
     pics = ProductPictureSerializer(many=True, required=False)
-    attrs = ProductAttributeSerializer(many=True, required=False)
+    attrs = BulkProductAttributeSerializer(many=True, required=False)
 
     class Meta:
         model = Product
@@ -214,81 +359,24 @@ class BulkProductSerializer(serializers.ModelSerializer):
             'goods_weight', 'goods_state', 'goods_description', 'pics', 'attrs'
         ]
         read_only_fields = ['id', 'created_at', 'updated_at', 'is_deleted']
-
-    def to_internal_value(self, data):
-        validated_data = super().to_internal_value(data)
-
-        # Store original pics data for create/update
-        pics_data = data.get('pics', [])
-        validated_data['pics'] = pics_data  # Keep original [{'pic': ...}]
-
-        return validated_data
+        list_serializer_class = BulkProductListSerializer
 
     def validate(self, value):
-        goods_cat = value.get('categories', [])
         attrs = value.get('attrs', [])
-        product = self.context.get('product')
+        if not attrs:
+            return value
 
-        goods_cat_ids = [cat.id for cat in goods_cat] if goods_cat else []
+        if 'categories' in value or self.instance is None:
+            goods_cat = value.get('categories', [])
+        else:
+            goods_cat = self.instance.categories.all()
+
+        goods_cat_ids = [cat.id for cat in goods_cat]
         for attr in attrs:
             attribute = attr.get('attribute')
-            if attribute:
-                cat_id = attribute.cat_id.id
-                if not product and cat_id not in goods_cat_ids:
-                    raise serializers.ValidationError({
-                        "attrs": f"Attribute {attribute} does not belong to provided categories {goods_cat_ids}."
-                    })
-                elif product and not product.categories.filter(id=cat_id).exists():
-                    raise serializers.ValidationError({
-                        "attrs": f"Attribute {attribute} does not belong to product's categories."
-                    })
+            if attribute and attribute.cat_id_id not in goods_cat_ids:
+                raise serializers.ValidationError({
+                    "attrs": f"Attribute {attribute.attr_name} does not belong to provided categories {goods_cat_ids}."
+                })
 
         return value
-
-    def create(self, validated_data):
-        categories = validated_data.pop('categories', [])
-        pics = validated_data.pop('pics', [])
-        attrs = validated_data.pop('attrs', [])
-
-        product = Product.objects.create(**validated_data)
-        product.categories.set(categories)
-
-        for pic_data in pics:
-            pic_serializer = ProductPictureSerializer(data=pic_data, context={'product': product})
-            if pic_serializer.is_valid():
-                pic_serializer.save()
-            else:
-                raise serializers.ValidationError(pic_serializer.errors)
-
-        for attr_data in attrs:
-            ProductAttribute.objects.create(product=product, **attr_data)
-
-        return product
-
-    def update(self, instance, validated_data):
-        categories = validated_data.pop('categories', None)
-        pics = validated_data.pop('pics', None)
-        attrs = validated_data.pop('attrs', None)
-
-        for attr, value in validated_data.items():
-            setattr(instance, attr, value)
-        instance.save()
-
-        if categories is not None:
-            instance.categories.set(categories)
-
-        if pics is not None:
-            instance.pics.all().delete()
-            for pic_data in pics:
-                pic_serializer = ProductPictureSerializer(data=pic_data, context={'product': instance})
-                if pic_serializer.is_valid():
-                    pic_serializer.save()
-                else:
-                    raise serializers.ValidationError(pic_serializer.errors)
-
-        if attrs is not None:
-            instance.attrs.all().delete()
-            for attr_data in attrs:
-                ProductAttribute.objects.create(product=instance, **attr_data)
-
-        return instance
\ No newline at end of file
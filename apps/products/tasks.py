@@ -0,0 +1,86 @@
+import hashlib
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from django.conf import settings
+from .models import ProductPicture
+from .thumbnails import SIZES, make_thumbnails
+
+logger = logging.getLogger(__name__)
+
+PICS_DIR = 'uploads/goodspics'
+
+
+def content_hash(path):
+    with open(path, 'rb') as f:
+        return hashlib.file_digest(f, 'sha256').hexdigest()
+
+
+def derivative_paths(digest, ext):
+    """Media-relative paths of the resized copies, named after the source
+    content so identical uploads share (and only once produce) them."""
+    return {name: f'{PICS_DIR}/{name}_{digest}{ext}' for name, _ in SIZES}
+
+
+def derivatives_exist(paths):
+    return all(os.path.exists(os.path.join(settings.MEDIA_ROOT, path)) for path in paths.values())
+
+
+def generate_derivatives(source, digest, ext, media_root):
+    # Runs in a pool worker: plain paths in, no ORM access
+    targets = {
+        name: os.path.join(media_root, path)
+        for name, path in derivative_paths(digest, ext).items()
+        if not os.path.exists(os.path.join(media_root, path))
+    }
+    if targets:
+        make_thumbnails(os.path.join(media_root, source), targets)
+    return digest
+
+
+def process_pending_pictures(limit=100, workers=0):
+    """Produce derivatives for up to `limit` distinct pending sources and
+    mark their pictures READY (or FAILED). Returns the number of sources
+    handled. `workers=0` processes inline.
+
+    Each source's pictures are claimed PENDING -> PROCESSING with a
+    conditional update first, so workers polling the same table never
+    process a source twice."""
+    pending = (ProductPicture.objects.filter(status=ProductPicture.PENDING)
+               .order_by('content_hash').values_list('content_hash', 'source', 'pics_big').distinct()[:limit])
+    jobs = {}
+    for digest, source, pics_big in pending:
+        if ProductPicture.objects.filter(content_hash=digest, status=ProductPicture.PENDING).update(
+            status=ProductPicture.PROCESSING
+        ):
+            jobs[digest] = (source, os.path.splitext(pics_big)[1])
+    if not jobs:
+        return 0
+
+    if workers:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {digest: pool.submit(generate_derivatives, source, digest, ext, str(settings.MEDIA_ROOT))
+                       for digest, (source, ext) in jobs.items()}
+            results = {digest: future.exception() for digest, future in futures.items()}
+    else:
+        results = {}
+        for digest, (source, ext) in jobs.items():
+            try:
+                generate_derivatives(source, digest, ext, str(settings.MEDIA_ROOT))
+                results[digest] = None
+            except Exception as e:
+                results[digest] = e
+
+    for digest, error in results.items():
+        if error:
+            logger.error("Failed to process picture %s: %s", jobs[digest][0], error)
+        ProductPicture.objects.filter(content_hash=digest, status=ProductPicture.PROCESSING).update(
+            status=ProductPicture.FAILED if error else ProductPicture.READY
+        )
+    return len(jobs)
+
+
+def requeue_processing_pictures():
+    """Put pictures left PROCESSING by a worker that was killed back in the
+    queue. Only safe while no worker is running."""
+    return ProductPicture.objects.filter(status=ProductPicture.PROCESSING).update(status=ProductPicture.PENDING)
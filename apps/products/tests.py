@@ -1,3 +1,488 @@
-from django.test import TestCase
+import hashlib
+import io
+import pytest
+from decimal import Decimal
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from PIL import Image
+from rest_framework.test import APIClient
+from apps.attributes.models import CategoryAttribute
+from apps.categories.models import Category
+from apps.products.models import Product, ProductPicture, ProductAttribute
+from apps.products import tasks
+from apps.products.tasks import process_pending_pictures
+from apps.products.serializers import BulkProductListSerializer
+from apps.products.thumbnails import SIZES, make_thumbnails, output_extension
+from apps.products.uploads import hash_from_path
+from apps.users.models import User
 
-# Create your tests here.
+
+@pytest.fixture
+def admin_client():
+    user = User.objects.create_user(username='admin', email='admin@example.com', password='test123', is_staff=True)
+    client = APIClient()
+    client.force_authenticate(user=user)
+    return client
+
+@pytest.fixture
+def catalog():
+    def make(count):
+        category = Category.objects.create(name=f'Category {count}')
+        attribute = CategoryAttribute.objects.create(
+            attr_name='Color', cat_id=category, attr_sel='many', attr_write='list', attr_vals='Red,Blue'
+        )
+        for n in range(count):
+            product = Product.objects.create(
+                goods_name=f'Product {count}-{n}', goods_price=10, goods_quantity=5, goods_weight=1
+            )
+            product.categories.set([category])
+            ProductPicture.objects.create(product=product, pics_big='big.png', pics_mid='mid.png', pics_sma='sma.png')
+            ProductAttribute.objects.create(product=product, attribute=attribute, attr_value='Red')
+            ProductAttribute.objects.create(product=product, attribute=attribute, attr_value='Blue')
+    return make
+
+
+class TestProductListing:
+
+    def list_queries(self, client, pagesize):
+        with CaptureQueriesContext(connection) as ctx:
+            response = client.get(f'/api/private/v1/goods/?pagesize={pagesize}')
+        assert response.status_code == 200
+        return response, len(ctx.captured_queries)
+
+    @pytest.mark.django_db
+    def test_listing_query_count_is_constant(self, admin_client, catalog):
+        catalog(2)
+        _, small_page = self.list_queries(admin_client, 2)
+        catalog(50)
+        response, large_page = self.list_queries(admin_client, 52)
+
+        assert len(response.data['results']) == 52
+        assert large_page == small_page
+        # count, page, categories, pics, attrs (+ attribute join)
+        assert large_page <= 5
+
+    @pytest.mark.django_db
+    def test_listing_serializes_prefetched_relations(self, admin_client, catalog):
+        catalog(1)
+        product = Product.objects.get()
+
+        response = admin_client.get('/api/private/v1/goods/')
+
+        row = response.data['results'][0]
+        assert row['goods_cat'] == [product.categories.get().id]
+        assert row['pics'][0]['product'] == product.id
+        assert {attr['attr_value'] for attr in row['attrs']} == {'Red', 'Blue'}
+        assert row['attrs'][0]['attr_name'] == 'Color'
+
+
+class TestProductSearch:
+
+    def search(self, client, query):
+        response = client.get('/api/private/v1/goods/', {'query': query})
+        assert response.status_code == 200
+        return [row['goods_name'] for row in response.data['results']]
+
+    def make(self, name, description=''):
+        return Product.objects.create(
+            goods_name=name, goods_description=description, goods_price=10, goods_quantity=5, goods_weight=1
+        )
+
+    @pytest.mark.django_db
+    def test_prefix_match_on_name_and_description(self, admin_client):
+        self.make('Gaming Laptop', 'Fast machine')
+        self.make('Desk Lamp', 'Bright laptop-friendly light')
+        self.make('Phone case')
+
+        assert set(self.search(admin_client, 'lap')) == {'Gaming Laptop', 'Desk Lamp'}
+        assert self.search(admin_client, 'gam lap') == ['Gaming Laptop']
+        assert self.search(admin_client, 'tablet') == []
+
+    @pytest.mark.django_db
+    def test_results_are_ranked(self, admin_client):
+        self.make('Cable', 'works with any phone')
+        self.make('Phone', 'phone phone phone')
+
+        assert self.search(admin_client, 'phone') == ['Phone', 'Cable']
+
+    @pytest.mark.django_db
+    def test_index_follows_updates_and_deletes(self, admin_client):
+        product = self.make('Old name')
+        product.goods_name = 'Renamed widget'
+        product.save()
+        self.make('Temporary widget').delete()
+
+        assert self.search(admin_client, 'old') == []
+        assert self.search(admin_client, 'widget') == ['Renamed widget']
+
+    @pytest.mark.django_db
+    def test_soft_deleted_products_are_hidden(self, admin_client):
+        hidden = self.make('Hidden widget')
+        Product.objects.filter(id=hidden.id).update(is_deleted=True)
+
+        assert self.search(admin_client, 'widget') == []
+
+
+class TestCursorPagination:
+
+    @pytest.mark.django_db
+    def test_cursor_mode_walks_all_pages_without_count(self, admin_client, catalog):
+        catalog(25)
+        url = '/api/private/v1/goods/?cursor=&pagesize=10'
+        names = []
+        while url:
+            with CaptureQueriesContext(connection) as ctx:
+                response = admin_client.get(url)
+            assert response.status_code == 200
+            assert 'count' not in response.data
+            assert not any('COUNT(' in query['sql'] for query in ctx.captured_queries)
+            names += [row['goods_name'] for row in response.data['results']]
+            url = response.data['next']
+
+        assert len(names) == 25
+        assert names == [product.goods_name for product in Product.objects.order_by('id')]
+
+    @pytest.mark.django_db
+    def test_meta_block_keeps_next_and_previous(self, admin_client, catalog):
+        catalog(15)
+        first = admin_client.get('/api/private/v1/goods/?cursor=', HTTP_ACCEPT='application/json').json()
+        second = admin_client.get(first['meta']['next'], HTTP_ACCEPT='application/json').json()
+
+        assert set(first['meta']) == {'next', 'previous'}
+        assert len(second['data']) == 5
+        assert second['meta']['previous']
+
+    @pytest.mark.django_db
+    def test_cursor_is_rejected_with_a_search(self, admin_client, catalog):
+        catalog(3)
+
+        response = admin_client.get('/api/private/v1/goods/?query=widget&cursor=')
+
+        assert response.status_code == 400
+        assert 'cursor' in response.data
+
+    @pytest.mark.django_db
+    def test_estimated_count_falls_back_to_exact_on_small_tables(self, admin_client, catalog):
+        catalog(3)
+        response = admin_client.get('/api/private/v1/goods/?count=estimate')
+
+        assert response.data['count'] == 3
+
+
+class TestBulkCreate:
+
+    def payload(self, count, category, attribute):
+        return [{
+            'goods_name': f'Bulk {n}',
+            'goods_cat': [category.id],
+            'goods_price': '9.99',
+            'goods_quantity': 10,
+            'goods_weight': '1.00',
+            'attrs': [{'attr_id': attribute.id, 'attr_value': 'Red'}, {'attr_id': attribute.id, 'attr_value': 'Blue'}],
+        } for n in range(count)]
+
+    @pytest.fixture
+    def category_attribute(self):
+        category = Category.objects.create(name='Bulk category')
+        attribute = CategoryAttribute.objects.create(
+            attr_name='Color', cat_id=category, attr_sel='many', attr_write='list', attr_vals='Red,Blue'
+        )
+        return category, attribute
+
+    def post(self, client, data):
+        with CaptureQueriesContext(connection) as ctx:
+            response = client.post('/api/private/v1/goods/bulk/', data, format='json')
+        return response, len(ctx.captured_queries)
+
+    @pytest.mark.django_db
+    def test_bulk_create_uses_constant_queries(self, admin_client, category_attribute):
+        _, small = self.post(admin_client, self.payload(2, *category_attribute))
+        response, large = self.post(admin_client, self.payload(40, *category_attribute))
+
+        assert response.status_code == 201
+        assert large == small
+        assert Product.objects.count() == 42
+        assert ProductAttribute.objects.count() == 84
+        assert Product.categories.through.objects.count() == 42
+        assert {attr['attr_value'] for attr in response.data[0]['attrs']} == {'Red', 'Blue'}
+
+    @pytest.mark.django_db
+    def test_bulk_create_is_all_or_nothing(self, admin_client, category_attribute):
+        data = self.payload(3, *category_attribute)
+        data[2]['goods_cat'] = [999999]
+
+        response, _ = self.post(admin_client, data)
+
+        assert response.status_code == 400
+        assert response.data[2]['goods_cat']
+        assert not Product.objects.exists()
+
+    @pytest.mark.django_db
+    def test_attribute_must_belong_to_categories(self, admin_client, category_attribute):
+        other = Category.objects.create(name='Other category')
+        data = self.payload(1, *category_attribute)
+        data[0]['goods_cat'] = [other.id]
+
+        response, _ = self.post(admin_client, data)
+
+        assert response.status_code == 400
+        assert 'attrs' in response.data[0]
+
+    @pytest.mark.django_db
+    def test_batch_size_is_bounded(self, admin_client, category_attribute, monkeypatch):
+        from apps.products.serializers import BulkProductListSerializer
+        monkeypatch.setattr(BulkProductListSerializer, 'max_batch_size', 2)
+
+        response, _ = self.post(admin_client, self.payload(3, *category_attribute))
+
+        assert response.status_code == 400
+
+
+class TestBulkUpdate:
+
+    def put(self, client, data):
+        with CaptureQueriesContext(connection) as ctx:
+            response = client.put('/api/private/v1/goods/bulk/', data, format='json')
+        return response, len(ctx.captured_queries)
+
+    @pytest.mark.django_db
+    def test_reprice_by_id_with_constant_queries(self, admin_client, catalog):
+        catalog(30)
+        ids = list(Product.objects.order_by('id').values_list('id', flat=True))
+
+        _, small = self.put(admin_client, [{'id': pk, 'goods_price': '1.50'} for pk in ids[:2]])
+        response, large = self.put(admin_client, [{'id': pk, 'goods_price': '2.50'} for pk in ids])
+
+        assert response.status_code == 200
+        assert large == small
+        assert set(Product.objects.values_list('goods_price', flat=True)) == {Decimal('2.50')}
+        assert Product.objects.values_list('goods_name', flat=True).distinct().count() == 30
+
+    @pytest.mark.django_db
+    def test_children_are_synced_set_wise(self, admin_client, catalog):
+        catalog(1)
+        product = Product.objects.get()
+        attribute = CategoryAttribute.objects.get()
+        kept = product.attrs.get(attr_value='Red')
+        other = Category.objects.create(name='Extra')
+
+        response, _ = self.put(admin_client, [{
+            'id': product.id,
+            'goods_cat': [product.categories.get().id, other.id],
+            'attrs': [
+                {'attr_id': attribute.id, 'attr_value': 'Red', 'attr_price': '3.00'},
+                {'attr_id': attribute.id, 'attr_value': 'Green'},
+            ],
+        }])
+
+        assert response.status_code == 200
+        assert product.categories.count() == 2
+        assert set(product.attrs.values_list('attr_value', flat=True)) == {'Red', 'Green'}
+        # unchanged rows are updated in place, not deleted and re-inserted
+        kept.refresh_from_db()
+        assert kept.attr_price == Decimal('3.00')
+        assert product.pics.count() == 1
+
+    @pytest.mark.django_db
+    def test_attrs_are_checked_against_existing_categories(self, admin_client, catalog):
+        catalog(1)
+        product = Product.objects.get()
+        foreign = CategoryAttribute.objects.create(
+            attr_name='Size', cat_id=Category.objects.create(name='Foreign'), attr_sel='only', attr_write='manual'
+        )
+
+        response, _ = self.put(admin_client, [{'id': product.id, 'attrs': [{'attr_id': foreign.id, 'attr_value': 'L'}]}])
+
+        assert response.status_code == 400
+        assert 'attrs' in response.data[0]
+
+    @pytest.mark.django_db
+    def test_unknown_or_deleted_ids_are_rejected(self, admin_client, catalog):
+        catalog(2)
+        first, second = Product.objects.order_by('id')
+        Product.objects.filter(id=second.id).update(is_deleted=True)
+
+        response, _ = self.put(admin_client, [{'id': first.id, 'goods_price': '1.00'}, {'id': second.id, 'goods_price': '1.00'}])
+
+        assert response.status_code == 400
+        assert Product.objects.get(id=first.id).goods_price == Decimal('10.00')
+
+    @pytest.mark.django_db
+    def test_oversized_or_boolean_ids_are_rejected_before_loading(self, admin_client, catalog, monkeypatch):
+        catalog(1)
+        product = Product.objects.get()
+        monkeypatch.setattr(BulkProductListSerializer, 'max_batch_size', 1)
+
+        response, queries = self.put(admin_client, [{'id': product.id}, {'id': product.id + 1}])
+        assert response.status_code == 400
+        assert queries == 0
+
+        monkeypatch.setattr(BulkProductListSerializer, 'max_batch_size', 10)
+        response, _ = self.put(admin_client, [{'id': True, 'goods_price': '1.00'}])
+        assert response.status_code == 400
+
+
+class TestPictureProcessing:
+
+    @pytest.fixture
+    def media(self, settings, tmp_path):
+        settings.MEDIA_ROOT = tmp_path
+        (tmp_path / 'tmp_uploads').mkdir()
+        Image.new('RGB', (1200, 900), 'red').save(tmp_path / 'tmp_uploads' / 'shoe.png')
+        return tmp_path
+
+    def create_product(self, client, name):
+        category = Category.objects.get_or_create(name='Shoes')[0]
+        return client.post('/api/private/v1/goods/', {
+            'goods_name': name, 'goods_cat': [category.id], 'goods_price': '5.00',
+            'goods_quantity': 1, 'goods_weight': '1.00', 'pics': [{'pic': 'tmp_uploads/shoe.png'}],
+        }, format='json')
+
+    @pytest.mark.django_db
+    def test_pictures_are_saved_from_the_validated_data(self, admin_client, media):
+        product_id = self.create_product(admin_client, 'Sneaker').data['id']
+        url = f'/api/private/v1/goods/{product_id}/'
+
+        # A missing file is a validation error, not a failure at save time
+        response = admin_client.patch(url, {'pics': [{'pic': 'tmp_uploads/missing.png'}]}, format='json')
+        assert response.status_code == 400
+        # Leaving pics out leaves the pictures alone
+        assert admin_client.patch(url, {'goods_name': 'Runner'}, format='json').status_code == 200
+        assert ProductPicture.objects.get().source == 'tmp_uploads/shoe.png'
+
+    @pytest.mark.django_db
+    def test_resizing_is_deferred_to_the_worker(self, admin_client, media):
+        response = self.create_product(admin_client, 'Sneaker')
+
+        assert response.status_code == 201
+        picture = ProductPicture.objects.get()
+        assert picture.status == ProductPicture.PENDING
+        assert not (media / picture.pics_big).exists()
+
+        assert process_pending_pictures() == 1
+
+        picture.refresh_from_db()
+        assert picture.status == ProductPicture.READY
+        assert Image.open(media / picture.pics_sma).size == (100, 75)
+        assert process_pending_pictures() == 0
+
+    def test_thumbnails_keep_aspect_ratio_and_pick_format(self, tmp_path):
+        Image.new('RGB', (3000, 1500), 'blue').save(tmp_path / 'wide.jpg')
+        Image.new('RGBA', (500, 1000), (0, 0, 0, 0)).save(tmp_path / 'logo.png')
+        with Image.open(tmp_path / 'wide.jpg') as img:
+            assert output_extension(img) == '.jpg'
+        with Image.open(tmp_path / 'logo.png') as img:
+            assert output_extension(img) == '.webp'
+
+        make_thumbnails(tmp_path / 'wide.jpg', {name: tmp_path / f'{name}.jpg' for name, _ in SIZES})
+        make_thumbnails(tmp_path / 'logo.png', {'big': tmp_path / 'logo.webp'})
+
+        assert [Image.open(tmp_path / f'{name}.jpg').size for name, _ in SIZES] == [(800, 400), (400, 200), (100, 50)]
+        assert Image.open(tmp_path / 'big.jpg').info.get('progressive')
+        logo = Image.open(tmp_path / 'logo.webp')
+        assert (logo.format, logo.mode, logo.size) == ('WEBP', 'RGBA', (400, 800))
+
+    @pytest.mark.django_db
+    def test_duplicate_content_is_not_reprocessed(self, admin_client, media):
+        self.create_product(admin_client, 'Sneaker')
+        process_pending_pictures()
+        self.create_product(admin_client, 'Sneaker again')
+
+        first, second = ProductPicture.objects.order_by('id')
+        assert second.pics_big == first.pics_big
+        assert second.status == ProductPicture.READY
+
+    @pytest.mark.django_db
+    def test_claimed_pictures_are_not_processed_twice(self, admin_client, media, monkeypatch):
+        self.create_product(admin_client, 'Sneaker')
+        generate = tasks.generate_derivatives
+        polled = []
+
+        def generate_while_another_worker_polls(*args):
+            polled.append(process_pending_pictures())
+            assert ProductPicture.objects.get().status == ProductPicture.PROCESSING
+            return generate(*args)
+        monkeypatch.setattr(tasks, 'generate_derivatives', generate_while_another_worker_polls)
+
+        assert process_pending_pictures() == 1
+        assert polled == [0]
+        assert ProductPicture.objects.get().status == ProductPicture.READY
+
+    @pytest.mark.django_db
+    def test_unreadable_source_is_marked_failed(self, admin_client, media):
+        self.create_product(admin_client, 'Sneaker')
+        (media / 'tmp_uploads' / 'shoe.png').write_bytes(b'not an image any more')
+
+        process_pending_pictures()
+
+        assert ProductPicture.objects.get().status == ProductPicture.FAILED
+
+
+class TestUpload:
+    url = '/api/private/v1/upload/'
+
+    @pytest.fixture
+    def media(self, settings, tmp_path):
+        settings.MEDIA_ROOT = tmp_path
+        return tmp_path
+
+    def image(self, size=(40, 30), name='shoe.png'):
+        buffer = io.BytesIO()
+        Image.new('RGB', size, 'red').save(buffer, 'PNG')
+        buffer.seek(0)
+        buffer.name = name
+        return buffer
+
+    @pytest.mark.django_db
+    def test_upload_is_stored_by_content_hash(self, admin_client, media):
+        data = self.image().getvalue()
+        first = admin_client.post(self.url, {'file': self.image()}, format='multipart')
+        second = admin_client.post(self.url, {'file': self.image(name='copy.png')}, format='multipart')
+
+        assert first.status_code == 201
+        tmp_path = first.data['data']['tmp_path']
+        assert tmp_path == f'tmp_uploads/{hashlib.sha256(data).hexdigest()}.png'
+        assert first.data['data']['duplicate'] is False
+        assert second.data['data'] == {**first.data['data'], 'duplicate': True}
+        assert [p.name for p in (media / 'tmp_uploads').iterdir()] == [tmp_path.split('/')[1]]
+
+    @pytest.mark.django_db
+    def test_extra_files_are_not_left_behind(self, admin_client, media):
+        response = admin_client.post(self.url, {'file': self.image(), 'other': self.image(size=(20, 20))},
+                                     format='multipart')
+
+        assert response.status_code == 201
+        assert [p.name for p in (media / 'tmp_uploads').iterdir()] == [response.data['data']['tmp_path'].split('/')[1]]
+
+    def test_only_stored_uploads_are_trusted_by_name(self, media):
+        digest = hashlib.sha256(b'x').hexdigest()
+        (media / 'other').mkdir()
+        (media / 'tmp_uploads' / 'nested').mkdir(parents=True)
+
+        assert hash_from_path(f'tmp_uploads/{digest}.png') == digest
+        assert hash_from_path(f'other/{digest}.png') is None
+        assert hash_from_path(f'tmp_uploads/nested/{digest}.png') is None
+        assert hash_from_path(f'tmp_uploads/{digest}.part') is None
+        assert hash_from_path(f'other/../tmp_uploads/{digest}.png') == digest
+
+    @pytest.mark.django_db
+    def test_oversized_upload_is_rejected(self, admin_client, media, settings):
+        settings.PRODUCT_UPLOAD_MAX_BYTES = 50
+
+        response = admin_client.post(self.url, {'file': self.image()}, format='multipart')
+
+        assert response.status_code == 413
+        assert not any((media / 'tmp_uploads').iterdir())
+
+    @pytest.mark.django_db
+    def test_pixel_limit_is_checked_before_decoding(self, admin_client, media, settings):
+        settings.PRODUCT_UPLOAD_MAX_PIXELS = 1000
+
+        response = admin_client.post(self.url, {'file': self.image(size=(100, 100))}, format='multipart')
+        garbage = io.BytesIO(b'not an image')
+        garbage.name = 'shoe.png'
+        rejected = admin_client.post(self.url, {'file': garbage}, format='multipart')
+
+        assert response.status_code == 400
+        assert rejected.status_code == 400
+        assert not any((media / 'tmp_uploads').iterdir())
@@ -0,0 +1,45 @@
+import os
+from PIL import Image, ImageOps
+
+# Bounding boxes, largest first: each size is derived from the previous one
+SIZES = (('big', 800), ('mid', 400), ('sma', 100))
+JPEG_OPTIONS = {'format': 'JPEG', 'quality': 82, 'optimize': True, 'progressive': True}
+WEBP_OPTIONS = {'format': 'WEBP', 'quality': 80, 'method': 4}
+
+
+def has_alpha(img):
+    return img.mode in ('RGBA', 'LA', 'PA') or (img.mode == 'P' and 'transparency' in img.info)
+
+
+def output_extension(img):
+    """File extension thumbnails of `img` are written with. Only needs the
+    header, so it can be decided before the image is decoded."""
+    return '.webp' if has_alpha(img) else '.jpg'
+
+
+def make_thumbnails(fp, targets):
+    """Decode `fp` once and write every size in `targets` ({'big': path, ...}).
+
+    JPEG sources are decoded straight at the smallest DCT scale that still
+    covers the largest box (draft mode), then each size is produced from
+    the one above it with reduce() + LANCZOS, keeping the aspect ratio.
+    Transparent images are written as WebP, everything else as progressive
+    JPEG. Files are written under a temporary name and renamed into place.
+    """
+    with Image.open(fp) as source:
+        alpha = has_alpha(source)
+        largest = SIZES[0][1]
+        if source.format == 'JPEG':
+            source.draft('RGB', (largest, largest))
+        img = ImageOps.exif_transpose(source)
+        img = img.convert('RGBA' if alpha else 'RGB')
+
+    options = WEBP_OPTIONS if alpha else JPEG_OPTIONS
+    for name, size in SIZES:
+        if name not in targets:
+            continue
+        img.thumbnail((size, size), Image.LANCZOS, reducing_gap=2.0)
+        path = targets[name]
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        img.save(f'{path}.part', **options)
+        os.replace(f'{path}.part', path)
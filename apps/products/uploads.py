@@ -0,0 +1,114 @@
+import hashlib
+import os
+import re
+import tempfile
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from django.core.files.uploadhandler import FileUploadHandler, SkipFile, StopFutureHandlers
+
+TMP_UPLOADS_DIR = 'tmp_uploads'
+HASHED_NAME = re.compile(r'^[0-9a-f]{64}$')
+IMAGE_EXTENSIONS = {'JPEG': '.jpg', 'PNG': '.png', 'WEBP': '.webp', 'GIF': '.gif'}
+
+
+class HashedUploadedFile(UploadedFile):
+    def __init__(self, file, name, content_type, size, charset, sha256):
+        super().__init__(file, name, content_type, size, charset)
+        self.sha256 = sha256
+
+    def temporary_file_path(self):
+        return self.file.name
+
+
+class HashingUploadHandler(FileUploadHandler):
+    """Streams each uploaded file straight into MEDIA_ROOT/tmp_uploads,
+    hashing it on the way and giving up as soon as it exceeds
+    PRODUCT_UPLOAD_MAX_BYTES. Replaces Django's memory/temp-file handlers
+    so the bytes are written exactly once."""
+
+    def __init__(self, request=None):
+        super().__init__(request)
+        self.max_bytes = settings.PRODUCT_UPLOAD_MAX_BYTES
+        self.too_large = False
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        if self.content_length and self.content_length > self.max_bytes:
+            self.too_large = True
+            raise SkipFile()
+        directory = os.path.join(settings.MEDIA_ROOT, TMP_UPLOADS_DIR)
+        os.makedirs(directory, exist_ok=True)
+        self.file = tempfile.NamedTemporaryFile(dir=directory, suffix='.part', delete=False)
+        self.hasher = hashlib.sha256()
+        self.size = 0
+        raise StopFutureHandlers()
+
+    def receive_data_chunk(self, raw_data, start):
+        self.size += len(raw_data)
+        if self.size > self.max_bytes:
+            self.too_large = True
+            self.discard()
+            raise SkipFile()
+        self.hasher.update(raw_data)
+        self.file.write(raw_data)
+        return None
+
+    def file_complete(self, file_size):
+        self.file.flush()
+        self.file.seek(0)
+        return HashedUploadedFile(
+            self.file, self.file_name, self.content_type, file_size, self.charset, self.hasher.hexdigest()
+        )
+
+    def upload_interrupted(self):
+        self.discard()
+
+    def discard(self):
+        # Django closes `self.file` itself after a SkipFile, so only unlink here
+        file = getattr(self, 'file', None)
+        if file is not None and os.path.exists(file.name):
+            file.close()
+            os.remove(file.name)
+
+
+def store_upload(upload, ext):
+    """Move a hashed upload to tmp_uploads/<sha256><ext>. Returns the
+    media-relative path and whether identical content was already there."""
+    tmp_path = f'{TMP_UPLOADS_DIR}/{upload.sha256}{ext}'
+    full_path = os.path.join(settings.MEDIA_ROOT, tmp_path)
+    upload.file.close()
+    duplicate = os.path.exists(full_path)
+    if duplicate:
+        os.remove(upload.temporary_file_path())
+    else:
+        os.replace(upload.temporary_file_path(), full_path)
+    return tmp_path, duplicate
+
+
+def discard_upload(upload):
+    upload.file.close()
+    os.remove(upload.temporary_file_path())
+
+
+def discard_uploads(files, keep=None):
+    """Remove the .part file of every upload in `files` except `keep`: the
+    handler writes each file of a multipart request to disk as it arrives."""
+    for _, uploads in files.lists():
+        for upload in uploads:
+            if upload is not keep:
+                discard_upload(upload)
+
+
+def hash_from_path(path):
+    """The content hash encoded in a path written by store_upload, if any.
+
+    Only tmp_uploads/<sha256><ext> is trusted: a file anywhere else under
+    MEDIA_ROOT (or reached through a symlink) may carry a hex name that is
+    not its hash.
+    """
+    directory = os.path.realpath(os.path.join(settings.MEDIA_ROOT, TMP_UPLOADS_DIR))
+    full_path = os.path.realpath(os.path.join(settings.MEDIA_ROOT, path))
+    if os.path.dirname(full_path) != directory:
+        return None
+    stem, ext = os.path.splitext(os.path.basename(full_path))
+    return stem if HASHED_NAME.match(stem) and ext in IMAGE_EXTENSIONS.values() else None
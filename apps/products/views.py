@@ -4,25 +4,39 @@ from rest_framework.permissions import IsAdminUser
 from rest_framework.response import Response
 from rest_framework.parsers import MultiPartParser, FormParser
 from django.conf import settings
-import os
-from django.db.models import Q
 from rest_framework.decorators import action
-from PIL import Image
+from rest_framework.exceptions import ValidationError
 from .models import Product, ProductPicture, ProductAttribute
-from .serializers import ProductSerializer, ProductPictureSerializer, ProductAttributeSerializer, BulkProductSerializer
+from .serializers import (ProductSerializer, ProductPictureSerializer, ProductAttributeSerializer, BulkProductSerializer,
+                          BulkProductListSerializer)
+from .search import search_products
+from .uploads import HashingUploadHandler, IMAGE_EXTENSIONS, discard_upload, discard_uploads, store_upload
+from PIL import Image
+from apps.categories.models import Category
 from apps.core.pagination import StandardResultsSetPagination
 
 class ProductViewSet(viewsets.ModelViewSet):
     serializer_class = ProductSerializer
     permission_classes = [IsAdminUser]
     pagination_class = StandardResultsSetPagination
+    # Same order as the page-number listing
+    cursor_ordering = ('id',)
 
     def get_queryset(self):
-        queryset = Product.objects.filter(is_deleted=False).order_by('id')
+        queryset = Product.objects.filter(is_deleted=False).with_related().order_by('id')
         query = self.request.query_params.get('query')
         if query:
+            # Search results are ordered by relevance, which a cursor on `id` cannot page through
+            if StandardResultsSetPagination.cursor_query_param in self.request.query_params:
+                raise ValidationError({'cursor': 'Not available with query; page with pagenum instead.'})
+            queryset = search_products(queryset, query)
+        category_id = self.request.query_params.get('category')
+        if category_id:
+            # Products attached to the category or anything below it
+            category = Category.objects.filter(pk=category_id).first() if category_id.isdigit() else None
+            subtree = category.subtree() if category else Category.objects.none()
             queryset = queryset.filter(
-                Q(goods_name__icontains=query) | Q(goods_description__icontains=query)
+                id__in=Product.categories.through.objects.filter(category__in=subtree).values('product_id')
             )
         return queryset
     
@@ -71,45 +85,65 @@ class ProductViewSet(viewsets.ModelViewSet):
             serializer = BulkProductSerializer(data=request.data, many=True)
             serializer.is_valid(raise_exception=True)
             products = serializer.save()
+            products = Product.objects.filter(id__in=[product.id for product in products]).with_related().order_by('id')
             return Response(ProductSerializer(products, many=True).data, status=status.HTTP_201_CREATED)
         elif request.method == 'PUT':
-            goods_ids = [item.get('goods_id') for item in request.data]
-            instances = Product.objects.filter(goods_id__in=goods_ids, is_deleted=False)
-            if len(instances) != len(goods_ids):
+            if not isinstance(request.data, list) or not all(isinstance(item, dict) for item in request.data):
+                return Response({"error":"Expected a list of products"}, status=status.HTTP_400_BAD_REQUEST)
+            # Checked before loading anything, not by the serializer afterwards
+            if len(request.data) > BulkProductListSerializer.max_batch_size:
+                return Response({"error":f"At most {BulkProductListSerializer.max_batch_size} products per request"},
+                                status=status.HTTP_400_BAD_REQUEST)
+            ids = [item.get('id') for item in request.data]
+            if len(set(ids)) != len(ids):
+                return Response({"error":"Duplicate product ids"}, status=status.HTTP_400_BAD_REQUEST)
+            products = Product.objects.filter(
+                id__in=[pk for pk in ids if type(pk) is int], is_deleted=False
+            ).prefetch_related('categories').in_bulk()
+            if len(products) != len(ids):
                 return Response({"error":"Some products not found or deleted"}, status=status.HTTP_400_BAD_REQUEST)
-            serializer = BulkProductSerializer(instances, data=request.data, many=True)
+            serializer = BulkProductSerializer([products[pk] for pk in ids], data=request.data, many=True, partial=True)
             serializer.is_valid(raise_exception=True)
             serializer.save()
-            return Response(serializer.data, status=status.HTTP_200_OK)
+            products = Product.objects.filter(id__in=ids).with_related().order_by('id')
+            return Response(ProductSerializer(products, many=True).data, status=status.HTTP_200_OK)
     
 class UploadView(APIView):
     permission_classes = [IsAdminUser]
     parser_classes = [MultiPartParser, FormParser]
 
     def post(self, request):
+        # Must be swapped in before the body is parsed
+        handler = HashingUploadHandler(request._request)
+        request._request.upload_handlers = [handler]
+
         file = request.FILES.get('file')
+        if handler.too_large:
+            discard_uploads(request.FILES)
+            return Response({"data":{},"message": "File exceeds the upload size limit"}, status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
         if not file:
+            discard_uploads(request.FILES)
             return Response({"data":{},"message": "No file provided"}, status=status.HTTP_400_BAD_REQUEST)
-        
-        filename = file.name
-        tmp_path = os.path.join('tmp_uploads', filename)
-        full_path = os.path.join(settings.MEDIA_ROOT, tmp_path)
-        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        # Only `file` is used; any other part of the request is already on disk
+        discard_uploads(request.FILES, keep=file)
 
-        with open(full_path, 'wb+') as destination:
-            for chunk in file.chunks():
-                destination.write(chunk)
-        
-        # Resize images
-        img = Image.open(full_path)
-        big_path = os.path.join(settings.MEDIA_ROOT, 'uploads/goodspics', f"big_{filename}")
-        mid_path = os.path.join(settings.MEDIA_ROOT, 'uploads/goodspics', f"mid_{filename}")
-        sma_path = os.path.join(settings.MEDIA_ROOT, 'uploads/goodspics', f"sma_{filename}")
-        os.makedirs(os.path.dirname(big_path), exist_ok=True)
+        # Header only, from the file we just wrote: nothing is decoded here
+        try:
+            with Image.open(file.file) as img:
+                pixels = img.width * img.height
+                ext = IMAGE_EXTENSIONS.get(img.format)
+        except (OSError, Image.DecompressionBombError):
+            ext = None
+            pixels = 0
+        if not ext:
+            discard_upload(file)
+            return Response({"data":{},"message": "Unsupported image file"}, status=status.HTTP_400_BAD_REQUEST)
+        if pixels > settings.PRODUCT_UPLOAD_MAX_PIXELS:
+            discard_upload(file)
+            return Response({"data":{},"message": "Image dimensions exceed the upload limit"}, status=status.HTTP_400_BAD_REQUEST)
 
-        img.resize((800,800), Image.LANCZOS).save(big_path)
-        img.resize((400,400), Image.LANCZOS).save(mid_path)
-        img.resize((100,100), Image.LANCZOS).save(sma_path)
+        tmp_path, duplicate = store_upload(file, ext)
 
-        url = f"{settings.MEDIA_URL} {tmp_path}"
-        return Response({"data":{"tmp_path":tmp_path, "url":url},"message":"image uploaded succesfully"}, status=status.HTTP_201_CREATED)
+        # Resized copies are produced once, when the picture is attached to a product
+        url = f"{settings.MEDIA_URL}{tmp_path}"
+        return Response({"data":{"tmp_path":tmp_path, "url":url, "duplicate":duplicate},"message":"image uploaded succesfully"}, status=status.HTTP_201_CREATED)
@@ -49,6 +49,10 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Limits for /goods/upload/, checked before the image is decoded
+PRODUCT_UPLOAD_MAX_BYTES = 20 * 1024 * 1024
+PRODUCT_UPLOAD_MAX_PIXELS = 40_000_000
+
 LOGGING = {
     "version": 1,
     "disable_existing_loggers": False,
@@ -147,7 +151,6 @@ SIMPLE_JWT = {
     'AUTH_HEADER_TYPES': ('Bearer',),
 }
 
-# Cacheops configuration
 CACHES = {
     'default': {
         'BACKEND': 'django_redis.cache.RedisCache',
@@ -158,12 +161,16 @@ CACHES = {
     }
 }
 
-CACHEOPS_REDIS = 'redis://127.0.0.1:6379/1'
-CACHEOPS = {
-    'orders.*': {'ops': 'all', 'timeout': 60*60},  # Cache Order, OrderItem for 1 hour
-    'products.*': {'ops': 'all', 'timeout': 60*60},
-    'analytics.*': {'ops': 'all', 'timeout': 60*60},
-}
+# Cached reports are invalidated on writes, the timeout only bounds memory use
+REPORT_CACHE_TIMEOUT = 60 * 60 * 24
+# A running report job that has not reported progress for this long is requeued
+REPORT_JOB_TIMEOUT = 60 * 30
+# Counters kept per time bucket by the trending top-sellers tracker, and how
+# often each process shares them through the database (None: never)
+TRENDING_CAPACITY = 100
+TRENDING_CHECKPOINT_SECONDS = 60
+# Serialized category trees each process keeps in memory (one per listing view)
+CATEGORY_TREE_CACHE_SIZE = 16
 
 SWAGGER_SETTINGS = {
     'SECURITY_DEFINITIONS': {
@@ -29,6 +29,8 @@ if is_testing:
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': ':memory:'
     }
+    # A checkpoint thread would not see the tests' in-memory database; tests call checkpoint() directly
+    TRENDING_CHECKPOINT_SECONDS = None
     logger.info(f"Using SQLite for tests: {DATABASES['default']}")
 else:
     logger.info(f"Using Postgres: {DATABASES['default']}")